@@ -0,0 +1,209 @@
+import asyncio
+import heapq
+import hmac
+import itertools
+import math
+import os
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+
+CHAT_MAX_CONCURRENCY = int(os.getenv("CHAT_MAX_CONCURRENCY", "16"))  # chat requests processed at once
+CHAT_MAX_QUEUE = int(os.getenv("CHAT_MAX_QUEUE", "200"))  # requests waiting for a slot
+CHAT_GLOBAL_RATE = float(os.getenv("CHAT_GLOBAL_RATE", "0"))  # requests/second across all callers, 0 = unlimited
+CHAT_GLOBAL_BURST = int(os.getenv("CHAT_GLOBAL_BURST", "20"))
+CHAT_SESSION_RATE = float(os.getenv("CHAT_SESSION_RATE", "1"))  # requests/second per session, 0 = unlimited
+CHAT_SESSION_BURST = int(os.getenv("CHAT_SESSION_BURST", "10"))
+# Requests without a session_id are limited per client IP, which everyone behind a NAT shares
+CHAT_IP_RATE = float(os.getenv("CHAT_IP_RATE", "10"))  # requests/second per IP, 0 = unlimited
+CHAT_IP_BURST = int(os.getenv("CHAT_IP_BURST", "50"))
+CHAT_QUEUE_TIMEOUT = float(os.getenv("CHAT_QUEUE_TIMEOUT", "10"))  # max seconds an interactive request waits
+CHAT_BATCH_QUEUE_TIMEOUT = float(os.getenv("CHAT_BATCH_QUEUE_TIMEOUT", "30"))
+# When set, single-question chat requests are only interactive if they carry it in X-Client-Token
+CHAT_INTERACTIVE_TOKEN = os.getenv("CHAT_INTERACTIVE_TOKEN")
+
+# Lower value is served first
+LANES = {"interactive": 0, "batch": 1}
+
+
+def request_lane(client_token, interactive_token=CHAT_INTERACTIVE_TOKEN):
+    """Lane of a single-question chat request, decided by the server rather than the client
+
+    Without an interactive token every such request is interactive; with one, only clients presenting it
+    (the Streamlit UI) are, so scripts calling the API cannot jump ahead of users.
+    """
+    if not interactive_token:
+        return "interactive"
+    if hmac.compare_digest((client_token or "").encode("utf-8"), interactive_token.encode("utf-8")):
+        return "interactive"
+    return "batch"
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, status_code, detail, retry_after=None):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, holding at most `burst`"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+
+    def try_take(self):
+        """Take a token and return 0, or return the seconds until one is available"""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+def _percentile(values, fraction):
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(len(values) * fraction))] * 1000, 1)
+
+
+class AdmissionController:
+    """Per-session and global rate limits plus a bounded priority queue for chat slots"""
+
+    def __init__(self, max_concurrency=CHAT_MAX_CONCURRENCY, max_queue=CHAT_MAX_QUEUE,
+                 global_rate=CHAT_GLOBAL_RATE, global_burst=CHAT_GLOBAL_BURST,
+                 session_rate=CHAT_SESSION_RATE, session_burst=CHAT_SESSION_BURST,
+                 ip_rate=CHAT_IP_RATE, ip_burst=CHAT_IP_BURST,
+                 queue_timeouts=None, max_sessions=10000):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.global_bucket = TokenBucket(global_rate, global_burst) if global_rate > 0 else None
+        # (rate, burst) per kind of rate key: ("session", session_id) or ("ip", client address)
+        self.rates = {"session": (session_rate, session_burst), "ip": (ip_rate, ip_burst)}
+        self.queue_timeouts = queue_timeouts or {"interactive": CHAT_QUEUE_TIMEOUT, "batch": CHAT_BATCH_QUEUE_TIMEOUT}
+        self.max_sessions = max_sessions
+        self.in_flight = 0
+        self._sessions = OrderedDict()
+        self._waiters = []  # heap of (lane priority, arrival order, lane, future)
+        self._order = itertools.count()
+        self._wakeup = None
+        self.admitted = {lane: 0 for lane in LANES}
+        self.rejected = {"session_rate": 0, "ip_rate": 0, "queue_full": 0, "queue_timeout": 0}
+        self.max_queue_depth = 0
+        self._wait_times = {lane: deque(maxlen=1000) for lane in LANES}
+
+    def check_rate(self, rate_key):
+        """Take a token from the bucket of ("session", id) or ("ip", address); raises AdmissionRejected (429) when empty"""
+        kind = rate_key[0]
+        rate, burst = self.rates[kind]
+        if rate <= 0:
+            return
+        bucket = self._sessions.get(rate_key)
+        if bucket is None:
+            bucket = self._sessions[rate_key] = TokenBucket(rate, burst)
+            if len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        self._sessions.move_to_end(rate_key)
+        wait = bucket.try_take()
+        if wait:
+            self.rejected[f"{kind}_rate"] += 1
+            who = "this session" if kind == "session" else "this client"
+            raise AdmissionRejected(429, f"Too many requests for {who}. Please slow down.", math.ceil(wait))
+
+    def _queue_depth(self):
+        depth = {lane: 0 for lane in LANES}
+        for _, _, lane, future in self._waiters:
+            if not future.done():
+                depth[lane] += 1
+        return depth
+
+    def _take_global(self):
+        """0 if a global token was taken, otherwise seconds until one is available"""
+        return self.global_bucket.try_take() if self.global_bucket is not None else 0.0
+
+    def _dispatch(self):
+        """Hand free slots to queued requests, interactive lane first"""
+        self._wakeup = None
+        while self._waiters and self.in_flight < self.max_concurrency:
+            future = self._waiters[0][3]
+            if future.done():
+                # Timed out or the client went away
+                heapq.heappop(self._waiters)
+                continue
+            wait = self._take_global()
+            if wait:
+                self._wakeup = asyncio.get_running_loop().call_later(wait, self._dispatch)
+                return
+            heapq.heappop(self._waiters)
+            self.in_flight += 1
+            future.set_result(None)
+
+    async def acquire(self, rate_key=None, lane="interactive"):
+        """Wait for a chat slot; raises AdmissionRejected when rate limited or the queue deadline passes
+
+        rate_key is checked with check_rate; None skips the rate limit (the caller charged it already).
+        """
+        queued = bool(self._waiters) or self.in_flight >= self.max_concurrency
+        # A full queue rejects before the rate limit, so a 503 does not use up the caller's budget
+        if queued and sum(self._queue_depth().values()) >= self.max_queue:
+            self.rejected["queue_full"] += 1
+            raise AdmissionRejected(503, "Server is busy. Please try again shortly.", 1)
+        if rate_key is not None:
+            self.check_rate(rate_key)
+        started = time.monotonic()
+        if not queued and not self._take_global():
+            self.in_flight += 1
+        else:
+            future = asyncio.get_running_loop().create_future()
+            heapq.heappush(self._waiters, (LANES[lane], next(self._order), lane, future))
+            self.max_queue_depth = max(self.max_queue_depth, sum(self._queue_depth().values()))
+            if self._wakeup is None:
+                self._dispatch()
+            timeout = self.queue_timeouts[lane]
+            try:
+                await asyncio.wait_for(future, timeout)
+            except asyncio.TimeoutError:
+                if future.done() and not future.cancelled():
+                    self.release()
+                self.rejected["queue_timeout"] += 1
+                raise AdmissionRejected(503, f"Request waited more than {timeout:g}s for capacity. Please try again.", 1)
+            except asyncio.CancelledError:
+                if future.done() and not future.cancelled():
+                    self.release()
+                raise
+        self.admitted[lane] += 1
+        self._wait_times[lane].append(time.monotonic() - started)
+
+    def release(self):
+        self.in_flight -= 1
+        if self._wakeup is None:
+            self._dispatch()
+
+    @asynccontextmanager
+    async def admit(self, rate_key=None, lane="interactive"):
+        await self.acquire(rate_key, lane)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self):
+        return {
+            "in_flight": self.in_flight,
+            "max_concurrency": self.max_concurrency,
+            "queue_depth": self._queue_depth(),
+            "max_queue_depth": self.max_queue_depth,
+            "admitted": dict(self.admitted),
+            "rejected": dict(self.rejected),
+            "wait_ms": {
+                lane: {"p50": _percentile(waits, 0.5), "p95": _percentile(waits, 0.95)}
+                for lane, waits in self._wait_times.items()
+            }
+        }
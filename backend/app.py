@@ -1,14 +1,48 @@
-from fastapi import FastAPI, HTTPException, BackgroundTasks, UploadFile, File
+import time
+
+# Measured from interpreter start of this module so cold-start time covers imports too
+PROCESS_START = time.perf_counter()
+
+from fastapi import FastAPI, HTTPException, BackgroundTasks, UploadFile, File, Form, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
 import uvicorn
 from datetime import datetime
+import asyncio
+import hmac
+import json
 import logging
 import os
 import shutil
 from pathlib import Path
-from main import setup_rag_bot
+from warmup import FrequentQuestions, load_warmup_questions, warmup_bot, WARMUP_ENABLED
+from admission import AdmissionController, AdmissionRejected, request_lane
+from coalescing import SingleFlight, normalize_question
+from snapshot import INDEX_SNAPSHOT
+from data_watcher import DATA_WATCH_ENABLED, DataWatcher, ingest_files
+from reload_coordinator import ReloadCoordinator
+from traffic_capture import TRAFFIC_CAPTURE_FILE, TrafficRecorder
+from cancellation import CancellationStats, Deadline, RequestCancelled, run_cancellable, wait_for_disconnect
+from profiling import (
+    PROFILING_ADMIN_TOKEN,
+    PROFILING_ENABLED,
+    SLOW_REQUEST_SECONDS,
+    SlowRequestRecorder,
+    StackSampler,
+    list_profiles,
+    profile_path,
+    save_profile,
+    summarize
+)
+from namespaces import (
+    DEFAULT_NAMESPACE,
+    NamespaceRegistry,
+    list_namespaces,
+    namespace_paths,
+    resolve_namespace
+)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -29,9 +63,35 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
-# Global bot instance
-bot = None
-bot_loaded = False
+# Status of the initial bot load; the bot itself is owned by the reload coordinator below
+bot_loading = False
+bot_load_error = None
+
+# Most frequent /chat questions, replayed to warm up the index after (re)loads
+frequent_questions = FrequentQuestions()
+
+# Bumped whenever the index changes, so coalesced answers never mix index states
+index_version = 0
+
+# Concurrent identical history-free questions share one retrieval + generation
+chat_flights = SingleFlight()
+
+# Rate limits and priority queueing in front of the chat handlers
+admission = AdmissionController()
+
+# Chat requests stopped early because the client went away or their deadline passed
+cancellations = CancellationStats()
+
+# Opt-in: rolling stack samples, saved for requests slower than SLOW_REQUEST_SECONDS
+slow_requests = SlowRequestRecorder() if PROFILING_ENABLED and SLOW_REQUEST_SECONDS > 0 else None
+# One on-demand profile at a time
+profile_lock = asyncio.Lock()
+
+# Optional watcher feeding files changed in data/ into incremental ingestion
+data_watcher = None
+
+# Opt-in: anonymized chat requests with arrival times, for replay.py load tests
+traffic = TrafficRecorder() if TRAFFIC_CAPTURE_FILE else None
 
 # Data directory configuration
 DATA_DIR = Path("data")
@@ -40,16 +100,34 @@ DATA_DIR.mkdir(exist_ok=True)
 # Allowed file extensions
 ALLOWED_EXTENSIONS = {'.pdf', '.txt', '.docx', '.doc', '.csv', '.xlsx', '.xls', '.json', '.md'}
 MAX_FILE_SIZE = 50 * 1024 * 1024  # 50 MB
+MAX_BATCH_QUESTIONS = 1000
+MAX_PROFILE_SECONDS = 60
+ON_DEMAND_SAMPLE_INTERVAL = 0.005  # seconds between stack samples for /debug/profile
 
 class Question(BaseModel):
     question: str = Field(..., min_length=1, description="User's question")
     session_id: Optional[str] = Field(None, description="Session identifier")
+    namespace: Optional[str] = Field(None, description="Knowledge base to search (default if omitted)")
     
     class Config:
         json_schema_extra = {
             "example": {
                 "question": "What is the main topic of the document?",
-                "session_id": "user123"
+                "session_id": "user123",
+                "namespace": "hr"
+            }
+        }
+
+class BatchQuestions(BaseModel):
+    questions: List[str] = Field(..., min_length=1, max_length=MAX_BATCH_QUESTIONS, description="Questions to answer")
+    concurrency: Optional[int] = Field(None, ge=1, le=64, description="Maximum concurrent LLM generations")
+    namespace: Optional[str] = Field(None, description="Knowledge base to search (default if omitted)")
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "questions": ["What is the main topic of the document?", "Who is the author?"],
+                "concurrency": 8
             }
         }
 
@@ -80,6 +158,12 @@ class HealthResponse(BaseModel):
     timestamp: str
     version: str
 
+class ReadinessResponse(BaseModel):
+    status: str
+    bot_loaded: bool
+    detail: Optional[str] = None
+    timestamp: str
+
 class ErrorResponse(BaseModel):
     error: str
     detail: Optional[str] = None
@@ -103,23 +187,315 @@ class UploadResponse(BaseModel):
             }
         }
 
-@app.on_event("startup")
-async def startup_event():
-    """Initialize the RAG bot on startup"""
-    global bot, bot_loaded
+class UrlIngestRequest(BaseModel):
+    urls: List[str] = Field(..., min_length=1, description="Web pages to ingest")
+    force: bool = Field(False, description="Refetch and re-ingest even if pages are unchanged")
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "urls": ["https://example.com/handbook"],
+                "force": False
+            }
+        }
+
+class UrlIngestResponse(BaseModel):
+    new: List[str] = Field(default_factory=list)
+    modified: List[str] = Field(default_factory=list)
+    unchanged: List[str] = Field(default_factory=list)
+    error: Dict[str, str] = Field(default_factory=dict)
+    chunks: int = 0
+    seconds: float = 0
+    timestamp: str
+
+# Shared so per-host politeness limits apply across requests
+url_fetcher = None
+
+def _setup_rag_bot(**kwargs):
+    """Build the RAG bot, importing the langchain/Chroma/Azure stack on first use"""
+    global index_version
+    from main import setup_rag_bot
+    new_bot = setup_rag_bot(**kwargs)
+    index_version += 1
+    if WARMUP_ENABLED:
+        try:
+            warmup_bot(new_bot, load_warmup_questions(frequent_questions))
+        except Exception as e:
+            logger.warning(f"⚠️ Warmup failed: {str(e)}")
+    return new_bot
+
+def _cleanup_retired_bot(old_bot, namespace=DEFAULT_NAMESPACE):
+    """Close and delete the index of a replaced bot once no request uses it"""
+    from vector_store import remove_index_directory
+    if getattr(old_bot, "index_directory", None):
+        remove_index_directory(namespace_paths(namespace).persist_directory, old_bot.index_directory)
+        logger.info(f"🗑️ Removed retired index {old_bot.index_directory}")
+
+# Serializes rebuilds of the default index and swaps bots without disturbing in-flight requests
+bots = ReloadCoordinator(_setup_rag_bot, cleanup=_cleanup_retired_bot)
+
+async def _load_bot():
+    """Load the index and create the bot off the event loop"""
+    global bot_loading, bot_load_error
+    bot_loading = True
+    started = time.perf_counter()
     try:
-        logger.info("🚀 Starting RAG Bot initialization...")
-        bot = setup_rag_bot()
-        bot_loaded = True
-        logger.info("✅ RAG Bot initialized successfully!")
+        new_bot = await bots.load(snapshot=INDEX_SNAPSHOT)
+        bot_load_error = None
+        if new_bot.index_directory:
+            # Generations left behind by an interrupted rebuild
+            from vector_store import prune_index_directories
+            await asyncio.to_thread(prune_index_directories, namespace_paths(DEFAULT_NAMESPACE).persist_directory)
+        logger.info(
+            f"✅ RAG Bot initialized in {time.perf_counter() - started:.2f}s "
+            f"(cold start: {time.perf_counter() - PROCESS_START:.2f}s)"
+        )
+        await _start_data_watcher()
     except Exception as e:
         logger.error(f"❌ Failed to initialize RAG Bot: {str(e)}")
-        bot_loaded = False
+        bot_load_error = str(e)
+    finally:
+        bot_loading = False
+
+async def _ingest_data_changes(changed, deleted):
+    """Apply files changed in data/ to the loaded default index"""
+    global index_version
+    if not bots.loaded:
+        return None
+    async with bots.exclusive() as current_bot:
+        report = await asyncio.to_thread(ingest_files, current_bot.vectorstore, changed, deleted)
+    index_version += 1
+    return report
+
+async def _start_data_watcher():
+    global data_watcher
+    if not DATA_WATCH_ENABLED or data_watcher is not None:
+        return
+    if INDEX_SNAPSHOT:
+        logger.warning("⚠️ DATA_WATCH_ENABLED is ignored while serving a read-only index snapshot")
+        return
+    data_watcher = DataWatcher(DATA_DIR, _ingest_data_changes)
+    try:
+        await data_watcher.start()
+    except Exception as e:
+        logger.error(f"❌ Could not watch {DATA_DIR}: {str(e)}")
+        data_watcher = None
+
+# Namespaces whose leftover index generations have been deleted since the process started
+_pruned_namespaces = set()
+
+def _setup_namespace_bot(namespace, rebuild_index=False):
+    """Build the bot for a non-default namespace from its own data directory and collection"""
+    from vector_store import prune_index_directories
+    paths = namespace_paths(namespace)
+    Path(paths.data_dir).mkdir(parents=True, exist_ok=True)
+    namespace_bot = _setup_rag_bot(
+        data_path=paths.data_dir,
+        rebuild_index=rebuild_index,
+        persist_directory=paths.persist_directory,
+        collection_name=paths.collection_name,
+        include_urls=False
+    )
+    if namespace not in _pruned_namespaces:
+        # Generations left behind by an interrupted rebuild; only on the first build in this process,
+        # as later ones retire the previous bot and delete its index once its last request is done
+        prune_index_directories(paths.persist_directory, keep=[namespace_bot.index_directory])
+        _pruned_namespaces.add(namespace)
+    return namespace_bot
+
+def _release_namespace(namespace, namespace_bot):
+    """Close the evicted namespace's cached Chroma clients so their memory is actually freed"""
+    from vector_store import release_index_clients
+    if getattr(namespace_bot, "index_directory", None):
+        release_index_clients(namespace_bot.index_directory)
+
+# Bots for non-default namespaces, loaded on first use and evicted when idle
+namespace_bots = NamespaceRegistry(
+    _setup_namespace_bot,
+    release=_release_namespace,
+    cleanup=lambda namespace, old_bot: _cleanup_retired_bot(old_bot, namespace)
+)
+
+async def _evict_idle_namespaces(interval=60):
+    while True:
+        await asyncio.sleep(interval)
+        namespace_bots.evict_idle()
+
+def _resolve_namespace(namespace):
+    try:
+        return resolve_namespace(namespace)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+async def _get_bot(namespace=None):
+    """(namespace, handle) for a request, loading non-default namespaces on first use
+
+    The handle is in use until released (or used as a context manager, which yields the bot),
+    so a reload cannot clean up the bot while the request still needs it.
+    """
+    namespace = _resolve_namespace(namespace)
+    if namespace == DEFAULT_NAMESPACE:
+        handle = bots.acquire()
+        if handle is None:
+            raise HTTPException(
+                status_code=503,
+                detail="Bot is not initialized. Please try again later."
+            )
+        return namespace, handle
+    try:
+        return namespace, await namespace_bots.get(namespace)
+    except KeyError:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Namespace '{namespace}' does not exist. Upload a document to create it."
+        )
+    except Exception as e:
+        logger.error(f"❌ Failed to load namespace '{namespace}': {str(e)}")
+        raise HTTPException(
+            status_code=503,
+            detail=f"Namespace '{namespace}' could not be loaded: {str(e)}"
+        )
+
+def _rate_key(request, session_id=None):
+    """Rate limit bucket of a chat request: its session, or its client IP when it has none"""
+    if session_id:
+        return ("session", session_id)
+    return ("ip", request.client.host if request.client else "unknown")
+
+def _lane(request):
+    """Priority lane of a single-question chat request; see request_lane"""
+    return request_lane(request.headers.get("X-Client-Token"))
+
+def _rejected(e):
+    return HTTPException(
+        status_code=e.status_code,
+        detail=e.detail,
+        headers={"Retry-After": str(e.retry_after)} if e.retry_after else None
+    )
+
+async def _admit(request, session_id=None):
+    """Take a chat slot, queueing by priority lane; the caller must call admission.release()"""
+    try:
+        await admission.acquire(_rate_key(request, session_id), _lane(request))
+    except AdmissionRejected as e:
+        raise _rejected(e)
+
+def _disconnect_listener(request):
+    """Task that finishes when the client disconnects, shared by every step of a request"""
+    listener = getattr(request.state, "disconnect_listener", None)
+    if listener is None:
+        # Ends by itself once the response has been sent
+        listener = request.state.disconnect_listener = asyncio.create_task(wait_for_disconnect(request.receive))
+    return listener
+
+async def _run_cancellable(request, awaitable, deadline, undo=None):
+    """Await a chat step, cancelling it when the client disconnects or the request deadline passes"""
+    try:
+        return await run_cancellable(awaitable, deadline, _disconnect_listener(request), undo=undo)
+    except RequestCancelled as e:
+        cancellations.record(request.url.path, e.reason)
+        if e.reason == "deadline":
+            logger.warning(f"⏱️ {request.url.path} request cancelled after its {deadline.seconds:g}s deadline")
+            raise HTTPException(status_code=504, detail=f"Request did not finish within {deadline.seconds:g}s")
+        logger.info(f"🔌 Client disconnected, cancelled its {request.url.path} request")
+        # nginx's code for "client closed request"; nobody reads it, but it keeps the logs honest
+        raise HTTPException(status_code=499, detail="Client closed request")
+
+class _ChatStreamingResponse(StreamingResponse):
+    """NDJSON stream that calls on_close once sending ends, even if the client left before the first event"""
+
+    def __init__(self, content, on_close):
+        super().__init__(content, media_type="application/x-ndjson")
+        self.on_close = on_close
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.on_close()
+
+def _capture(request, question):
+    """Record a chat request for replay when traffic capture is enabled"""
+    if traffic is not None:
+        traffic.record(request.url.path, question.question, question.session_id, question.namespace,
+                       _lane(request))
+
+def _session_history(chat_bot, session_id):
+    """History of a session; requests without a session_id are history-free rather than sharing one "default" history"""
+    return list(chat_bot.get_history(session_id)) if session_id else []
+
+def _remember(chat_bot, question, answer, session_id):
+    if session_id:
+        chat_bot.remember(question, answer, session_id)
+
+async def _answer_question(chat_bot, question, session_id=None, namespace=DEFAULT_NAMESPACE):
+    """Answer without blocking the event loop, sharing one computation between identical history-free questions"""
+    history = _session_history(chat_bot, session_id)
+    if history:
+        result = await chat_bot.aanswer_question(question, history)
+    else:
+        key = (namespace, index_version, normalize_question(question))
+        result = await chat_flights.do(key, lambda: chat_bot.aanswer_question(question))
+    _remember(chat_bot, question, result["answer"], session_id)
+    return result
+
+@app.on_event("startup")
+async def startup_event():
+    """Start the server immediately and initialize the RAG bot in the background"""
+    logger.info(f"🟢 Accepting requests after {time.perf_counter() - PROCESS_START:.2f}s")
+    logger.info("🚀 Starting RAG Bot initialization in the background...")
+    app.state.bot_loader = asyncio.create_task(_load_bot())
+    app.state.namespace_sweeper = asyncio.create_task(_evict_idle_namespaces())
+    if slow_requests is not None:
+        slow_requests.start()
+        logger.info(f"🔬 Capturing stack samples of requests slower than {SLOW_REQUEST_SECONDS:g}s")
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Cleanup on shutdown"""
     logger.info("👋 Shutting down RAG Bot API...")
+    frequent_questions.save()
+    if slow_requests is not None:
+        slow_requests.stop()
+    if data_watcher is not None:
+        await data_watcher.stop()
+    if traffic is not None:
+        traffic.close()
+
+def _record_request(method, path, status_code, started):
+    name = slow_requests.finish(method, path, status_code, started)
+    if name:
+        logger.warning(f"🐢 Slow request {method} {path}: stack samples saved as {name}")
+
+@app.middleware("http")
+async def capture_slow_requests(request: Request, call_next):
+    """Time each request until its body is fully sent and hand slow ones to the recorder"""
+    if slow_requests is None or request.url.path.startswith("/debug"):
+        return await call_next(request)
+    started = time.monotonic()
+    response = await call_next(request)
+    body = response.body_iterator
+
+    async def send_body():
+        try:
+            async for chunk in body:
+                yield chunk
+        finally:
+            # Summarizing and writing the profile happens off the event loop
+            asyncio.get_running_loop().run_in_executor(
+                None, _record_request, request.method, request.url.path, response.status_code, started
+            )
+
+    response.body_iterator = send_body()
+    return response
+
+def _require_admin(request: Request):
+    """The debug endpoints only exist when profiling is enabled and an admin token is configured"""
+    if not PROFILING_ENABLED or not PROFILING_ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    token = request.headers.get("X-Admin-Token", "")
+    if not hmac.compare_digest(token.encode("utf-8"), PROFILING_ADMIN_TOKEN.encode("utf-8")):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
 
 @app.get("/", tags=["Root"])
 async def root():
@@ -129,49 +505,75 @@ async def root():
         "version": "1.0.0",
         "status": "active",
         "docs": "/docs",
-        "health": "/health"
+        "health": "/health",
+        "ready": "/ready"
     }
 
 @app.get("/health", response_model=HealthResponse, tags=["Health"])
 async def health_check():
-    """Health check endpoint"""
+    """Liveness endpoint: the process is up and serving requests"""
     return HealthResponse(
-        status="healthy" if bot_loaded else "unhealthy",
-        bot_loaded=bot_loaded,
+        status="healthy",
+        bot_loaded=bots.loaded,
         timestamp=datetime.now().isoformat(),
         version="1.0.0"
     )
 
+@app.get("/ready", response_model=ReadinessResponse, tags=["Health"])
+async def readiness_check():
+    """Readiness endpoint: returns 503 until the bot can answer questions"""
+    if bots.loaded:
+        status, status_code = "ready", 200
+    elif bot_loading:
+        status, status_code = "loading", 503
+    else:
+        status, status_code = "failed", 503
+    response = ReadinessResponse(
+        status=status,
+        bot_loaded=bots.loaded,
+        detail=bot_load_error if status == "failed" else None,
+        timestamp=datetime.now().isoformat()
+    )
+    return JSONResponse(status_code=status_code, content=response.model_dump())
+
 @app.post("/chat", response_model=ChatResponse, tags=["Chat"])
-async def chat(question: Question, background_tasks: BackgroundTasks):
+async def chat(question: Question, background_tasks: BackgroundTasks, request: Request):
     """
     Main chat endpoint
     
     - **question**: User's question (required)
     - **session_id**: Optional session identifier for tracking
+    - **namespace**: Optional knowledge base to search
     """
-    if not bot_loaded or bot is None:
-        raise HTTPException(
-            status_code=503,
-            detail="Bot is not initialized. Please try again later."
-        )
-    
+    _capture(request, question)
     if not question.question.strip():
         raise HTTPException(
             status_code=400,
             detail="Question cannot be empty"
         )
     
+    deadline = Deadline.from_headers(request.headers)
+    namespace, handle = await _get_bot(question.namespace)
+    try:
+        await _run_cancellable(request, _admit(request, question.session_id), deadline, undo=admission.release)
+    except HTTPException:
+        handle.release()
+        raise
     try:
         logger.info(f"📝 Processing question: {question.question[:50]}...")
+        frequent_questions.record(question.question)
         
         # Get response from bot with session management
-        result = bot.chat(question.question, session_id=question.session_id)
+        result = await _run_cancellable(request, _answer_question(
+            handle.bot, question.question, session_id=question.session_id, namespace=namespace
+        ), deadline)
         
-        # Extract sources
+        # Extract sources (deduplicated chunks carry every file they appeared in)
+        from dedup import document_sources
         sources = [
-            doc.metadata.get('source', 'Unknown')
+            source
             for doc in result.get('sources', [])
+            for source in document_sources(doc)
         ]
         
         # Remove duplicates while preserving order
@@ -186,26 +588,34 @@ async def chat(question: Question, background_tasks: BackgroundTasks):
             session_id=question.session_id
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"❌ Error processing question: {str(e)}")
         raise HTTPException(
             status_code=500,
             detail=f"Internal server error: {str(e)}"
         )
+    finally:
+        admission.release()
+        handle.release()
 
 @app.post("/chat/detailed", tags=["Chat"])
-async def chat_detailed(question: Question):
+async def chat_detailed(question: Question, request: Request):
     """
     Chat endpoint with detailed source information
     """
-    if not bot_loaded or bot is None:
-        raise HTTPException(
-            status_code=503,
-            detail="Bot is not initialized"
-        )
-    
+    _capture(request, question)
+    deadline = Deadline.from_headers(request.headers)
+    namespace, handle = await _get_bot(question.namespace)
+    try:
+        await _run_cancellable(request, _admit(request, question.session_id), deadline, undo=admission.release)
+    except HTTPException:
+        handle.release()
+        raise
     try:
-        result = bot.chat(question.question)
+        frequent_questions.record(question.question)
+        result = await _run_cancellable(request, _answer_question(handle.bot, question.question, namespace=namespace), deadline)
         
         # Extract detailed sources
         sources = []
@@ -219,34 +629,198 @@ async def chat_detailed(question: Question):
         return {
             "answer": result['answer'],
             "sources": sources,
+            "route": result.get('route'),
+            "retrieval": result.get('retrieval'),
             "timestamp": datetime.now().isoformat(),
             "session_id": question.session_id
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        admission.release()
+        handle.release()
+
+@app.post("/chat/stream", tags=["Chat"])
+async def chat_stream(question: Question, request: Request):
+    """
+    Chat endpoint that streams the answer as NDJSON events
+
+    Emits a `sources` event, then one `token` event per generated chunk, then `done`.
+    Identical history-free questions asked concurrently share one token stream.
+    If the deadline passes first, the stream ends with an `error` event.
+    """
+    _capture(request, question)
+    if not question.question.strip():
+        raise HTTPException(
+            status_code=400,
+            detail="Question cannot be empty"
+        )
+
+    deadline = Deadline.from_headers(request.headers)
+    namespace, handle = await _get_bot(question.namespace)
+    try:
+        await _run_cancellable(request, _admit(request, question.session_id), deadline, undo=admission.release)
+    except HTTPException:
+        handle.release()
+        raise
+    chat_bot = handle.bot
+    frequent_questions.record(question.question)
+    history = _session_history(chat_bot, question.session_id)
+
+    async def produce():
+        from dedup import document_sources
+        docs, retrieval = await asyncio.to_thread(chat_bot.gated_retrieve, question.question, history)
+        sources = list(dict.fromkeys(source for doc in docs for source in document_sources(doc)))
+        yield {"type": "sources", "sources": sources, "retrieval": retrieval}
+        async for token in chat_bot.astream_answer(question.question, docs, history):
+            yield {"type": "token", "content": token}
+
+    if history:
+        events = produce()
+    else:
+        events = chat_flights.stream((namespace, index_version, normalize_question(question.question)), produce)
+
+    finished = False
+
+    async def stream_events():
+        nonlocal finished
+        answer = []
+        try:
+            while True:
+                try:
+                    event = await _run_cancellable(request, events.__anext__(), deadline)
+                except StopAsyncIteration:
+                    break
+                if event["type"] == "token":
+                    answer.append(event["content"])
+                yield json.dumps(event) + "\n"
+            _remember(chat_bot, question.question, "".join(answer), question.session_id)
+            yield json.dumps({
+                "type": "done",
+                "session_id": question.session_id,
+                "timestamp": datetime.now().isoformat()
+            }) + "\n"
+        except HTTPException as e:
+            # Cancelled; only a client that is still there gets told why
+            if e.status_code == 504:
+                yield json.dumps({"type": "error", "error": e.detail}) + "\n"
+        except Exception as e:
+            logger.error(f"❌ Error streaming answer: {str(e)}")
+            yield json.dumps({"type": "error", "error": str(e)}) + "\n"
+        finished = True
+
+    def close():
+        admission.release()
+        handle.release()
+        if not finished:
+            # The server stopped sending because the client disconnected
+            cancellations.record(request.url.path, "disconnected")
+
+    return _ChatStreamingResponse(stream_events(), on_close=close)
+
+@app.post("/chat/batch", tags=["Chat"])
+async def chat_batch(batch: BatchQuestions, request: Request):
+    """
+    Answer many questions in one request, streaming NDJSON results as each completes
+
+    All questions are embedded in one batched call and retrieved together;
+    LLM generations run concurrently. Questions are answered without chat history.
+    Each line contains the question's index, answer, sources and any error.
+    """
+    if any(not question.strip() for question in batch.questions):
+        raise HTTPException(
+            status_code=400,
+            detail="Questions cannot be empty"
+        )
+
+    from batch_chat import run_batch, BATCH_LLM_CONCURRENCY
+    # The batch is rate limited once; each of its generations then queues for a slot in the batch lane
+    try:
+        admission.check_rate(_rate_key(request))
+    except AdmissionRejected as e:
+        raise _rejected(e)
+    _, handle = await _get_bot(batch.namespace)
+    logger.info(f"📦 Processing batch of {len(batch.questions)} questions")
+
+    async def stream_results():
+        try:
+            async for result in run_batch(handle.bot, batch.questions, batch.concurrency or BATCH_LLM_CONCURRENCY,
+                                          admit=lambda: admission.admit(lane="batch")):
+                yield json.dumps(result) + "\n"
+        except Exception as e:
+            logger.error(f"❌ Error processing batch: {str(e)}")
+            yield json.dumps({"error": str(e), "timestamp": datetime.now().isoformat()}) + "\n"
+
+    return _ChatStreamingResponse(stream_results(), on_close=handle.release)
 
 @app.get("/stats", tags=["Statistics"])
 async def get_stats():
     """Get API statistics"""
+    current = bots.current.bot if bots.loaded else None
+    embeddings = current.vectorstore.embeddings if current is not None else None
+    router = getattr(current, "router", None)
     return {
-        "bot_loaded": bot_loaded,
+        "bot_loaded": bots.loaded,
+        "bot_loading": bot_loading,
+        "reloads": bots.stats(),
+        "query_embedding_cache": embeddings.stats() if hasattr(embeddings, "stats") else None,
+        "coalescing": chat_flights.stats(),
+        "namespaces": namespace_bots.stats(),
+        "admission": admission.stats(),
+        "cancellations": cancellations.stats(),
+        "model_routing": router.stats() if router is not None else None,
+        "retrieval_gate": current.retrieval_gate.stats() if getattr(current, "retrieval_gate", None) is not None else None,
+        "snapshot": getattr(current.vectorstore, "snapshot", None) if current is not None else None,
+        "parent_docstore": current.parents.stats() if getattr(current, "parents", None) is not None else None,
+        "document_index": current.document_index.stats() if getattr(current, "document_index", None) is not None else None,
+        "vector_shards": current.vectorstore.stats() if hasattr(current.vectorstore, "shards") else None,
+        "profiling": slow_requests.stats() if slow_requests is not None else None,
+        "data_watcher": data_watcher.stats() if data_watcher is not None else None,
+        "traffic_capture": traffic.stats() if traffic is not None else None,
         "timestamp": datetime.now().isoformat(),
         "status": "operational"
     }
 
+@app.get("/namespaces", tags=["Statistics"])
+async def get_namespaces():
+    """List knowledge bases and which ones are currently loaded"""
+    loaded = namespace_bots.stats()["loaded"]
+    return {
+        "namespaces": [
+            {"name": name, "loaded": name in loaded or (name == DEFAULT_NAMESPACE and bots.loaded)}
+            for name in list_namespaces()
+        ],
+        "timestamp": datetime.now().isoformat()
+    }
+
+def _refuse_snapshot_writes(namespace=DEFAULT_NAMESPACE):
+    """The default knowledge base cannot change while it is served from INDEX_SNAPSHOT: a local rebuild would be lost on restart"""
+    if INDEX_SNAPSHOT and namespace == DEFAULT_NAMESPACE:
+        raise HTTPException(
+            status_code=409,
+            detail="The default knowledge base is served from a read-only index snapshot. "
+                   "Build a new snapshot with `python ingest.py` or upload to a namespace."
+        )
+
 @app.post("/upload", response_model=UploadResponse, tags=["Upload"])
-async def upload_document(file: UploadFile = File(...), background_tasks: BackgroundTasks = None):
+async def upload_document(file: UploadFile = File(...), background_tasks: BackgroundTasks = None,
+                          namespace: Optional[str] = Form(None)):
     """
     Upload a document to the data folder and automatically reload the knowledge base
     
     - **file**: Document file to upload
     - Supported formats: PDF, TXT, DOCX, DOC, CSV, XLSX, XLS, JSON, MD
     - Max file size: 50 MB
+    - **namespace**: Optional knowledge base; only that namespace is re-ingested
     """
-    global bot, bot_loaded
-    
     try:
+        namespace = _resolve_namespace(namespace)
+        _refuse_snapshot_writes(namespace)
+        data_dir = DATA_DIR if namespace == DEFAULT_NAMESPACE else Path(namespace_paths(namespace).data_dir)
+        
         # Validate file extension
         file_ext = Path(file.filename).suffix.lower()
         if file_ext not in ALLOWED_EXTENSIONS:
@@ -277,45 +851,45 @@ async def upload_document(file: UploadFile = File(...), background_tasks: Backgr
         file_extension = Path(file.filename).suffix
         counter = 1
         safe_filename = file.filename
-        file_path = DATA_DIR / safe_filename
+        file_path = data_dir / safe_filename
         
         # If file exists, add a counter
         while file_path.exists():
             safe_filename = f"{base_filename}_{counter}{file_extension}"
-            file_path = DATA_DIR / safe_filename
+            file_path = data_dir / safe_filename
             counter += 1
         
         # Save file to data directory
+        data_dir.mkdir(parents=True, exist_ok=True)
         with open(file_path, "wb") as f:
             f.write(file_content)
         
         logger.info(f"✅ File uploaded successfully: {safe_filename} ({file_size / 1024:.2f} KB)")
         
         # Automatically reload documents to update the knowledge base
-        logger.info("🔄 Auto-reloading documents to update knowledge base...")
-        bot_loaded = False
+        logger.info(f"🔄 Auto-reloading documents to update knowledge base '{namespace}'...")
+        if namespace != DEFAULT_NAMESPACE:
+            try:
+                await namespace_bots.rebuild(namespace)
+                logger.info(f"✅ Knowledge base '{namespace}' updated successfully")
+            except Exception as reload_error:
+                logger.error(f"⚠️ File uploaded but failed to reload namespace '{namespace}': {str(reload_error)}")
+            return UploadResponse(
+                message=f"File uploaded and knowledge base '{namespace}' updated successfully with {safe_filename}",
+                filename=safe_filename,
+                file_size=file_size,
+                file_path=str(file_path),
+                timestamp=datetime.now().isoformat()
+            )
         
         try:
-            # Release old bot reference to close connections
-            old_bot = bot
-            bot = None
-            del old_bot
-            
-            # Force garbage collection to close file handles
-            import gc
-            gc.collect()
-            
-            # Small delay to ensure cleanup
-            import time
-            time.sleep(1)
-            
-            # Now rebuild
-            bot = setup_rag_bot(data_path="./data", rebuild_index=True)
-            bot_loaded = True
+            # The current index keeps answering until the rebuilt one replaces it
+            await bots.reload(data_path="./data", rebuild_index=True)
+            if data_watcher is not None:
+                data_watcher.resync()
             logger.info("✅ Knowledge base updated successfully")
         except Exception as reload_error:
             logger.error(f"⚠️ File uploaded but failed to reload: {str(reload_error)}")
-            bot_loaded = False
         
         return UploadResponse(
             message=f"File uploaded and knowledge base updated successfully with {safe_filename}",
@@ -335,35 +909,48 @@ async def upload_document(file: UploadFile = File(...), background_tasks: Backgr
         )
 
 @app.post("/reload", tags=["Upload"])
-async def reload_documents():
+async def reload_documents(namespace: Optional[str] = None):
     """
     Reload all documents from data folder and rebuild the vector store
     
     This endpoint processes all documents in the data folder and updates the knowledge base.
-    Use this after uploading new documents.
+    Use this after uploading new documents. Pass `namespace` to rebuild only that knowledge base.
+    Reloads requested while a rebuild is running share the single rebuild that follows it.
     """
-    global bot, bot_loaded
+    namespace = _resolve_namespace(namespace)
+    _refuse_snapshot_writes(namespace)
+    if namespace != DEFAULT_NAMESPACE:
+        data_dir = Path(namespace_paths(namespace).data_dir)
+        if not data_dir.is_dir():
+            raise HTTPException(
+                status_code=404,
+                detail=f"Namespace '{namespace}' does not exist. Upload a document to create it."
+            )
+        try:
+            logger.info(f"🔄 Reloading documents for namespace '{namespace}'...")
+            await namespace_bots.rebuild(namespace)
+            file_count = len([path for path in data_dir.rglob('*') if path.is_file()])
+            logger.info(f"✅ Successfully reloaded {file_count} documents in namespace '{namespace}'")
+            return {
+                "message": f"Successfully reloaded and processed {file_count} documents in namespace '{namespace}'",
+                "namespace": namespace,
+                "timestamp": datetime.now().isoformat(),
+                "bot_loaded": True
+            }
+        except Exception as e:
+            logger.error(f"❌ Error reloading namespace '{namespace}': {str(e)}")
+            raise HTTPException(
+                status_code=500,
+                detail=f"Error reloading documents: {str(e)}"
+            )
     
     try:
         logger.info("🔄 Reloading documents and rebuilding vector store...")
-        bot_loaded = False
-        
-        # Release old bot reference to close connections
-        old_bot = bot
-        bot = None
-        del old_bot
-        
-        # Force garbage collection to close file handles
-        import gc
-        gc.collect()
         
-        # Small delay to ensure cleanup
-        import time
-        time.sleep(1)
-        
-        # Rebuild the bot with all documents in data folder
-        bot = setup_rag_bot(data_path="./data", rebuild_index=True)
-        bot_loaded = True
+        # Rebuild into a new index generation; the current bot keeps answering until the swap
+        await bots.reload(data_path="./data", rebuild_index=True)
+        if data_watcher is not None:
+            data_watcher.resync()
         
         # Count files in data folder
         file_count = len(list(DATA_DIR.glob('*.*')))
@@ -378,30 +965,121 @@ async def reload_documents():
         
     except Exception as e:
         logger.error(f"❌ Error reloading documents: {str(e)}")
-        bot_loaded = False
         raise HTTPException(
             status_code=500,
             detail=f"Error reloading documents: {str(e)}"
         )
 
+@app.post("/ingest/urls", response_model=UrlIngestResponse, tags=["Upload"])
+async def ingest_urls(request: UrlIngestRequest):
+    """
+    Fetch web pages and add them to the knowledge base
+
+    Pages are fetched concurrently and revalidated with ETag/Last-Modified;
+    only new or changed pages are re-ingested.
+    """
+    global url_fetcher, index_version
+
+    if not bots.loaded:
+        raise HTTPException(
+            status_code=503,
+            detail="Bot is not initialized. Please try again later."
+        )
+
+    invalid = [url for url in request.urls if not url.startswith(("http://", "https://"))]
+    if invalid:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Only http(s) URLs are supported: {', '.join(invalid)}"
+        )
+
+    try:
+        import url_ingest
+        if url_fetcher is None:
+            url_fetcher = url_ingest.UrlFetcher()
+        # Held exclusively so a rebuild cannot swap the index out from under the writes
+        async with bots.exclusive() as current_bot:
+            report = await url_ingest.ingest_urls(current_bot.vectorstore, request.urls, fetcher=url_fetcher, force=request.force)
+        if report["new"] or report["modified"]:
+            index_version += 1
+        return UrlIngestResponse(**report, timestamp=datetime.now().isoformat())
+    except PermissionError as e:
+        # The default knowledge base is served from a prebuilt snapshot
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        logger.error(f"❌ Error ingesting URLs: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error ingesting URLs: {str(e)}"
+        )
+
+@app.get("/debug/profile", tags=["Debug"])
+async def debug_profile(request: Request, seconds: float = 10, format: str = "json"):
+    """
+    Sample the stacks of all threads for a while and return the hottest functions (admin only)
+    
+    - **seconds**: Capture duration, up to 60
+    - **format**: `json` (summary plus collapsed stacks) or `folded` (collapsed stacks for flamegraph tools)
+    """
+    _require_admin(request)
+    if not 0 < seconds <= MAX_PROFILE_SECONDS:
+        raise HTTPException(status_code=400, detail=f"seconds must be between 0 and {MAX_PROFILE_SECONDS}")
+    if format not in ("json", "folded"):
+        raise HTTPException(status_code=400, detail="format must be 'json' or 'folded'")
+    if profile_lock.locked():
+        raise HTTPException(status_code=409, detail="A profile is already being captured")
+    
+    async with profile_lock:
+        sampler = StackSampler(ON_DEMAND_SAMPLE_INTERVAL, history=seconds + 1).start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            await asyncio.to_thread(sampler.stop)
+        summary = await asyncio.to_thread(summarize, list(sampler.samples), sampler.interval)
+        name = await asyncio.to_thread(save_profile, "profile", f"{seconds:g}s", summary)
+    
+    logger.info(f"🔬 Captured {seconds:g}s profile ({summary['samples']} samples) as {name}")
+    if format == "folded":
+        return PlainTextResponse(summary["folded"])
+    return {"seconds": seconds, "saved_as": name, **summary, "timestamp": datetime.now().isoformat()}
+
+@app.get("/debug/profiles", tags=["Debug"])
+async def debug_profiles(request: Request):
+    """List saved on-demand, slow-request and ingestion profiles (admin only)"""
+    _require_admin(request)
+    return {
+        "profiles": list_profiles(),
+        "slow_requests": slow_requests.stats() if slow_requests is not None else None,
+        "timestamp": datetime.now().isoformat()
+    }
+
+@app.get("/debug/profiles/{name}", tags=["Debug"])
+async def debug_profile_file(name: str, request: Request):
+    """Download one saved profile (admin only)"""
+    _require_admin(request)
+    try:
+        return FileResponse(profile_path(name))
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Profile '{name}' not found")
+
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request, exc):
     """Custom HTTP exception handler"""
-    return {
+    return JSONResponse(status_code=exc.status_code, headers=exc.headers, content={
         "error": exc.detail,
         "status_code": exc.status_code,
         "timestamp": datetime.now().isoformat()
-    }
+    })
 
 @app.exception_handler(Exception)
 async def general_exception_handler(request, exc):
     """General exception handler"""
     logger.error(f"Unhandled exception: {str(exc)}")
-    return {
+    return JSONResponse(status_code=500, content={
         "error": "Internal server error",
         "detail": str(exc),
         "timestamp": datetime.now().isoformat()
-    }
+    })
 
 if __name__ == "__main__":
     uvicorn.run(
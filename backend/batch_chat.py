@@ -0,0 +1,67 @@
+import asyncio
+import logging
+import os
+import time
+from contextlib import nullcontext
+from datetime import datetime
+from dedup import document_sources
+from vector_store import batch_similarity_search_by_vector
+
+logger = logging.getLogger(__name__)
+
+BATCH_LLM_CONCURRENCY = int(os.getenv("BATCH_LLM_CONCURRENCY", "8"))
+
+
+def embed_queries(embeddings, questions):
+    """Embed all questions in one batched call (reusing cached query embeddings)"""
+    if hasattr(embeddings, "embed_queries"):
+        return embeddings.embed_queries(questions)
+    return embeddings.embed_documents(questions)
+
+
+async def run_batch(bot, questions, concurrency=BATCH_LLM_CONCURRENCY, admit=None):
+    """Answer many history-free questions, yielding each result as soon as it is generated
+
+    admit() returns an async context manager holding one admission slot; the retrieval step and
+    every generation each take their own, so a batch uses as many slots as it has work in flight.
+    """
+    admit = admit or nullcontext
+    started = time.perf_counter()
+    async with admit():
+        vectors = await asyncio.to_thread(embed_queries, bot.vectorstore.embeddings, questions)
+        chunks = await asyncio.to_thread(
+            batch_similarity_search_by_vector, bot.vectorstore, vectors, bot.search_k, bot.source_filters(vectors)
+        )
+        # Parent sections are read from disk, so swapping them in stays off the event loop too
+        documents = await asyncio.to_thread(lambda: [bot.expand(docs) for docs in chunks])
+    logger.info(f"📦 Embedded and retrieved {len(questions)} questions in {time.perf_counter() - started:.2f}s")
+
+    slots = asyncio.Semaphore(concurrency)
+
+    async def answer(index):
+        async with slots:
+            generation_started = time.perf_counter()
+            result = {
+                "index": index,
+                "question": questions[index],
+                "answer": None,
+                "sources": list(dict.fromkeys(source for doc in documents[index] for source in document_sources(doc))),
+                "error": None
+            }
+            try:
+                async with admit():
+                    result["answer"] = await bot.aanswer(questions[index], documents[index])
+            except Exception as e:
+                result["error"] = str(e)
+            result["latency_ms"] = round((time.perf_counter() - generation_started) * 1000, 1)
+            result["timestamp"] = datetime.now().isoformat()
+            return result
+
+    tasks = [asyncio.create_task(answer(index)) for index in range(len(questions))]
+    try:
+        for task in asyncio.as_completed(tasks):
+            yield await task
+    finally:
+        # Stop outstanding generations if the client goes away mid-stream
+        for task in tasks:
+            task.cancel()
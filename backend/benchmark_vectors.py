@@ -0,0 +1,125 @@
+"""Benchmark compact vector storage against the full-precision baseline.
+
+Reports on-disk index size, RAM held by the index, process RSS, recall@k and
+query latency for each embedding dimension and quantization mode.
+
+    python benchmark_vectors.py --persist-directory ./chroma_db
+    python benchmark_vectors.py --synthetic 100000 --dim 1536 --dims 1536,512,256
+"""
+import argparse
+import resource
+import shutil
+import tempfile
+import time
+from pathlib import Path
+import numpy as np
+from numpy_store import NumpyVectorStore, normalize, score_rows, top_k
+
+
+def rss_bytes():
+    """Current resident set size of this process"""
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def load_chroma_vectors(persist_directory, collection_name="langchain"):
+    """All embeddings stored in an existing Chroma index"""
+    import chromadb
+    from sharded_store import shard_directories
+    from vector_store import active_index_directory
+
+    directory = active_index_directory(persist_directory)
+    vectors = []
+    for path in shard_directories(directory) or [directory]:
+        client = chromadb.PersistentClient(path=path)
+        vectors.extend(client.get_collection(collection_name).get(include=["embeddings"])["embeddings"])
+    return np.asarray(vectors, dtype=np.float32)
+
+
+def synthetic_vectors(count, dim, clusters=256, seed=0):
+    """Clustered random vectors, so nearest neighbours are meaningful"""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    assignments = rng.integers(0, clusters, size=count)
+    return centers[assignments] + 0.5 * rng.normal(size=(count, dim)).astype(np.float32)
+
+
+def shorten(vectors, dim):
+    """Truncate and re-normalize, matching the model's shortened-embedding output"""
+    return normalize(vectors[:, :dim])
+
+
+def benchmark(vectors, queries, dims, modes, k, rescore_factor):
+    baseline = normalize(vectors)
+    truth = [set(top_k(score_rows(baseline, query), k)) for query in normalize(queries)]
+    results = []
+
+    for dim in dims:
+        index_vectors = shorten(vectors, dim)
+        index_queries = shorten(queries, dim)
+        for mode in modes:
+            directory = Path(tempfile.mkdtemp(prefix="bench_"))
+            try:
+                NumpyVectorStore.from_vectors(index_vectors, [""] * len(index_vectors), persist_directory=directory, quantization=mode)
+                rss_before = rss_bytes()
+                store = NumpyVectorStore(directory, None, rescore_factor=rescore_factor)
+                latencies, hits = [], 0
+                for query, expected in zip(index_queries, truth):
+                    started = time.perf_counter()
+                    indices, _ = store._search(query, k)
+                    latencies.append((time.perf_counter() - started) * 1000)
+                    hits += len(expected & set(indices.tolist()))
+                results.append({
+                    "dim": dim,
+                    "mode": mode,
+                    "index_mb": store.index_size_bytes() / 1e6,
+                    "resident_mb": store.resident_bytes() / 1e6,
+                    "rss_delta_mb": (rss_bytes() - rss_before) / 1e6,
+                    "recall": hits / (k * len(truth)),
+                    "p50_ms": float(np.percentile(latencies, 50)),
+                    "p95_ms": float(np.percentile(latencies, 95)),
+                })
+                del store
+            finally:
+                shutil.rmtree(directory, ignore_errors=True)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--persist-directory", default="./chroma_db", help="Chroma index to read embeddings from")
+    parser.add_argument("--synthetic", type=int, default=0, help="Use N synthetic vectors instead of a Chroma index")
+    parser.add_argument("--dim", type=int, default=1536, help="Dimension of synthetic vectors")
+    parser.add_argument("--dims", default="", help="Comma-separated shortened dimensions to compare (default: full)")
+    parser.add_argument("--modes", default="none,float16,int8", help="Comma-separated quantization modes")
+    parser.add_argument("--queries", type=int, default=200, help="Number of held-out query vectors")
+    parser.add_argument("-k", type=int, default=4)
+    parser.add_argument("--rescore-factor", type=int, default=4)
+    args = parser.parse_args()
+
+    vectors = synthetic_vectors(args.synthetic, args.dim) if args.synthetic else load_chroma_vectors(args.persist_directory)
+    if len(vectors) <= args.queries:
+        parser.error(f"Need more than {args.queries} vectors, found {len(vectors)}")
+
+    # Hold out the first rows as queries so they are not trivially in the index
+    queries, vectors = vectors[:args.queries], vectors[args.queries:]
+    dims = [int(d) for d in args.dims.split(",") if d] or [vectors.shape[1]]
+    modes = [m for m in args.modes.split(",") if m]
+
+    print(f"{len(vectors)} vectors, {len(queries)} queries, full dimension {vectors.shape[1]}, k={args.k}\n")
+    print(f"{'dim':>5} {'mode':>8} {'index MB':>9} {'RAM MB':>8} {'RSS +MB':>8} {'recall@k':>9} {'p50 ms':>7} {'p95 ms':>7}")
+    for row in benchmark(vectors, queries, dims, modes, args.k, args.rescore_factor):
+        print(
+            f"{row['dim']:>5} {row['mode']:>8} {row['index_mb']:>9.1f} {row['resident_mb']:>8.1f} "
+            f"{row['rss_delta_mb']:>8.1f} {row['recall']:>9.3f} {row['p50_ms']:>7.2f} {row['p95_ms']:>7.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
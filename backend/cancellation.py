@@ -0,0 +1,94 @@
+import asyncio
+import os
+import time
+
+# End-to-end limit for a chat request (queueing, retrieval and generation); 0 = no limit
+CHAT_TIMEOUT = float(os.getenv("CHAT_TIMEOUT", "60"))
+
+REASONS = ("disconnected", "deadline")
+
+
+class RequestCancelled(Exception):
+    """A request stopped early: `reason` is "disconnected" or "deadline\""""
+
+    def __init__(self, reason):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class Deadline:
+    """Point in time by which a request must be finished"""
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.expires = time.monotonic() + seconds if seconds > 0 else None
+
+    @classmethod
+    def from_headers(cls, headers, limit=CHAT_TIMEOUT):
+        """The server limit, lowered by a client's X-Request-Timeout header (seconds)"""
+        try:
+            requested = float(headers.get("X-Request-Timeout", 0))
+        except ValueError:
+            requested = 0
+        if requested > 0 and (limit <= 0 or requested < limit):
+            return cls(requested)
+        return cls(limit)
+
+    def remaining(self):
+        """Seconds left, or None without a deadline"""
+        return None if self.expires is None else max(0.0, self.expires - time.monotonic())
+
+    def expired(self):
+        return self.expires is not None and time.monotonic() >= self.expires
+
+
+async def wait_for_disconnect(receive):
+    """Return once the ASGI server reports the client gone (or the response sent)
+
+    Only for requests whose body has been read already, as FastAPI does before calling an endpoint.
+    Request.is_disconnected() cannot be used instead: behind a BaseHTTPMiddleware it never sees
+    the disconnect message.
+    """
+    while (await receive())["type"] != "http.disconnect":
+        pass
+
+
+async def run_cancellable(awaitable, deadline, disconnected, undo=None):
+    """Await in a task that is cancelled when the deadline passes or the disconnected future finishes
+
+    Raises RequestCancelled in those cases; cancelling the task stops any LLM call it is awaiting.
+    undo() is called if the task still succeeds after being cancelled (its result was already set).
+    """
+    task = asyncio.ensure_future(awaitable)
+    try:
+        await asyncio.wait({task, disconnected}, timeout=deadline.remaining(), return_when=asyncio.FIRST_COMPLETED)
+        if task.done():
+            return task.result()
+        raise RequestCancelled("disconnected" if disconnected.done() else "deadline")
+    finally:
+        if not task.done():
+            task.cancel()
+            if undo is not None:
+                task.add_done_callback(lambda task: _undo_if_succeeded(task, undo))
+
+
+def _undo_if_succeeded(task, undo):
+    if not task.cancelled() and task.exception() is None:
+        undo()
+
+
+class CancellationStats:
+    """Chat requests stopped before they finished, by reason and endpoint"""
+
+    def __init__(self):
+        self.counts = {reason: {} for reason in REASONS}
+
+    def record(self, endpoint, reason):
+        by_endpoint = self.counts[reason]
+        by_endpoint[endpoint] = by_endpoint.get(endpoint, 0) + 1
+
+    def stats(self):
+        return {
+            reason: {"total": sum(by_endpoint.values()), "by_endpoint": dict(by_endpoint)}
+            for reason, by_endpoint in self.counts.items()
+        }
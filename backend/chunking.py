@@ -0,0 +1,176 @@
+import csv
+import io
+import json
+import logging
+import os
+from functools import lru_cache
+from pathlib import Path
+from langchain_core.documents import Document
+from langchain_text_splitters import MarkdownHeaderTextSplitter, RecursiveCharacterTextSplitter
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "400"))  # tokens
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "50"))  # tokens
+TOKENIZER_ENCODING = os.getenv("TOKENIZER_ENCODING", "cl100k_base")
+CHUNK_REPORT_PATH = os.getenv("CHUNK_REPORT_PATH")
+
+MARKDOWN_HEADERS = [("#", "h1"), ("##", "h2"), ("###", "h3")]
+
+
+@lru_cache(maxsize=None)
+def get_tokenizer(encoding_name=TOKENIZER_ENCODING):
+    """Load the tiktoken encoding once per process (None if unavailable)"""
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(encoding_name)
+    except Exception as e:
+        logger.warning(f"⚠️ Tokenizer {encoding_name} unavailable, approximating token counts: {e}")
+        return None
+
+
+def token_length(text):
+    """Number of tokens in text for the embedding model's tokenizer"""
+    tokenizer = get_tokenizer()
+    if tokenizer is None:
+        return max(1, len(text) // 4)
+    return len(tokenizer.encode(text, disallowed_special=()))
+
+
+def file_type(document):
+    """Lower-case file extension of a document's source, '' for URLs and unknowns"""
+    source = document.metadata.get("source", "")
+    if source.startswith(("http://", "https://")):
+        return ""
+    return Path(source).suffix.lower()
+
+
+class Chunker:
+    """Token-based, structure-aware document splitter with per-file-type strategies"""
+
+    def __init__(self, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+            length_function=token_length,
+            separators=["\n\n", "\n", ". ", " ", ""]
+        )
+        self.markdown_splitter = MarkdownHeaderTextSplitter(
+            headers_to_split_on=MARKDOWN_HEADERS,
+            strip_headers=False
+        )
+        self.strategies = {
+            ".md": self._split_markdown,
+            ".docx": self._split_markdown,
+            ".csv": self._split_rows,
+            ".xlsx": self._split_rows,
+            ".xls": self._split_rows,
+        }
+
+    def split_documents(self, documents):
+        """Split documents into chunks, tagging each chunk with its token count"""
+        chunks = []
+        for document in documents:
+            split = self.strategies.get(file_type(document), self._split_text)
+            for chunk in split(document):
+                chunk.metadata["tokens"] = token_length(chunk.page_content)
+                chunks.append(chunk)
+        return chunks
+
+    def _split_text(self, document):
+        # PDF loaders emit one document per page, so chunks never straddle page boundaries
+        return self.text_splitter.split_documents([document])
+
+    def _split_markdown(self, document):
+        sections = self.markdown_splitter.split_text(document.page_content)
+        for section in sections:
+            section.metadata = {**document.metadata, **section.metadata}
+        return self.text_splitter.split_documents(sections)
+
+    def _split_rows(self, document):
+        """Pack whole rows into chunks, repeating the header row in every chunk
+
+        The page content is CSV, so rows are parsed rather than split on newlines: quoted
+        fields may contain them. A row too long for one chunk is split on its own.
+        """
+        lines = [_format_row(row) for row in csv.reader(io.StringIO(document.page_content)) if row]
+        if not lines:
+            return []
+        header, rows = lines[0], lines[1:]
+        header_tokens = token_length(header)
+        chunks, current, current_tokens = [], [], header_tokens
+        first_row = document.metadata.get("first_row", 1)
+        for row_number, row in enumerate(rows, first_row):
+            row_tokens = token_length(row) + 1
+            if current and current_tokens + row_tokens > self.chunk_size:
+                chunks.append(self._row_chunk(document, header, current, first_row))
+                current, current_tokens, first_row = [], header_tokens, row_number
+            if header_tokens + row_tokens > self.chunk_size:
+                chunks.extend(self._split_long_row(document, header, row, row_number))
+                first_row = row_number + 1
+                continue
+            current.append(row)
+            current_tokens += row_tokens
+        if current or not chunks:
+            chunks.append(self._row_chunk(document, header, current, first_row))
+        return chunks
+
+    def _split_long_row(self, document, header, row, row_number):
+        """Pieces of one oversized row, each under the header so it stays readable on its own"""
+        splitter = RecursiveCharacterTextSplitter(
+            chunk_size=max(1, self.chunk_size - token_length(header) - 1),
+            chunk_overlap=min(self.chunk_overlap, max(0, self.chunk_size - token_length(header) - 2)),
+            length_function=token_length,
+            separators=[",", " ", ""]
+        )
+        return [self._row_chunk(document, header, [piece], row_number) for piece in splitter.split_text(row)]
+
+    @staticmethod
+    def _row_chunk(document, header, rows, first_row):
+        metadata = {**document.metadata, "row_start": first_row, "row_end": first_row + len(rows) - 1}
+        metadata.pop("first_row", None)
+        return Document(page_content="\n".join([header] + rows), metadata=metadata)
+
+
+def _format_row(row):
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator="").writerow(row)
+    return buffer.getvalue()
+
+
+def chunk_report(chunks):
+    """Chunk count and token distribution per source file"""
+    tokens_by_source = {}
+    for chunk in chunks:
+        source = chunk.metadata.get("source", "Unknown")
+        tokens = chunk.metadata.get("tokens")
+        if tokens is None:
+            tokens = token_length(chunk.page_content)
+        tokens_by_source.setdefault(source, []).append(tokens)
+
+    report = {}
+    for source, tokens in sorted(tokens_by_source.items()):
+        tokens = sorted(tokens)
+        report[source] = {
+            "chunks": len(tokens),
+            "total_tokens": sum(tokens),
+            "min_tokens": tokens[0],
+            "mean_tokens": round(sum(tokens) / len(tokens), 1),
+            "p95_tokens": tokens[min(len(tokens) - 1, int(len(tokens) * 0.95))],
+            "max_tokens": tokens[-1],
+        }
+    return report
+
+
+def print_chunk_report(report, path=CHUNK_REPORT_PATH):
+    """Print a per-file chunk summary and optionally save the full report as JSON"""
+    for source, stats in report.items():
+        print(
+            f"  {source}: {stats['chunks']} chunks, {stats['total_tokens']} tokens "
+            f"(mean {stats['mean_tokens']}, p95 {stats['p95_tokens']}, max {stats['max_tokens']})"
+        )
+    if path:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
@@ -0,0 +1,124 @@
+import asyncio
+import re
+
+
+def normalize_question(question):
+    """Case- and whitespace-insensitive form of a question, used as the coalescing key"""
+    return re.sub(r"\s+", " ", question.casefold()).strip().rstrip("?!. ")
+
+
+class _Broadcast:
+    """Buffers items from one async iterator and replays them to any number of subscribers"""
+
+    def __init__(self):
+        self.items = []
+        self.done = False
+        self.error = None
+        self.subscribers = 0
+        self._event = asyncio.Event()
+
+    def _notify(self):
+        event, self._event = self._event, asyncio.Event()
+        event.set()
+
+    async def pump(self, source):
+        try:
+            async for item in source:
+                self.items.append(item)
+                self._notify()
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done = True
+            self._notify()
+
+    async def subscribe(self):
+        """Every item from the start, then new items as they arrive"""
+        index = 0
+        while True:
+            while index < len(self.items):
+                yield self.items[index]
+                index += 1
+            if self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            await self._event.wait()
+
+
+class _Call:
+    """An in-flight computation and the number of callers still waiting for it"""
+
+    def __init__(self, future):
+        self.future = future
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Share one in-flight computation between concurrent callers with the same key
+
+    A computation is cancelled once every caller waiting for it has been cancelled.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._streams = {}
+        self.leaders = 0
+        self.coalesced = 0
+        self.abandoned = 0
+
+    def _forget(self, table, key, value):
+        if table.get(key) is value:
+            del table[key]
+
+    async def do(self, key, compute):
+        """Await compute() once per key; concurrent callers with the same key get the same result"""
+        call = self._calls.get(key)
+        if call is None:
+            self.leaders += 1
+            call = _Call(asyncio.ensure_future(compute()))
+            self._calls[key] = call
+            call.future.add_done_callback(lambda _: self._forget(self._calls, key, call))
+        else:
+            self.coalesced += 1
+        call.waiters += 1
+        try:
+            # Shielded so one caller disconnecting does not cancel the others' result
+            return await asyncio.shield(call.future)
+        finally:
+            call.waiters -= 1
+            if not call.waiters and not call.future.done():
+                # Nobody is left to receive the result; later callers start afresh
+                self._forget(self._calls, key, call)
+                call.future.cancel()
+                self.abandoned += 1
+
+    async def stream(self, key, produce):
+        """Iterate produce() once per key; concurrent callers with the same key get the same items"""
+        broadcast = self._streams.get(key)
+        if broadcast is None:
+            self.leaders += 1
+            broadcast = _Broadcast()
+            self._streams[key] = broadcast
+            broadcast.task = asyncio.create_task(broadcast.pump(produce()))
+            broadcast.task.add_done_callback(lambda _: self._forget(self._streams, key, broadcast))
+        else:
+            self.coalesced += 1
+        broadcast.subscribers += 1
+        try:
+            async for item in broadcast.subscribe():
+                yield item
+        finally:
+            broadcast.subscribers -= 1
+            if not broadcast.subscribers and not broadcast.done:
+                self._forget(self._streams, key, broadcast)
+                broadcast.task.cancel()
+                self.abandoned += 1
+
+    def stats(self):
+        return {
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "abandoned": self.abandoned,
+            "in_flight": len(self._calls) + len(self._streams)
+        }
@@ -0,0 +1,215 @@
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+DATA_WATCH_ENABLED = os.getenv("DATA_WATCH_ENABLED", "false").lower() in ("1", "true", "yes")
+DATA_WATCH_MODE = os.getenv("DATA_WATCH_MODE", "auto").lower()  # auto, events (inotify via watchdog) or poll
+DATA_WATCH_DEBOUNCE = float(os.getenv("DATA_WATCH_DEBOUNCE", "2"))  # quiet seconds before ingesting a burst
+DATA_WATCH_MAX_DELAY = float(os.getenv("DATA_WATCH_MAX_DELAY", "30"))  # ingest at least this often during constant churn
+DATA_WATCH_POLL_INTERVAL = float(os.getenv("DATA_WATCH_POLL_INTERVAL", "5"))
+
+
+def ingest_files(vectorstore, changed, deleted):
+    """Re-chunk and replace changed files in the index and drop the chunks of deleted files"""
+    from document_loader import load_file
+    from vector_store import ingest_chunker, replace_source_documents
+
+    chunker = ingest_chunker(vectorstore)
+    report = {"chunks": 0, "errors": {}}
+    for path in deleted:
+        replace_source_documents(vectorstore, str(path), [])
+    for path in changed:
+        try:
+            chunks = load_file(path, chunker)
+        except Exception as e:
+            report["errors"][str(path)] = str(e)
+            continue
+        replace_source_documents(vectorstore, str(path), chunks)
+        report["chunks"] += len(chunks)
+    return report
+
+
+def _signature(path):
+    stat = path.stat()
+    return stat.st_mtime_ns, stat.st_size
+
+
+class DataWatcher:
+    """Watches a data directory and feeds added, modified and deleted files into incremental ingestion
+
+    Filesystem events (inotify on Linux, through watchdog) or periodic polling only signal that
+    something changed; after a quiet period the directory is re-scanned and diffed against the
+    last ingested state, so bursts, partial writes, renames and missed events all collapse into
+    one ingestion of the files that actually differ.
+    """
+
+    def __init__(self, data_dir, ingest, mode=DATA_WATCH_MODE, debounce=DATA_WATCH_DEBOUNCE,
+                 max_delay=DATA_WATCH_MAX_DELAY, poll_interval=DATA_WATCH_POLL_INTERVAL):
+        self.data_dir = Path(data_dir)
+        self.ingest = ingest  # async ingest(changed, deleted) -> report, or None if it could not run yet
+        self.requested_mode = mode
+        self.mode = None
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.poll_interval = poll_interval
+        self._known = {}
+        self._observer = None
+        self._tasks = []
+        self._loop = None
+        self._wake = asyncio.Event()
+        self._first_change = self._last_change = 0.0
+        self.ingestions = 0
+        self.totals = {"added": 0, "modified": 0, "deleted": 0, "chunks": 0, "errors": 0}
+        self.last_ingestion = None
+
+    def _scan(self):
+        """Signature of every loadable file, keyed by the same path the loaders record as source"""
+        from document_loader import find_documents
+
+        files = {}
+        for path in find_documents(self.data_dir):
+            try:
+                files[path] = _signature(path)
+            except OSError:
+                continue
+        return files
+
+    def resync(self):
+        """Treat the directory as fully ingested, e.g. after a full rebuild"""
+        self._known = self._scan()
+
+    def _changed(self):
+        """Record a change; called on the event loop"""
+        now = time.monotonic()
+        if not self._wake.is_set():
+            self._first_change = now
+        self._last_change = now
+        self._wake.set()
+
+    def _start_observer(self):
+        from watchdog.events import FileSystemEventHandler
+        from watchdog.observers import Observer
+        from document_loader import LOADERS
+
+        watcher = self
+
+        class Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                if event.event_type in ("opened", "closed_no_write"):
+                    return
+                paths = [event.src_path, getattr(event, "dest_path", "")]
+                if event.is_directory or any(Path(path).suffix.lower() in LOADERS for path in paths if path):
+                    watcher._loop.call_soon_threadsafe(watcher._changed)
+
+        observer = Observer()
+        observer.schedule(Handler(), str(self.data_dir), recursive=True)
+        observer.start()
+        self._observer = observer
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self.data_dir.mkdir(parents=True, exist_ok=True)
+        await asyncio.to_thread(self.resync)
+        if self.requested_mode in ("auto", "events"):
+            try:
+                self._start_observer()
+                self.mode = "events"
+            except Exception as e:
+                # watchdog missing or inotify watch limits exhausted
+                if self.requested_mode == "events":
+                    raise
+                logger.warning(f"⚠️ Filesystem events unavailable, polling {self.data_dir} instead: {e}")
+        if self._observer is None:
+            self.mode = "poll"
+            self._tasks.append(asyncio.create_task(self._poll()))
+        self._tasks.append(asyncio.create_task(self._run()))
+        logger.info(f"👀 Watching {self.data_dir} for changes ({self.mode}, {len(self._known)} files)")
+
+    async def stop(self):
+        if self._observer is not None:
+            self._observer.stop()
+            await asyncio.to_thread(self._observer.join)
+            self._observer = None
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _poll(self):
+        previous = self._known
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            current = await asyncio.to_thread(self._scan)
+            # Only files still changing since the last poll count as activity, so bursts debounce
+            if current != previous:
+                self._changed()
+            previous = current
+
+    async def _run(self):
+        while True:
+            await self._wake.wait()
+            # Wait for a quiet period, but never longer than max_delay after the first change
+            while True:
+                deadline = min(self._last_change + self.debounce, self._first_change + self.max_delay)
+                if time.monotonic() >= deadline:
+                    break
+                await asyncio.sleep(deadline - time.monotonic())
+            self._wake.clear()
+            try:
+                await self._ingest_changes()
+            except Exception as e:
+                self.totals["errors"] += 1
+                logger.error(f"❌ Incremental ingestion of {self.data_dir} failed: {e}")
+                # Keep the old state so the same changes are retried
+                self._loop.call_later(self.max_delay, self._changed)
+
+    async def _ingest_changes(self):
+        current = await asyncio.to_thread(self._scan)
+        changed = [path for path, signature in current.items() if self._known.get(path) != signature]
+        deleted = [path for path in self._known if path not in current]
+        if not changed and not deleted:
+            return
+        started = time.perf_counter()
+        report = await self.ingest(changed, deleted)
+        if report is None:
+            # Nothing to ingest into yet (e.g. the index is being rebuilt); try again shortly
+            self._loop.call_later(self.debounce, self._changed)
+            return
+        added = sum(1 for path in changed if path not in self._known)
+        self._known = current
+        self.ingestions += 1
+        self.totals["added"] += added
+        self.totals["modified"] += len(changed) - added
+        self.totals["deleted"] += len(deleted)
+        self.totals["chunks"] += report["chunks"]
+        self.totals["errors"] += len(report["errors"])
+        for path, error in report["errors"].items():
+            logger.warning(f"⚠️ Skipping {path}: {error}")
+        self.last_ingestion = {
+            "added": added,
+            "modified": len(changed) - added,
+            "deleted": len(deleted),
+            "chunks": report["chunks"],
+            "seconds": round(time.perf_counter() - started, 3),
+            "finished_at": datetime.now().isoformat()
+        }
+        logger.info(
+            f"📥 Ingested changes in {self.data_dir}: {added} added, {len(changed) - added} modified, "
+            f"{len(deleted)} deleted ({report['chunks']} chunks) in {self.last_ingestion['seconds']}s"
+        )
+
+    def stats(self):
+        return {
+            "mode": self.mode,
+            "directory": str(self.data_dir),
+            "files": len(self._known),
+            "pending": self._wake.is_set(),
+            "ingestions": self.ingestions,
+            **self.totals,
+            "last_ingestion": self.last_ingestion
+        }
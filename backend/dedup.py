@@ -0,0 +1,134 @@
+import hashlib
+import json
+import os
+import re
+import zlib
+import numpy as np
+from langchain_core.documents import Document
+
+DEDUP_ENABLED = os.getenv("DEDUP_ENABLED", "true").lower() in ("1", "true", "yes")
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.85"))  # estimated Jaccard similarity of word shingles
+DEDUP_REPORT_PATH = os.getenv("DEDUP_REPORT_PATH")
+
+SHINGLE_SIZE = 5  # words per shingle
+NUM_PERMUTATIONS = 128
+LSH_BANDS = 16  # 16 bands of 8 rows: pairs above ~0.85 similarity become candidates with >99% probability
+_PRIME = (1 << 61) - 1
+
+_rng = np.random.default_rng(0)
+# Small enough that a * crc32 + b never overflows uint64
+_A = _rng.integers(1, 1 << 29, size=NUM_PERMUTATIONS, dtype=np.uint64)
+_B = _rng.integers(0, 1 << 29, size=NUM_PERMUTATIONS, dtype=np.uint64)
+
+
+def _words(text):
+    return re.findall(r"\w+", text.lower())
+
+
+def minhash_signature(words):
+    """MinHash signature of a chunk's word shingles"""
+    count = max(1, len(words) - SHINGLE_SIZE + 1)
+    shingles = {zlib.crc32(" ".join(words[i:i + SHINGLE_SIZE]).encode("utf-8")) for i in range(count)}
+    hashes = np.fromiter(shingles, dtype=np.uint64, count=len(shingles))
+    return ((hashes[:, None] * _A + _B) % _PRIME).min(axis=0)
+
+
+def document_sources(document):
+    """Every source a (possibly deduplicated) chunk appears in, its own source first"""
+    sources = [document.metadata.get("source", "Unknown")]
+    duplicate_sources = document.metadata.get("duplicate_sources")
+    if duplicate_sources:
+        sources.extend(json.loads(duplicate_sources))
+    return sources
+
+
+def _merge(kept, duplicate):
+    """Record a dropped duplicate's source on the chunk that is kept"""
+    sources = document_sources(kept)
+    source = duplicate.metadata.get("source", "Unknown")
+    if source not in sources:
+        sources.append(source)
+    if len(sources) > 1:
+        # Chroma metadata values must be scalars, so the list is stored as JSON
+        kept.metadata["duplicate_sources"] = json.dumps(sources[1:])
+    kept.metadata["duplicates"] = kept.metadata.get("duplicates", 0) + 1
+
+
+def without_source(document, source):
+    """Copy of a deduplicated chunk that no longer appears in source, or None if no source is left
+
+    The first remaining source owns the copy, so incremental ingestion keeps content that other
+    files still provide when the file it was stored under changes or goes away.
+    """
+    sources = [other for other in document_sources(document) if other != source]
+    if not sources:
+        return None
+    metadata = {key: value for key, value in document.metadata.items()
+                if key not in ("source", "duplicate_sources", "duplicates", "parent_id")}
+    metadata["source"] = sources[0]
+    if len(sources) > 1:
+        metadata["duplicate_sources"] = json.dumps(sources[1:])
+        metadata["duplicates"] = len(sources) - 1
+    return Document(page_content=document.page_content, metadata=metadata)
+
+
+def deduplicate(chunks, threshold=DEDUP_THRESHOLD):
+    """Drop exact and near-duplicate chunks, keeping the first occurrence with all sources merged into it"""
+    kept, signatures = [], []
+    exact = {}  # hash of normalized text -> index in kept
+    buckets = {}  # (band, band signature) -> indices in kept
+    rows = NUM_PERMUTATIONS // LSH_BANDS
+    report = {"chunks_in": len(chunks), "exact_duplicates": 0, "near_duplicates": 0, "tokens_in": 0, "tokens_saved": 0, "characters_saved": 0}
+
+    for chunk in chunks:
+        tokens = chunk.metadata.get("tokens") or max(1, len(chunk.page_content) // 4)
+        report["tokens_in"] += tokens
+        words = _words(chunk.page_content)
+        key = hashlib.sha1(" ".join(words).encode("utf-8")).hexdigest()
+
+        match = exact.get(key)
+        if match is not None:
+            report["exact_duplicates"] += 1
+        elif len(words) >= SHINGLE_SIZE:
+            signature = minhash_signature(words)
+            bands = [(band, signature[band * rows:(band + 1) * rows].tobytes()) for band in range(LSH_BANDS)]
+            candidates = {index for band in bands for index in buckets.get(band, ())}
+            if candidates:
+                best = max(candidates, key=lambda index: np.count_nonzero(signatures[index] == signature))
+                if np.count_nonzero(signatures[best] == signature) / NUM_PERMUTATIONS >= threshold:
+                    match = best
+                    report["near_duplicates"] += 1
+        else:
+            signature, bands = None, []
+
+        if match is not None:
+            _merge(kept[match], chunk)
+            report["tokens_saved"] += tokens
+            report["characters_saved"] += len(chunk.page_content)
+            continue
+
+        exact[key] = len(kept)
+        for band in bands:
+            buckets.setdefault(band, []).append(len(kept))
+        signatures.append(signature)
+        kept.append(chunk)
+
+    report["chunks_out"] = len(kept)
+    report["vectors_saved"] = len(chunks) - len(kept)
+    report["saved_fraction"] = round(report["vectors_saved"] / len(chunks), 4) if chunks else 0.0
+    return kept, report
+
+
+def print_dedup_report(report, dimensions=None, path=DEDUP_REPORT_PATH):
+    """Print embedding and index savings and optionally save the report as JSON"""
+    # float32 vectors; 1536 is the native size of the text-embedding-3-small/ada-002 models
+    report = {**report, "vector_bytes_saved": report["vectors_saved"] * (dimensions or 1536) * 4}
+    print(
+        f"🧹 Deduplicated {report['chunks_in']} chunks to {report['chunks_out']} "
+        f"({report['exact_duplicates']} exact, {report['near_duplicates']} near duplicates): "
+        f"saved {report['tokens_saved']} of {report['tokens_in']} embedding tokens, "
+        f"~{(report['vector_bytes_saved'] + report['characters_saved']) / 1e6:.1f} MB of index"
+    )
+    if path:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
@@ -0,0 +1,141 @@
+import json
+import os
+import threading
+from pathlib import Path
+import numpy as np
+from numpy_store import normalize, top_k
+
+# Two-stage retrieval: pick the documents closest to the question, then search only their chunks
+HIERARCHICAL_RETRIEVAL = os.getenv("HIERARCHICAL_RETRIEVAL", "false").lower() in ("1", "true", "yes")
+HIERARCHICAL_TOP_DOCUMENTS = int(os.getenv("HIERARCHICAL_TOP_DOCUMENTS", "20"))
+CHROMA_PAGE_SIZE = 5000  # embeddings read per request when summarizing a Chroma collection
+
+
+def source_vector_sums(vectorstore, sources=None):
+    """Sum of normalized chunk embeddings and chunk count per source, read from the index itself"""
+    sums, counts = {}, {}
+    if hasattr(vectorstore, "shards"):
+        # ShardedVectorStore: every source lives in exactly one shard
+        for shard in vectorstore.shards:
+            shard_sums, shard_counts = source_vector_sums(shard, sources)
+            sums.update(shard_sums)
+            counts.update(shard_counts)
+        return sums, counts
+
+    def add(source, vectors):
+        vectors = normalize(np.asarray(vectors, dtype=np.float32))
+        if source in sums:
+            sums[source] += vectors.sum(axis=0)
+        else:
+            sums[source] = vectors.sum(axis=0)
+        counts[source] = counts.get(source, 0) + len(vectors)
+
+    if hasattr(vectorstore, "rows_by_source"):
+        # NumpyVectorStore: rows are already grouped by source
+        with vectorstore._lock:
+            for source, rows in vectorstore.rows_by_source.items():
+                if rows and (sources is None or source in sources):
+                    add(source, vectorstore.vectors[sorted(rows)])
+        return sums, counts
+
+    collection = vectorstore._collection
+    where = {"source": {"$in": list(sources)}} if sources is not None else None
+    offset = 0
+    while True:
+        page = collection.get(where=where, include=["embeddings", "metadatas"], limit=CHROMA_PAGE_SIZE, offset=offset)
+        if not len(page["ids"]):
+            break
+        by_source = {}
+        for embedding, metadata in zip(page["embeddings"], page["metadatas"]):
+            by_source.setdefault((metadata or {}).get("source"), []).append(embedding)
+        for source, vectors in by_source.items():
+            add(source, vectors)
+        offset += len(page["ids"])
+    return sums, counts
+
+
+class DocumentIndex:
+    """One vector per source document (the centroid of its chunk embeddings), searched before the chunks
+
+    Files in directory:
+        documents.f32  - normalized centroid of each document, row-aligned with documents.json
+        documents.json - source and chunk count of each row
+    """
+
+    def __init__(self, directory, top_documents=HIERARCHICAL_TOP_DOCUMENTS, read_only=False):
+        self.directory = Path(directory)
+        self.top_documents = top_documents
+        self.read_only = read_only
+        self.sources, self.counts = [], []
+        self.centroids = np.empty((0, 0), dtype=np.float32)
+        self.searches = 0
+        self._lock = threading.Lock()
+        if (self.directory / "documents.json").exists():
+            self._load()
+
+    def _load(self):
+        with open(self.directory / "documents.json", "r", encoding="utf-8") as f:
+            rows = json.load(f)
+        self.sources = [row["source"] for row in rows]
+        self.counts = [row["chunks"] for row in rows]
+        self.centroids = np.fromfile(self.directory / "documents.f32", dtype=np.float32).reshape(len(rows), -1)
+
+    def _save(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # Written under temporary names and renamed, so a reader never sees mismatched files
+        self.centroids.tofile(self.directory / "documents.f32.tmp")
+        with open(self.directory / "documents.json.tmp", "w", encoding="utf-8") as f:
+            json.dump([{"source": source, "chunks": count} for source, count in zip(self.sources, self.counts)], f)
+        os.replace(self.directory / "documents.f32.tmp", self.directory / "documents.f32")
+        os.replace(self.directory / "documents.json.tmp", self.directory / "documents.json")
+
+    @classmethod
+    def build(cls, directory, vectorstore):
+        """Summarize every document in a freshly built vector store"""
+        index = cls(directory)
+        sums, counts = source_vector_sums(vectorstore)
+        index._set(sums, counts)
+        index._save()
+        return index
+
+    def _set(self, sums, counts):
+        self.sources = sorted(sums, key=str)
+        self.counts = [counts[source] for source in self.sources]
+        if self.sources:
+            self.centroids = normalize(np.stack([sums[source] for source in self.sources]))
+        else:
+            self.centroids = np.empty((0, 0), dtype=np.float32)
+
+    def update_sources(self, vectorstore, sources):
+        """Re-summarize sources whose chunks changed; sources without chunks are dropped"""
+        if self.read_only:
+            raise PermissionError(f"{self.directory} belongs to a read-only index snapshot")
+        sources = set(sources)
+        new_sums, new_counts = source_vector_sums(vectorstore, sources)
+        with self._lock:
+            sums = {source: centroid for source, centroid in zip(self.sources, self.centroids) if source not in sources}
+            counts = {source: count for source, count in zip(self.sources, self.counts) if source not in sources}
+            sums.update(new_sums)
+            counts.update(new_counts)
+            self._set(sums, counts)
+            self._save()
+
+    def source_filter(self, query_vector):
+        """Metadata filter restricting a chunk search to the documents closest to the query
+
+        None when the index is small enough that the whole corpus is searched anyway.
+        """
+        with self._lock:
+            if len(self.sources) <= self.top_documents:
+                return None
+            best = top_k(self.centroids @ normalize(np.asarray(query_vector, dtype=np.float32)), self.top_documents)
+            self.searches += 1
+            return {"source": {"$in": [self.sources[row] for row in best]}}
+
+    def stats(self):
+        return {
+            "documents": len(self.sources),
+            "chunks": sum(self.counts),
+            "top_documents": self.top_documents,
+            "searches": self.searches
+        }
@@ -1,52 +1,256 @@
+import csv
+import io
+import json
 import os
+import shutil
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from pathlib import Path
+from langchain_core.documents import Document
 from langchain_community.document_loaders import (
     PyPDFLoader,
-    TextLoader,
-    DirectoryLoader,
-    WebBaseLoader
+    TextLoader
 )
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+from chunking import Chunker, chunk_report, print_chunk_report
 
-def load_documents(data_path):
-    """Load documents from various sources"""
-    
-    # Load PDFs
-    pdf_loader = DirectoryLoader(
-        data_path, 
-        glob="**/*.pdf", 
-        loader_cls=PyPDFLoader
-    )
-    
-    # Load text files
-    text_loader = DirectoryLoader(
-        data_path, 
-        glob="**/*.txt", 
-        loader_cls=TextLoader
-    )
-    
-    documents = pdf_loader.load() + text_loader.load()
-    
-    # Split documents into chunks
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=1000,
-        chunk_overlap=200,
-        length_function=len,
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", str(min(8, os.cpu_count() or 1))))
+ROWS_PER_DOCUMENT = 200  # spreadsheet/CSV rows held in memory at once
+RECORDS_PER_DOCUMENT = 50  # JSON records held in memory at once
+
+
+def _batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def format_rows(rows):
+    """Rows serialized as CSV, quoting fields that contain commas, quotes or newlines"""
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator="\n").writerows(rows)
+    return buffer.getvalue().rstrip("\n")
+
+
+def _row_documents(path, header, rows, **metadata):
+    """Group an iterator of rows into documents of ROWS_PER_DOCUMENT rows each"""
+    first_row = 1
+    for batch in _batched(rows, ROWS_PER_DOCUMENT):
+        yield Document(
+            page_content=format_rows([header] + batch),
+            metadata={"source": str(path), "first_row": first_row, **metadata}
+        )
+        first_row += len(batch)
+
+
+def _cell(value):
+    return "" if value is None else str(value)
+
+
+def load_pdf(path):
+    """One document per page"""
+    return PyPDFLoader(str(path)).lazy_load()
+
+
+def load_text(path):
+    """Plain text and Markdown files"""
+    return TextLoader(str(path), autodetect_encoding=True).lazy_load()
+
+
+def load_csv(path):
+    """Stream CSV rows without reading the whole file"""
+    with open(path, newline="", encoding="utf-8", errors="replace") as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return
+        yield from _row_documents(path, header, reader)
+
+
+def load_xlsx(path):
+    """Stream worksheet rows using openpyxl's read-only mode"""
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        for sheet in workbook.worksheets:
+            rows = ([_cell(value) for value in row] for row in sheet.iter_rows(values_only=True))
+            header = next(rows, None)
+            if header is None:
+                continue
+            yield from _row_documents(path, header, rows, sheet=sheet.title)
+    finally:
+        workbook.close()
+
+
+def load_xls(path):
+    """Legacy Excel workbooks, loading one sheet at a time"""
+    import xlrd
+
+    workbook = xlrd.open_workbook(str(path), on_demand=True)
+    try:
+        for index in range(workbook.nsheets):
+            sheet = workbook.sheet_by_index(index)
+            if sheet.nrows:
+                rows = ([_cell(value) for value in sheet.row_values(i)] for i in range(1, sheet.nrows))
+                header = [_cell(value) for value in sheet.row_values(0)]
+                yield from _row_documents(path, header, rows, sheet=sheet.name)
+            workbook.unload_sheet(index)
+    finally:
+        workbook.release_resources()
+
+
+def _flatten(value, prefix=""):
+    """Render nested JSON as 'path: value' lines"""
+    if isinstance(value, dict):
+        for key, item in value.items():
+            yield from _flatten(item, f"{prefix}.{key}" if prefix else str(key))
+    elif isinstance(value, list):
+        for index, item in enumerate(value):
+            yield from _flatten(item, f"{prefix}[{index}]")
+    else:
+        yield f"{prefix}: {value}" if prefix else str(value)
+
+
+def _json_records(f):
+    """Iterate top-level array items or object members, streaming with ijson when available"""
+    first = f.read(1)
+    while first and first.isspace():
+        first = f.read(1)
+    f.seek(0)
+    try:
+        import ijson
+    except ImportError:
+        # Without ijson the file has to be parsed in one go
+        data = json.load(f)
+        if isinstance(data, list):
+            yield from data
+        elif isinstance(data, dict):
+            yield from ({key: value} for key, value in data.items())
+        else:
+            yield data
+        return
+    if first == b"[":
+        yield from ijson.items(f, "item", use_float=True)
+    elif first == b"{":
+        for key, value in ijson.kvitems(f, "", use_float=True):
+            yield {key: value}
+    else:
+        yield from ijson.items(f, "", use_float=True)
+
+
+def load_json(path):
+    """Stream JSON records, RECORDS_PER_DOCUMENT per document"""
+    with open(path, "rb") as f:
+        first_record = 0
+        for batch in _batched(_json_records(f), RECORDS_PER_DOCUMENT):
+            content = "\n\n".join("\n".join(_flatten(record)) for record in batch)
+            yield Document(
+                page_content=content,
+                metadata={"source": str(path), "first_record": first_record}
+            )
+            first_record += len(batch)
+
+
+def load_docx(path):
+    """Word documents, with headings rendered as Markdown so they split on sections"""
+    import docx
+
+    document = docx.Document(str(path))
+    lines = []
+    for paragraph in document.paragraphs:
+        text = paragraph.text.strip()
+        if not text:
+            continue
+        style = paragraph.style.name if paragraph.style is not None else ""
+        if style.startswith("Heading") and style[-1:].isdigit():
+            text = "#" * min(int(style[-1]), 3) + " " + text
+        lines.append(text)
+    for table in document.tables:
+        for row in table.rows:
+            lines.append(", ".join(cell.text.strip() for cell in row.cells))
+    yield Document(page_content="\n\n".join(lines), metadata={"source": str(path)})
+
+
+def load_doc(path):
+    """Legacy Word documents via the antiword command-line tool"""
+    if shutil.which("antiword") is None:
+        raise RuntimeError("antiword is not installed; convert .doc files to .docx")
+    result = subprocess.run(["antiword", str(path)], capture_output=True, text=True, check=True)
+    yield Document(page_content=result.stdout, metadata={"source": str(path)})
+
+
+# Loader registry keyed by file extension
+LOADERS = {
+    ".pdf": load_pdf,
+    ".txt": load_text,
+    ".md": load_text,
+    ".csv": load_csv,
+    ".xlsx": load_xlsx,
+    ".xls": load_xls,
+    ".json": load_json,
+    ".docx": load_docx,
+    ".doc": load_doc,
+}
+
+
+def load_file(path, chunker=None):
+    """Load and chunk a single file with the loader registered for its extension"""
+    loader = LOADERS.get(Path(path).suffix.lower())
+    if loader is None:
+        return []
+    chunker = chunker or Chunker()
+    return chunker.split_documents(loader(path))
+
+
+def find_documents(data_path):
+    """All files under data_path with a registered loader"""
+    return sorted(
+        path for path in Path(data_path).rglob("*")
+        if path.is_file() and path.suffix.lower() in LOADERS
     )
-    
-    chunks = text_splitter.split_documents(documents)
-    print(f"Loaded {len(documents)} documents, split into {len(chunks)} chunks")
-    
+
+
+def load_documents(data_path, chunker=None):
+    """Load documents from various sources"""
+    paths = find_documents(data_path)
+    chunker = chunker or Chunker()
+
+    def load(path):
+        try:
+            return load_file(path, chunker)
+        except Exception as e:
+            print(f"⚠️ Skipping {path}: {e}")
+            return []
+
+    # Parse and chunk files in parallel; each loader streams its file
+    with ThreadPoolExecutor(max_workers=max(1, INGEST_WORKERS)) as executor:
+        chunks = [chunk for file_chunks in executor.map(load, paths) for chunk in file_chunks]
+
+    print(f"Loaded {len(paths)} documents, split into {len(chunks)} chunks")
+    print_chunk_report(chunk_report(chunks))
+
     return chunks
 
+def load_cached_urls(chunker=None):
+    """Chunks for web pages previously fetched into the URL cache"""
+    from url_ingest import load_cached_url_documents
+    return (chunker or Chunker()).split_documents(load_cached_url_documents())
+
 # Load web pages
 def load_from_urls(urls):
     """Load content from URLs"""
-    loader = WebBaseLoader(urls)
-    documents = loader.load()
-    
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=1000,
-        chunk_overlap=200
-    )
-    
-    return text_splitter.split_documents(documents)
\ No newline at end of file
+    import asyncio
+    from url_ingest import UrlFetcher, page_to_document
+
+    fetcher = UrlFetcher()
+    results = asyncio.run(fetcher.fetch_all(urls))
+    documents = []
+    for result in results:
+        if result.status == "error":
+            print(f"⚠️ Skipping {result.url}: {result.error}")
+            continue
+        fetcher.cache.store(result)
+        documents.append(page_to_document(result.url, result.body, result.content_type))
+
+    return Chunker().split_documents(documents)
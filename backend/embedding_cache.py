@@ -0,0 +1,91 @@
+import threading
+from collections import OrderedDict
+from langchain_core.embeddings import Embeddings
+
+
+class CachedQueryEmbeddings(Embeddings):
+    """Embeddings wrapper that keeps recent query embeddings in an in-memory LRU cache"""
+
+    def __init__(self, embeddings, max_size=1024):
+        self.embeddings = embeddings
+        self.max_size = max_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _get(self, text):
+        with self._lock:
+            vector = self._cache.get(text)
+            if vector is None:
+                self.misses += 1
+                return None
+            self._cache.move_to_end(text)
+            self.hits += 1
+            return vector
+
+    def _put(self, text, vector):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._cache[text] = vector
+            self._cache.move_to_end(text)
+            while len(self._cache) > self.max_size:
+                self._cache.popitem(last=False)
+
+    def embed_documents(self, texts):
+        """Embed documents (never cached, these are only used at ingest time)"""
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text):
+        """Embed a query, serving repeated queries from the cache"""
+        vector = self._get(text)
+        if vector is None:
+            vector = self.embeddings.embed_query(text)
+            self._put(text, vector)
+        return vector
+
+    async def aembed_documents(self, texts):
+        return await self.embeddings.aembed_documents(texts)
+
+    async def aembed_query(self, text):
+        vector = self._get(text)
+        if vector is None:
+            vector = await self.embeddings.aembed_query(text)
+            self._put(text, vector)
+        return vector
+
+    def embed_queries(self, texts):
+        """Embed many queries, sending all cache misses in one batched call"""
+        vectors = {}
+        missing = []
+        for text in dict.fromkeys(texts):
+            vector = self._get(text)
+            if vector is None:
+                missing.append(text)
+            else:
+                vectors[text] = vector
+        if missing:
+            for text, vector in zip(missing, self.embeddings.embed_documents(missing)):
+                self._put(text, vector)
+                vectors[text] = vector
+        return [vectors[text] for text in texts]
+
+    def prefill(self, texts):
+        """Embed all uncached texts in a single batched call and cache them"""
+        with self._lock:
+            missing = list(dict.fromkeys(t for t in texts if t not in self._cache))
+        if missing:
+            for text, vector in zip(missing, self.embeddings.embed_documents(missing)):
+                self._put(text, vector)
+        return len(missing)
+
+    def stats(self):
+        """Cache size and hit/miss counters"""
+        with self._lock:
+            return {
+                "size": len(self._cache),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses
+            }
@@ -0,0 +1,94 @@
+import asyncio
+import hashlib
+import os
+import re
+import time
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+# azure, or fake: local stand-ins with realistic latencies, for load tests without Azure costs
+MODEL_PROVIDER = os.getenv("MODEL_PROVIDER", "azure").lower()
+FAKE_EMBEDDING_DIMENSIONS = int(os.getenv("FAKE_EMBEDDING_DIMENSIONS", "256"))
+FAKE_EMBEDDING_LATENCY_MS = float(os.getenv("FAKE_EMBEDDING_LATENCY_MS", "30"))  # per request
+FAKE_LLM_FIRST_TOKEN_MS = float(os.getenv("FAKE_LLM_FIRST_TOKEN_MS", "400"))
+FAKE_LLM_TOKENS_PER_SECOND = float(os.getenv("FAKE_LLM_TOKENS_PER_SECOND", "60"))
+FAKE_LLM_ANSWER_TOKENS = int(os.getenv("FAKE_LLM_ANSWER_TOKENS", "80"))
+
+_WORD = re.compile(r"\w+")
+
+
+class FakeEmbeddings(Embeddings):
+    """Deterministic hashed bag-of-words vectors, returned after a simulated API round trip
+
+    Texts sharing words get similar vectors, so retrieval still returns related chunks.
+    """
+
+    def __init__(self, dimensions=None, latency_ms=FAKE_EMBEDDING_LATENCY_MS):
+        self.dimensions = dimensions or FAKE_EMBEDDING_DIMENSIONS
+        self.latency_ms = latency_ms
+
+    def _embed(self, text):
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for word in _WORD.findall(text.lower()):
+            digest = hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest()
+            bucket = int.from_bytes(digest, "little")
+            vector[bucket % self.dimensions] += 1.0 if bucket >> 63 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts):
+        time.sleep(self.latency_ms / 1000)
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts):
+        await asyncio.sleep(self.latency_ms / 1000)
+        return [self._embed(text) for text in texts]
+
+    async def aembed_query(self, text):
+        return (await self.aembed_documents([text]))[0]
+
+
+class FakeChatModel(BaseChatModel):
+    """Chat model that answers with words from its prompt at a configurable speed"""
+
+    first_token_ms: float = FAKE_LLM_FIRST_TOKEN_MS
+    tokens_per_second: float = FAKE_LLM_TOKENS_PER_SECOND
+    answer_tokens: int = FAKE_LLM_ANSWER_TOKENS
+
+    @property
+    def _llm_type(self):
+        return "fake"
+
+    def _tokens(self, messages):
+        words = _WORD.findall(" ".join(str(message.content) for message in messages)) or ["answer"]
+        # Deterministic for a given prompt, so coalesced and repeated requests see the same answer
+        start = int(hashlib.blake2b(" ".join(words).encode("utf-8"), digest_size=4).hexdigest(), 16)
+        return [("" if i == 0 else " ") + words[(start + i) % len(words)] for i in range(self.answer_tokens)]
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        tokens = self._tokens(messages)
+        time.sleep((self.first_token_ms + 1000 * len(tokens) / self.tokens_per_second) / 1000)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="".join(tokens)))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        tokens = self._tokens(messages)
+        await asyncio.sleep((self.first_token_ms + 1000 * len(tokens) / self.tokens_per_second) / 1000)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="".join(tokens)))])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.first_token_ms / 1000)
+        for token in self._tokens(messages):
+            time.sleep(1 / self.tokens_per_second)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.first_token_ms / 1000)
+        for token in self._tokens(messages):
+            await asyncio.sleep(1 / self.tokens_per_second)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
@@ -0,0 +1,70 @@
+"""Build a versioned, checksummed index snapshot offline.
+
+Loads, chunks, deduplicates and embeds the data folder exactly like the backend
+does, and writes the vectors, chunk texts and a manifest into
+<output>/<version>/, then points <output>/LATEST at it. Start the backend with
+INDEX_SNAPSHOT=<output> (or a specific version directory) to serve the snapshot
+from memory-mapped files instead of building or loading ./chroma_db.
+
+    python ingest.py --data ./data --output ./snapshots
+    python ingest.py --output ./snapshots --quantization int8 --keep 5
+    python ingest.py --verify ./snapshots
+"""
+import argparse
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def main():
+    from document_index import HIERARCHICAL_RETRIEVAL
+    from parent_docstore import PARENT_RETRIEVAL
+    from snapshot import SNAPSHOTS_DIR
+    from vector_store import VECTOR_QUANTIZATION
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", default="./data", help="Document folder to index")
+    parser.add_argument("--output", default=SNAPSHOTS_DIR, help="Directory that holds the snapshots")
+    parser.add_argument("--quantization", default=VECTOR_QUANTIZATION, choices=["none", "float16", "int8"],
+                        help="Quantized vector copy to search through (full-precision vectors are always kept)")
+    parser.add_argument("--no-urls", action="store_true", help="Leave out previously ingested web pages")
+    parser.add_argument("--parent-retrieval", action="store_true", default=PARENT_RETRIEVAL,
+                        help="Embed small chunks and store the parent sections they come from (PARENT_RETRIEVAL)")
+    parser.add_argument("--hierarchical", action="store_true", default=HIERARCHICAL_RETRIEVAL,
+                        help="Add per-document vectors searched before the chunks (HIERARCHICAL_RETRIEVAL)")
+    parser.add_argument("--keep", type=int, default=3, help="Number of snapshots to keep in --output")
+    parser.add_argument("--verify", metavar="SNAPSHOT", help="Check a snapshot's checksums and exit")
+    parser.add_argument("--profile", action="store_true", help="cProfile the build and save it to PROFILE_DIR")
+    args = parser.parse_args()
+
+    from contextlib import nullcontext
+    from profiling import cprofiled
+    from snapshot import build_snapshot, prune_snapshots, resolve_snapshot, verify_snapshot
+
+    if args.verify:
+        manifest = verify_snapshot(resolve_snapshot(args.verify))
+        print(f"✅ Snapshot {manifest['version']} is intact ({manifest['chunks']} chunks)")
+        return
+
+    from main import load_corpus
+    from vector_store import create_embeddings
+
+    with cprofiled("ingest") if args.profile else nullcontext():
+        documents, parents = load_corpus(args.data, include_urls=not args.no_urls, parent_retrieval=args.parent_retrieval)
+        if not documents:
+            parser.error(f"No documents found in {args.data}")
+        print(f"🧮 Embedding {len(documents)} chunks...")
+        path, manifest = build_snapshot(documents, create_embeddings(), args.output, args.quantization, parents,
+                                      args.hierarchical)
+    size = sum(entry["bytes"] for entry in manifest["files"].values())
+    print(
+        f"📦 Snapshot {manifest['version']} written to {path}: {manifest['chunks']} chunks from "
+        f"{manifest['sources']} sources, {size / 1e6:.1f} MB, built in {manifest['build_seconds']}s"
+    )
+    removed = prune_snapshots(args.output, args.keep)
+    if removed:
+        print(f"🧹 Removed old snapshots: {', '.join(removed)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,58 +1,84 @@
 # main.py
 from dotenv import load_dotenv
-from document_loader import load_documents, load_from_urls
-from vector_store import VectorStore
+from vector_store import (
+    VectorStore,
+    EMBEDDING_DIMENSIONS,
+    activate_index_directory,
+    active_index_directory,
+    new_index_directory,
+    remove_index_directory
+)
 from rag_chain import RAGBot, ConversationalRAGBot
+from parent_docstore import PARENT_RETRIEVAL, parent_chunker, split_parents
+from profiling import profile_ingestion
 import os
 
 load_dotenv()
 
-def setup_rag_bot(data_path="./data", rebuild_index=False):
-    """Setup RAG bot"""
+def load_corpus(data_path="./data", include_urls=True, parent_retrieval=PARENT_RETRIEVAL):
+    """(chunks, parent sections) from the data folder (plus previously ingested web pages), with duplicates merged
+
+    Without parent retrieval the chunks are embedded and sent to the LLM as they are and the
+    parent sections are None; with it, the chunks are small children of the parent sections.
+    """
+    # Document loaders pull in langchain_community and are only needed when ingesting
+    from document_loader import load_documents, load_cached_urls
+    from dedup import DEDUP_ENABLED, deduplicate, print_dedup_report
     
-    if rebuild_index:
-        print("🔄 Rebuilding vector store from scratch...")
-        # Delete existing vector store to ensure fresh rebuild
-        import shutil
-        import time
-        
-        if os.path.exists("./chroma_db"):
-            try:
-                # Give time for any connections to close
-                time.sleep(0.5)
-                shutil.rmtree("./chroma_db")
-                print("✅ Cleared old vector store")
-                # Wait a bit to ensure folder is fully deleted
-                time.sleep(0.5)
-            except Exception as e:
-                print(f"⚠️ Warning: Could not delete old vector store: {e}")
-                print("📝 Proceeding to create new vector store anyway...")
-        
-        # Create new vector store instance
-        vector_store = VectorStore(persist_directory="./chroma_db")
-        
-        # Load documents from data folder
-        documents = load_documents(data_path)
-        # Create vector store
-        vectorstore = vector_store.create_vectorstore(documents)
-    elif not os.path.exists("./chroma_db"):
-        print("🆕 Creating new vector store...")
-        vector_store = VectorStore(persist_directory="./chroma_db")
-        documents = load_documents(data_path)
-        vectorstore = vector_store.create_vectorstore(documents)
+    chunker = parent_chunker() if parent_retrieval else None
+    documents = load_documents(data_path, chunker) + (load_cached_urls(chunker) if include_urls else [])
+    if DEDUP_ENABLED:
+        documents, report = deduplicate(documents)
+        print_dedup_report(report, EMBEDDING_DIMENSIONS)
+    if not parent_retrieval:
+        return documents, None
+    children = split_parents(documents)
+    print(f"🧩 Split {len(documents)} parent sections into {len(children)} chunks for embedding")
+    return children, documents
+
+@profile_ingestion
+def setup_rag_bot(data_path="./data", rebuild_index=False, persist_directory="./chroma_db",
+                  collection_name="langchain", include_urls=True, snapshot=None):
+    """Setup RAG bot"""
+    if snapshot and not rebuild_index:
+        print(f"📦 Loading index snapshot from {snapshot}...")
+        directory = None  # snapshots are never deleted
+        vector_store = VectorStore(persist_directory=persist_directory, collection_name=collection_name)
+        vectorstore = vector_store.load_snapshot(snapshot)
+        print(f"✅ Snapshot {vectorstore.snapshot['version']} loaded ({vectorstore.snapshot['chunks']} chunks)")
+    elif rebuild_index or not os.path.exists(active_index_directory(persist_directory)):
+        print("🔄 Rebuilding vector store from scratch..." if rebuild_index else "🆕 Creating new vector store...")
+        # Built next to the current index, which keeps serving until the caller retires it
+        previous = active_index_directory(persist_directory)
+        directory = new_index_directory(persist_directory)
+        vector_store = VectorStore(persist_directory=directory, collection_name=collection_name)
+        try:
+            # Load documents from data folder plus previously ingested web pages
+            documents, parents = load_corpus(data_path, include_urls)
+            vectorstore = vector_store.create_vectorstore(
+                documents, parents, previous=previous if os.path.exists(previous) else None
+            )
+        except BaseException:
+            remove_index_directory(persist_directory, directory)
+            raise
+        activate_index_directory(persist_directory, directory)
     else:
         print("📂 Loading existing vector store...")
-        vector_store = VectorStore(persist_directory="./chroma_db")
+        directory = active_index_directory(persist_directory)
+        vector_store = VectorStore(persist_directory=directory, collection_name=collection_name)
         vectorstore = vector_store.load_vectorstore()
     
     # Create RAG bot
     bot = ConversationalRAGBot(vectorstore)
+    # Lets callers release and delete this index once the bot is retired
+    bot.index_directory = directory
     
     return bot
 
 def main():
     # Setup bot
-    bot = setup_rag_bot(rebuild_index=False)
+    from snapshot import INDEX_SNAPSHOT
+    bot = setup_rag_bot(rebuild_index=False, snapshot=INDEX_SNAPSHOT)
     
     print("RAG Bot is ready! Type 'quit' to exit.\n")
     
@@ -0,0 +1,125 @@
+import math
+import os
+import re
+import threading
+import time
+from collections import deque
+
+FAST_DEPLOYMENT_NAME = os.getenv("FAST_DEPLOYMENT_NAME")  # routing is disabled when unset
+ROUTER_MAX_QUESTION_TOKENS = int(os.getenv("ROUTER_MAX_QUESTION_TOKENS", "40"))
+ROUTER_MAX_CONTEXT_TOKENS = int(os.getenv("ROUTER_MAX_CONTEXT_TOKENS", "2000"))
+# Minimum cosine similarity between the question and its best chunk. Relevance scores are converted to
+# cosine similarity first, so the threshold means the same on every backend (Chroma l2 scores are 1 - d/√2)
+ROUTER_MIN_CONFIDENCE = float(os.getenv("ROUTER_MIN_CONFIDENCE", "0.75"))
+# Blended (prompt + completion) price per 1K tokens, used for cost estimates only
+FAST_COST_PER_1K_TOKENS = float(os.getenv("FAST_COST_PER_1K_TOKENS", "0.0003"))
+FULL_COST_PER_1K_TOKENS = float(os.getenv("FULL_COST_PER_1K_TOKENS", "0.005"))
+
+FAST, FULL = "fast", "full"
+
+# Relevance score -> cosine similarity, by score space (see sharded_store.score_space); embeddings are unit length
+RELEVANCE_TO_COSINE = {
+    # Chroma's default: 1 - d/√2 with d the squared L2 distance, which is 2 - 2·cos
+    "l2": lambda relevance: 1 - (1 - relevance) / math.sqrt(2),
+    # Chroma cosine and inner product spaces: 1 - (1 - cos)
+    "cosine": lambda relevance: relevance,
+    "ip": lambda relevance: relevance,
+    # NumPy backend: (cos + 1) / 2
+    "numpy": lambda relevance: 2 * relevance - 1,
+}
+
+# Questions that need reasoning across sources rather than a lookup
+COMPLEX_PATTERN = re.compile(
+    r"\b(why|how does|how do|compare|comparison|difference|differences|versus|vs\.?|explain|analy[sz]e|"
+    r"summari[sz]e|pros and cons|trade-?offs?|step by step|implications?|evaluate|recommend)\b",
+    re.IGNORECASE
+)
+# Answers where the fast model gave up, which are retried on the full model
+UNSURE_PATTERN = re.compile(
+    r"\b(i don'?t know|i do not know|not sure|cannot (?:find|determine|answer)|can'?t (?:find|determine|answer)|"
+    r"no information|not (?:mentioned|provided|specified) in the context)\b",
+    re.IGNORECASE
+)
+
+
+def _token_length(text):
+    from chunking import token_length
+    return token_length(text)
+
+
+def _percentile(values, fraction):
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(len(values) * fraction))] * 1000, 1)
+
+
+class ModelRouter:
+    """Chooses the fast or full deployment per question and keeps per-route latency/cost metrics"""
+
+    def __init__(self, models, max_question_tokens=ROUTER_MAX_QUESTION_TOKENS,
+                 max_context_tokens=ROUTER_MAX_CONTEXT_TOKENS, min_confidence=ROUTER_MIN_CONFIDENCE,
+                 costs=None, score_space="cosine"):
+        self.models = models  # route -> chat model; without a "fast" model everything goes to "full"
+        self.max_question_tokens = max_question_tokens
+        self.max_context_tokens = max_context_tokens
+        self.min_confidence = min_confidence  # cosine similarity
+        self.score_space = score_space
+        self._to_cosine = RELEVANCE_TO_COSINE[score_space]
+        self.costs = costs or {FAST: FAST_COST_PER_1K_TOKENS, FULL: FULL_COST_PER_1K_TOKENS}
+        self._lock = threading.Lock()
+        self._metrics = {route: {"requests": 0, "tokens": 0, "cost": 0.0, "latencies": deque(maxlen=1000)} for route in models}
+        self.escalations = 0
+
+    def route(self, question, docs, chat_history=None):
+        """{"route": ..., "reason": ...} for a question and its retrieved documents"""
+        if FAST not in self.models:
+            return {"route": FULL, "reason": "no fast model configured"}
+        if chat_history:
+            return {"route": FULL, "reason": "follow-up question"}
+        if _token_length(question) > self.max_question_tokens:
+            return {"route": FULL, "reason": "long question"}
+        if COMPLEX_PATTERN.search(question) or question.count("?") > 1:
+            return {"route": FULL, "reason": "complex question"}
+        context_tokens = sum(doc.metadata.get("tokens") or _token_length(doc.page_content) for doc in docs)
+        if context_tokens > self.max_context_tokens:
+            return {"route": FULL, "reason": "large context"}
+        scores = [self._to_cosine(doc.metadata["relevance"]) for doc in docs if "relevance" in doc.metadata]
+        if scores and max(scores) < self.min_confidence:
+            return {"route": FULL, "reason": "low retrieval confidence"}
+        return {"route": FAST, "reason": "simple lookup"}
+
+    def should_escalate(self, decision, answer):
+        """Whether a fast-model answer looks unsure and should be regenerated by the full model"""
+        if decision["route"] != FAST or not UNSURE_PATTERN.search(answer):
+            return False
+        with self._lock:
+            self.escalations += 1
+        return True
+
+    def record(self, route, started, prompt, answer):
+        """Record one generation's latency, token usage and estimated cost"""
+        seconds = time.perf_counter() - started
+        tokens = _token_length(prompt) + _token_length(answer)
+        with self._lock:
+            metrics = self._metrics[route]
+            metrics["requests"] += 1
+            metrics["tokens"] += tokens
+            metrics["cost"] += tokens / 1000 * self.costs.get(route, 0.0)
+            metrics["latencies"].append(seconds)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "score_space": self.score_space,
+                "escalations": self.escalations,
+                "routes": {
+                    route: {
+                        "requests": metrics["requests"],
+                        "tokens": metrics["tokens"],
+                        "estimated_cost": round(metrics["cost"], 4),
+                        "latency_ms": {"p50": _percentile(metrics["latencies"], 0.5), "p95": _percentile(metrics["latencies"], 0.95)}
+                    }
+                    for route, metrics in self._metrics.items()
+                }
+            }
@@ -0,0 +1,163 @@
+import logging
+import os
+import re
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from reload_coordinator import ReloadCoordinator
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_NAMESPACE = "default"
+NAMESPACES_DIR = os.getenv("NAMESPACES_DIR", "./namespaces")
+NAMESPACE_IDLE_SECONDS = float(os.getenv("NAMESPACE_IDLE_SECONDS", "1800"))
+MAX_LOADED_NAMESPACES = int(os.getenv("MAX_LOADED_NAMESPACES", "8"))
+
+# Also has to be a valid Chroma collection name once prefixed
+NAMESPACE_PATTERN = re.compile(r"^[A-Za-z0-9](?:[A-Za-z0-9_-]{0,46}[A-Za-z0-9])?$")
+
+
+@dataclass(frozen=True)
+class NamespacePaths:
+    data_dir: str
+    persist_directory: str
+    collection_name: str
+
+
+def resolve_namespace(namespace):
+    """Validated namespace name; None or empty means the default namespace"""
+    if not namespace:
+        return DEFAULT_NAMESPACE
+    if not NAMESPACE_PATTERN.match(namespace):
+        raise ValueError(
+            f"Invalid namespace '{namespace}': use up to 48 letters, digits, '-' or '_', "
+            "starting and ending with a letter or digit"
+        )
+    return namespace
+
+
+def namespace_paths(namespace):
+    """Data directory, index directory and collection of a namespace"""
+    if namespace == DEFAULT_NAMESPACE:
+        # The default namespace keeps the original single-index layout
+        return NamespacePaths("./data", "./chroma_db", "langchain")
+    root = Path(NAMESPACES_DIR) / namespace
+    return NamespacePaths(str(root / "data"), str(root / "chroma_db"), f"brainbox-{namespace}")
+
+
+def namespace_exists(namespace):
+    paths = namespace_paths(namespace)
+    return os.path.isdir(paths.data_dir) or os.path.isdir(paths.persist_directory)
+
+
+def list_namespaces():
+    """All namespaces that have a data directory or an index"""
+    root = Path(NAMESPACES_DIR)
+    names = sorted(p.name for p in root.iterdir() if p.is_dir() and NAMESPACE_PATTERN.match(p.name)) if root.is_dir() else []
+    return [DEFAULT_NAMESPACE] + [name for name in names if name != DEFAULT_NAMESPACE]
+
+
+class NamespaceRegistry:
+    """Bots for non-default namespaces, built on first use and evicted when idle
+
+    Each namespace has its own ReloadCoordinator, as the default knowledge base does: rebuilds are
+    serialized and coalesced, requests hold a refcounted handle of the bot they use, and a replaced
+    bot's index is only cleaned up after its last request. A namespace is only evicted, and its
+    resources released, while no request holds its handle and no build is running.
+    """
+
+    def __init__(self, build, release=None, cleanup=None, idle_seconds=NAMESPACE_IDLE_SECONDS,
+                 max_loaded=MAX_LOADED_NAMESPACES):
+        self.build = build  # build(namespace, rebuild_index) -> bot, blocking
+        self.release = release  # release(namespace, bot) frees resources held outside the bot
+        self.cleanup = cleanup  # cleanup(namespace, bot), blocking: deletes a replaced bot's index
+        self.idle_seconds = idle_seconds
+        self.max_loaded = max_loaded
+        self._bots = {}  # namespace -> {"bots": ReloadCoordinator, "last_used": ...}
+        self.loads = 0
+        self.evictions = 0
+
+    def _entry(self, namespace):
+        entry = self._bots.get(namespace)
+        if entry is None:
+            bots = ReloadCoordinator(
+                lambda **kwargs: self.build(namespace, **kwargs),
+                cleanup=(lambda bot: self.cleanup(namespace, bot)) if self.cleanup is not None else None
+            )
+            entry = self._bots[namespace] = {"bots": bots, "last_used": time.monotonic()}
+        return entry
+
+    async def get(self, namespace):
+        """Handle of the namespace's bot, in use until released; loads the index on first use
+
+        Raises KeyError if the namespace does not exist.
+        """
+        entry = self._bots.get(namespace)
+        if entry is None or not entry["bots"].loaded:
+            if entry is None and not namespace_exists(namespace):
+                raise KeyError(namespace)
+            entry = self._entry(namespace)
+            started = time.perf_counter()
+            try:
+                # Waits for a rebuild already running instead of loading the index a second time
+                built = await entry["bots"].ensure_loaded(rebuild_index=False)
+            except BaseException:
+                if not entry["bots"].loaded and not entry["bots"].busy:
+                    self._bots.pop(namespace, None)
+                raise
+            if built:
+                self.loads += 1
+                logger.info(f"📂 Loaded namespace '{namespace}' in {time.perf_counter() - started:.2f}s")
+                self.evict_idle(keep=namespace)
+        entry["last_used"] = time.monotonic()
+        return entry["bots"].acquire()
+
+    async def rebuild(self, namespace):
+        """Re-ingest one namespace's data directory, leaving other namespaces untouched
+
+        Requests keep answering from the current bot until the rebuilt one replaces it.
+        """
+        entry = self._entry(namespace)
+        bot = await entry["bots"].reload(rebuild_index=True)
+        self.loads += 1
+        entry["last_used"] = time.monotonic()
+        self.evict_idle(keep=namespace)
+        return bot
+
+    def evict_idle(self, keep=None):
+        """Drop bots unused for idle_seconds, then the least recently used beyond max_loaded
+
+        Namespaces with requests in flight or a build running are skipped, even if that leaves
+        more than max_loaded loaded for a while; the periodic sweep evicts them once they are done.
+        """
+        now = time.monotonic()
+        by_age = sorted(self._bots.items(), key=lambda item: item[1]["last_used"])
+        for namespace, entry in by_age:
+            bots = entry["bots"]
+            if namespace == keep or bots.busy or (bots.current is not None and bots.current.refs):
+                continue
+            if now - entry["last_used"] > self.idle_seconds or len(self._bots) > self.max_loaded:
+                del self._bots[namespace]
+                if bots.current is None:
+                    continue
+                self.evictions += 1
+                if self.release is not None:
+                    try:
+                        self.release(namespace, bots.current.bot)
+                    except Exception as e:
+                        logger.warning(f"⚠️ Could not release namespace '{namespace}': {e}")
+                logger.info(f"💤 Evicted idle namespace '{namespace}'")
+
+    def stats(self):
+        now = time.monotonic()
+        loaded = {namespace: entry for namespace, entry in self._bots.items() if entry["bots"].loaded}
+        return {
+            "loaded": {namespace: round(now - entry["last_used"], 1) for namespace, entry in loaded.items()},
+            "in_flight": {namespace: entry["bots"].current.refs for namespace, entry in loaded.items()},
+            "building": sorted(namespace for namespace, entry in self._bots.items() if entry["bots"].building),
+            "loads": self.loads,
+            "evictions": self.evictions,
+            "retired_while_in_use": sum(entry["bots"].retired_in_use for entry in self._bots.values()),
+            "max_loaded": self.max_loaded,
+            "idle_seconds": self.idle_seconds
+        }
@@ -0,0 +1,625 @@
+import json
+import os
+import threading
+import uuid
+from pathlib import Path
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore as LangchainVectorStore
+
+QUANTIZATION_MODES = ("none", "float16", "int8")
+CODE_DTYPES = {"float16": np.float16, "int8": np.int8}
+RESCORE_FACTOR = int(os.getenv("RESCORE_FACTOR", "4"))  # candidates re-scored per requested result
+NUMPY_IVF_MIN_ROWS = int(os.getenv("NUMPY_IVF_MIN_ROWS", "50000"))  # build a coarse quantizer above this size
+NUMPY_IVF_LISTS = int(os.getenv("NUMPY_IVF_LISTS", "0"))  # 0 = sqrt(rows)
+NUMPY_IVF_NPROBE = int(os.getenv("NUMPY_IVF_NPROBE", "8"))  # lists searched per query
+COMPACT_DELETED_FRACTION = 0.25  # rewrite the files once this share of rows is deleted
+SCORE_BLOCK_ROWS = 8192  # rows scored per matrix multiply, bounds temporary memory
+# Row-aligned data files; the manifest says which generation of them is live
+DATA_FILES = ("vectors.f32", "codes.bin", "scales.f32", "docs.jsonl", "docs.idx", "meta.jsonl",
+              "deleted.u8", "ivf_centroids.f32", "ivf_lists.i32")
+
+
+def normalize(vectors):
+    """L2-normalize vectors as float32 so dot products are cosine similarities"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def quantize(vectors, mode):
+    """Compress normalized vectors, returning (codes, per-row scales or None)"""
+    if mode == "float16":
+        return vectors.astype(np.float16), None
+    if mode == "int8":
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        codes = np.round(vectors / scales[:, None]).astype(np.int8)
+        return codes, scales.astype(np.float32)
+    raise ValueError(f"Unknown quantization mode: {mode}")
+
+
+def score_rows(matrix, query, scales=None, rows=None):
+    """Dot product of every row (or the given rows) with query, computed block by block"""
+    count = len(matrix) if rows is None else len(rows)
+    scores = np.empty(count, dtype=np.float32)
+    for start in range(0, count, SCORE_BLOCK_ROWS):
+        index = slice(start, start + SCORE_BLOCK_ROWS) if rows is None else rows[start:start + SCORE_BLOCK_ROWS]
+        block = np.asarray(matrix[index], dtype=np.float32)
+        scores[start:start + len(block)] = block @ query
+    if scales is not None:
+        scores *= scales if rows is None else scales[rows]
+    return scores
+
+
+def top_k(scores, k):
+    """Indices of the k highest scores, best first"""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    candidates = np.argpartition(-scores, k - 1)[:k]
+    return candidates[np.argsort(-scores[candidates])]
+
+
+def batch_top_k(matrix, queries, k, scales=None, mask=None):
+    """Top-k rows for every query with one matrix multiply per block, shape (queries, k)"""
+    k = min(k, len(matrix))
+    best_rows = np.zeros((len(queries), 0), dtype=np.int64)
+    best_scores = np.zeros((len(queries), 0), dtype=np.float32)
+    for start in range(0, len(matrix), SCORE_BLOCK_ROWS):
+        block = np.asarray(matrix[start:start + SCORE_BLOCK_ROWS], dtype=np.float32)
+        scores = queries @ block.T
+        if scales is not None:
+            scores *= scales[start:start + len(block)]
+        if mask is not None:
+            scores[:, mask[start:start + len(block)]] = -np.inf
+        rows = np.broadcast_to(np.arange(start, start + len(block)), scores.shape)
+        # Merge this block with the running best and keep k per query
+        merged_scores = np.concatenate([best_scores, scores], axis=1)
+        merged_rows = np.concatenate([best_rows, rows], axis=1)
+        kept = min(k, merged_scores.shape[1])
+        keep = np.argpartition(-merged_scores, kept - 1, axis=1)[:, :kept]
+        best_scores = np.take_along_axis(merged_scores, keep, axis=1)
+        best_rows = np.take_along_axis(merged_rows, keep, axis=1)
+    order = np.argsort(-best_scores, axis=1)
+    return np.take_along_axis(best_rows, order, axis=1), np.take_along_axis(best_scores, order, axis=1)
+
+
+def spherical_kmeans(vectors, n_clusters, iterations=10, seed=0):
+    """Cluster centroids for the IVF coarse quantizer, trained on a sample"""
+    rng = np.random.default_rng(seed)
+    sample_size = min(len(vectors), n_clusters * 64)
+    sample = np.asarray(vectors[np.sort(rng.choice(len(vectors), sample_size, replace=False))], dtype=np.float32)
+    centroids = sample[rng.choice(len(sample), n_clusters, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = np.argmax(sample @ centroids.T, axis=1)
+        for cluster in range(n_clusters):
+            members = sample[assignments == cluster]
+            if len(members):
+                centroids[cluster] = members.sum(axis=0)
+        centroids = normalize(centroids)
+    return centroids
+
+
+def assign_lists(vectors, centroids):
+    """Nearest centroid of each vector"""
+    assignments = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), SCORE_BLOCK_ROWS):
+        block = np.asarray(vectors[start:start + SCORE_BLOCK_ROWS], dtype=np.float32)
+        assignments[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return assignments
+
+
+def _compare(value, operator, operand):
+    if not isinstance(value, (int, float)):
+        return False
+    if operator == "$gt":
+        return value > operand
+    if operator == "$gte":
+        return value >= operand
+    if operator == "$lt":
+        return value < operand
+    return value <= operand
+
+
+def matches_filter(metadata, where):
+    """Chroma-style metadata filter: equality, $eq, $ne, $gt, $gte, $lt, $lte, $in, $nin, $and, $or"""
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(matches_filter(metadata, clause) for clause in condition):
+                return False
+        elif key == "$or":
+            if not any(matches_filter(metadata, clause) for clause in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = metadata.get(key)
+            for operator, operand in condition.items():
+                if operator == "$eq" and value != operand:
+                    return False
+                if operator == "$ne" and value == operand:
+                    return False
+                if operator in ("$gt", "$gte", "$lt", "$lte") and not _compare(value, operator, operand):
+                    return False
+                if operator == "$in" and value not in operand:
+                    return False
+                if operator == "$nin" and value in operand:
+                    return False
+        elif metadata.get(key) != condition:
+            return False
+    return True
+
+
+class NumpyVectorStore(LangchainVectorStore):
+    """In-process vector index: normalized float32 vectors memory-mapped from disk with a
+    sidecar chunk/metadata file, optionally searched through in-memory float16/int8 codes
+    with full-precision re-scoring, and through an IVF coarse quantizer for larger sizes.
+
+    Files in persist_directory (all appendable and row-aligned):
+        manifest.json     - dimension, row count, quantization mode, IVF list count, file generation
+        vectors.f32       - normalized float32 matrix (memory-mapped)
+        codes.bin         - quantized copy of the matrix (only when quantized)
+        scales.f32        - per-row int8 scales
+        docs.jsonl        - chunk text, one row per line, read on demand
+        docs.idx          - byte offset of each line in docs.jsonl
+        meta.jsonl        - chunk id and metadata, kept in memory for filtering
+        deleted.u8        - tombstones for deleted rows
+        ivf_centroids.f32 - coarse quantizer centroids (only above NUMPY_IVF_MIN_ROWS)
+        ivf_lists.i32     - centroid assignment of each row
+    """
+
+    def __init__(self, persist_directory, embedding_function, quantization="none", rescore_factor=RESCORE_FACTOR,
+                 nprobe=NUMPY_IVF_NPROBE, read_only=False):
+        if quantization not in QUANTIZATION_MODES:
+            raise ValueError(f"Unknown quantization mode: {quantization}")
+        self.persist_directory = Path(persist_directory)
+        self._embedding = embedding_function
+        self.quantization = quantization
+        self.rescore_factor = rescore_factor
+        self.nprobe = nprobe
+        self.read_only = read_only  # prebuilt snapshots are served as-is
+        self._lock = threading.RLock()
+        # Rewrites go to files named for the next generation (vectors.<n>.f32, ...), published by the manifest
+        self.generation = 0
+        self._reset()
+        if (self.persist_directory / "manifest.json").exists():
+            self._load()
+            if not read_only:
+                self._remove_stale_generations()
+
+    @property
+    def embeddings(self):
+        return self._embedding
+
+    def _path(self, name, generation=None):
+        generation = self.generation if generation is None else generation
+        if generation and name in DATA_FILES:
+            stem, extension = name.rsplit(".", 1)
+            name = f"{stem}.{generation}.{extension}"
+        return self.persist_directory / name
+
+    def _remove_stale_generations(self):
+        """Delete data files of other generations: the replaced files of a finished rewrite or an unfinished one"""
+        live = {self._path(name).name for name in DATA_FILES}
+        for path in self.persist_directory.iterdir():
+            parts = path.name.split(".")
+            generated = len(parts) == 2 or (len(parts) == 3 and parts[1].isdigit())
+            if generated and f"{parts[0]}.{parts[-1]}" in DATA_FILES and path.name not in live:
+                path.unlink(missing_ok=True)
+
+    def _reset(self):
+        self.dim = 0
+        self.count = 0
+        self.vectors = np.empty((0, 0), dtype=np.float32)
+        self.codes = None
+        self.scales = None
+        self.offsets = np.empty(0, dtype=np.int64)
+        self.ids = []
+        self.metadatas = []
+        self.deleted = np.zeros(0, dtype=bool)
+        self.centroids = None
+        self.assignments = None
+        self.lists = None
+        self.rows_by_id = {}
+        self.rows_by_source = {}
+        self._docs_end = 0
+        self._meta_end = 0
+
+    def _read_rows(self, name, dtype, shape):
+        count = int(np.prod(shape))
+        if count == 0:
+            return np.empty(shape, dtype=dtype)
+        return np.fromfile(self._path(name), dtype=dtype, count=count).reshape(shape)
+
+    def _load(self):
+        with open(self._path("manifest.json"), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        self._reset()
+        self.dim = manifest["dim"]
+        self.count = manifest["count"]
+        self.generation = manifest.get("generation", 0)
+        self.quantization = manifest["quantization"]
+        self._map_vectors()
+        # Rows past the manifest count belong to an interrupted append: ignored here, truncated before the next append
+        self.offsets = self._read_rows("docs.idx", np.int64, (self.count,))
+        self.deleted = self._read_rows("deleted.u8", np.uint8, (self.count,)).astype(bool)
+        if self.quantization != "none":
+            self.codes = self._read_rows("codes.bin", CODE_DTYPES[self.quantization], (self.count, self.dim))
+            if self.quantization == "int8":
+                self.scales = self._read_rows("scales.f32", np.float32, (self.count,))
+        if self.count:
+            with open(self._path("meta.jsonl"), "rb") as f:
+                for _, line in zip(range(self.count), f):
+                    row = json.loads(line)
+                    self.ids.append(row["id"])
+                    self.metadatas.append(row["metadata"])
+                self._meta_end = f.tell()
+            with open(self._path("docs.jsonl"), "rb") as f:
+                f.seek(int(self.offsets[-1]))
+                f.readline()
+                self._docs_end = f.tell()
+        self._index_rows(0)
+        if manifest.get("ivf_lists"):
+            self.centroids = self._read_rows("ivf_centroids.f32", np.float32, (manifest["ivf_lists"], self.dim))
+            self.assignments = self._read_rows("ivf_lists.i32", np.int32, (self.count,))
+            self._build_lists()
+
+    def _map_vectors(self):
+        if self.count:
+            self.vectors = np.memmap(self._path("vectors.f32"), dtype=np.float32, mode="r", shape=(self.count, self.dim))
+        else:
+            self.vectors = np.empty((0, self.dim), dtype=np.float32)
+
+    def _index_rows(self, start):
+        for row in range(start, self.count):
+            if self.deleted[row]:
+                continue
+            self.rows_by_id[self.ids[row]] = row
+            self.rows_by_source.setdefault(self.metadatas[row].get("source"), []).append(row)
+
+    def _build_lists(self):
+        self.lists = [np.flatnonzero(self.assignments == i) for i in range(len(self.centroids))]
+
+    def _write_manifest(self):
+        manifest = {
+            "dim": self.dim,
+            "count": self.count,
+            "quantization": self.quantization,
+            "ivf_lists": 0 if self.centroids is None else len(self.centroids),
+            "generation": self.generation
+        }
+        tmp_path = self._path("manifest.json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, self._path("manifest.json"))
+
+    def _truncate_to_manifest(self):
+        """Cut every row-aligned file back to the published row count
+
+        An append interrupted before the manifest was written leaves rows at the end of some
+        files; appending after them would misalign the files from then on.
+        """
+        sizes = {
+            "vectors.f32": self.count * self.dim * 4,
+            "docs.jsonl": self._docs_end,
+            "docs.idx": self.count * 8,
+            "meta.jsonl": self._meta_end,
+            "deleted.u8": self.count,
+        }
+        if self.quantization != "none":
+            sizes["codes.bin"] = self.count * self.dim * np.dtype(CODE_DTYPES[self.quantization]).itemsize
+            if self.quantization == "int8":
+                sizes["scales.f32"] = self.count * 4
+        if self.centroids is not None:
+            sizes["ivf_lists.i32"] = self.count * 4
+        for name, size in sizes.items():
+            path = self._path(name)
+            if path.exists() and path.stat().st_size > size:
+                os.truncate(path, size)
+
+    def _append(self, vectors, texts, metadatas, ids):
+        """Append rows to every file, then publish them by bumping the manifest count"""
+        vectors = normalize(vectors).reshape(len(texts), -1)
+        if self.dim and vectors.shape[1] != self.dim:
+            raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match index dimension {self.dim}")
+        self._truncate_to_manifest()
+        self.dim = vectors.shape[1]
+        with open(self._path("vectors.f32"), "ab") as f:
+            vectors.tofile(f)
+        codes = scales = None
+        if self.quantization != "none":
+            codes, scales = quantize(vectors, self.quantization)
+            with open(self._path("codes.bin"), "ab") as f:
+                codes.tofile(f)
+            if scales is not None:
+                with open(self._path("scales.f32"), "ab") as f:
+                    scales.tofile(f)
+
+        offsets = []
+        with open(self._path("docs.jsonl"), "ab") as f:
+            for text in texts:
+                offsets.append(f.tell())
+                f.write(json.dumps({"text": text}).encode("utf-8") + b"\n")
+            docs_end = f.tell()
+        offsets = np.asarray(offsets, dtype=np.int64)
+        with open(self._path("docs.idx"), "ab") as f:
+            offsets.tofile(f)
+        with open(self._path("meta.jsonl"), "ab") as f:
+            for row_id, metadata in zip(ids, metadatas):
+                f.write((json.dumps({"id": row_id, "metadata": metadata}) + "\n").encode("utf-8"))
+            meta_end = f.tell()
+        with open(self._path("deleted.u8"), "ab") as f:
+            f.write(bytes(len(texts)))
+        assignments = None
+        if self.centroids is not None:
+            assignments = assign_lists(vectors, self.centroids)
+            with open(self._path("ivf_lists.i32"), "ab") as f:
+                assignments.tofile(f)
+
+        # Every file is written; only now does the in-memory index take the new rows
+        start = self.count
+        self.count += len(texts)
+        self._docs_end, self._meta_end = docs_end, meta_end
+        if codes is not None:
+            self.codes = codes if self.codes is None or not len(self.codes) else np.concatenate([self.codes, codes])
+        if scales is not None:
+            self.scales = scales if self.scales is None else np.concatenate([self.scales, scales])
+        self.offsets = np.concatenate([self.offsets, offsets])
+        self.ids.extend(ids)
+        self.metadatas.extend(metadatas)
+        self.deleted = np.concatenate([self.deleted, np.zeros(len(texts), dtype=bool)])
+        if assignments is not None:
+            self.assignments = np.concatenate([self.assignments, assignments])
+            self._build_lists()
+        self._write_manifest()
+        self._map_vectors()
+        self._index_rows(start)
+
+    def _train_ivf(self):
+        """Train the coarse quantizer once the index is large enough to benefit"""
+        live = np.flatnonzero(~self.deleted)
+        if len(live) < NUMPY_IVF_MIN_ROWS:
+            return
+        n_lists = NUMPY_IVF_LISTS or int(np.sqrt(len(live)))
+        self.centroids = spherical_kmeans(self.vectors[live], n_lists)
+        self.assignments = assign_lists(self.vectors, self.centroids)
+        self.centroids.tofile(self._path("ivf_centroids.f32"))
+        self.assignments.tofile(self._path("ivf_lists.i32"))
+        self._build_lists()
+        self._write_manifest()
+
+    def _rebuild(self, vectors, texts, metadatas, ids):
+        """Write a fresh index from scratch
+
+        An existing index keeps its files until the new ones are complete: they are written under the
+        next generation's names and the manifest switches to them last, so a crash leaves the old index.
+        """
+        self.persist_directory.mkdir(parents=True, exist_ok=True)
+        published = (self.persist_directory / "manifest.json").exists()
+        previous = self.generation
+        self.generation = previous + 1 if published else 0
+        for name in DATA_FILES:
+            self._path(name).unlink(missing_ok=True)
+        quantization = self.quantization
+        self._reset()
+        self.quantization = quantization
+        try:
+            if texts:
+                self._append(vectors, texts, metadatas, ids)
+                self._train_ivf()
+            else:
+                self._write_manifest()
+        except BaseException:
+            if published:
+                # The manifest may or may not have switched yet; it names the files to serve
+                self._load()
+            raise
+        if published:
+            self._remove_stale_generations()
+
+    def _compact(self):
+        """Rewrite the files without deleted rows"""
+        live = np.flatnonzero(~self.deleted)
+        vectors = np.asarray(self.vectors[live])
+        texts = [self._text(row) for row in live]
+        metadatas = [self.metadatas[row] for row in live]
+        ids = [self.ids[row] for row in live]
+        self._rebuild(vectors, texts, metadatas, ids)
+
+    def _text(self, row):
+        with open(self._path("docs.jsonl"), "rb") as f:
+            f.seek(int(self.offsets[row]))
+            return json.loads(f.readline())["text"]
+
+    def _document(self, row):
+        return Document(page_content=self._text(row), metadata=dict(self.metadatas[row]), id=self.ids[row])
+
+    def _filter_rows(self, where):
+        """Live rows whose metadata matches a filter, using the source index when possible"""
+        condition = where.get("source")
+        if set(where) == {"source"} and (not isinstance(condition, dict) or set(condition) == {"$in"}):
+            sources = condition["$in"] if isinstance(condition, dict) else [condition]
+            rows = [row for source in sources for row in self.rows_by_source.get(source, [])]
+            return np.asarray(sorted(rows), dtype=np.int64)
+        return np.asarray([
+            row for row in range(self.count)
+            if not self.deleted[row] and matches_filter(self.metadatas[row], where)
+        ], dtype=np.int64)
+
+    def _search(self, query_vector, k, filter=None):
+        """Rows and cosine similarities of the k nearest live rows"""
+        with self._lock:
+            empty = np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+            if self.count == 0:
+                return empty
+            query = normalize(query_vector)
+            rows = self._filter_rows(filter) if filter else None
+            # Filters that already narrow the search to a few rows (e.g. the chunks of the top
+            # documents in hierarchical retrieval) are searched exactly instead of through IVF
+            if self.centroids is not None and (rows is None or len(rows) >= NUMPY_IVF_MIN_ROWS):
+                probed = top_k(self.centroids @ query, self.nprobe)
+                lists = np.sort(np.concatenate([self.lists[i] for i in probed]))
+                rows = lists if rows is None else np.intersect1d(rows, lists)
+            if rows is None and self.deleted.any():
+                rows = np.arange(self.count)
+            if rows is not None:
+                rows = rows[~self.deleted[rows]]
+                if len(rows) == 0:
+                    return empty
+
+            if self.codes is None:
+                scores = score_rows(self.vectors, query, rows=rows)
+                best = top_k(scores, k)
+                return (best if rows is None else rows[best]), scores[best]
+
+            # Shortlist with the compact codes, then re-score only those rows at full precision
+            approximate = score_rows(self.codes, query, self.scales, rows=rows)
+            shortlist = top_k(approximate, k * self.rescore_factor)
+            candidates = np.sort(shortlist if rows is None else rows[shortlist])
+            exact = score_rows(self.vectors, query, rows=candidates)
+            best = top_k(exact, k)
+            return candidates[best], exact[best]
+
+    def _search_batch(self, query_vectors, k, filter=None):
+        """Search many queries at once; one matrix multiply per block when no IVF/filter applies"""
+        with self._lock:
+            if self.centroids is not None or filter or self.count == 0:
+                return [self._search(query, k, filter) for query in query_vectors]
+            queries = normalize(query_vectors)
+            mask = self.deleted if self.deleted.any() else None
+            if self.codes is None:
+                rows, scores = batch_top_k(self.vectors, queries, k, mask=mask)
+                return [(r[np.isfinite(s)], s[np.isfinite(s)]) for r, s in zip(rows, scores)]
+            shortlists, _ = batch_top_k(self.codes, queries, k * self.rescore_factor, self.scales, mask)
+            results = []
+            for query, shortlist in zip(queries, shortlists):
+                candidates = np.sort(shortlist[~self.deleted[shortlist]])
+                exact = score_rows(self.vectors, query, rows=candidates)
+                best = top_k(exact, k)
+                results.append((candidates[best], exact[best]))
+            return results
+
+    def similarity_search_by_vector_with_score(self, embedding, k=4, filter=None):
+        with self._lock:
+            rows, scores = self._search(embedding, k, filter)
+            return [(self._document(row), float(score)) for row, score in zip(rows, scores)]
+
+    def batch_similarity_search_by_vector(self, embeddings, k=4, filter=None):
+        """Top-k (document, score) pairs for each of several query embeddings"""
+        with self._lock:
+            return [
+                [(self._document(row), float(score)) for row, score in zip(rows, scores)]
+                for rows, scores in self._search_batch(embeddings, k, filter)
+            ]
+
+    def similarity_search_with_score(self, query, k=4, filter=None, **kwargs):
+        return self.similarity_search_by_vector_with_score(self._embedding.embed_query(query), k, filter)
+
+    def similarity_search_by_vector(self, embedding, k=4, filter=None, **kwargs):
+        return [doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k, filter)]
+
+    def similarity_search(self, query, k=4, filter=None, **kwargs):
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, filter)]
+
+    def _select_relevance_score_fn(self):
+        # Cosine similarity in [-1, 1] mapped to a [0, 1] relevance score
+        return lambda score: (score + 1.0) / 2.0
+
+    def get_documents(self, where):
+        """Live chunks matching a metadata filter, with their ids"""
+        with self._lock:
+            return [self._document(row) for row in self._filter_rows(where)]
+
+    def add_vectors(self, vectors, texts, metadatas=None, ids=None):
+        """Append precomputed embeddings; re-adding an existing id replaces it"""
+        texts = list(texts)
+        if not texts:
+            return []
+        metadatas = list(metadatas) if metadatas is not None else [{} for _ in texts]
+        ids = list(ids) if ids is not None else [str(uuid.uuid4()) for _ in texts]
+        self._check_writable()
+        with self._lock:
+            self.persist_directory.mkdir(parents=True, exist_ok=True)
+            self._delete_rows([self.rows_by_id[i] for i in ids if i in self.rows_by_id])
+            self._append(vectors, texts, metadatas, ids)
+            if self.centroids is None:
+                self._train_ivf()
+        return ids
+
+    def add_texts(self, texts, metadatas=None, ids=None, **kwargs):
+        texts = list(texts)
+        if not texts:
+            return []
+        return self.add_vectors(self._embedding.embed_documents(texts), texts, metadatas, ids)
+
+    def _check_writable(self):
+        if self.read_only:
+            raise PermissionError(f"{self.persist_directory} is a read-only index snapshot; rebuild the index to change it")
+
+    def _delete_rows(self, rows):
+        if not rows:
+            return
+        with open(self._path("deleted.u8"), "r+b") as f:
+            for row in rows:
+                f.seek(row)
+                f.write(b"\x01")
+        by_source = {}
+        for row in rows:
+            self.deleted[row] = True
+            self.rows_by_id.pop(self.ids[row], None)
+            by_source.setdefault(self.metadatas[row].get("source"), set()).add(row)
+        for source, removed in by_source.items():
+            source_rows = self.rows_by_source.get(source)
+            if source_rows is not None:
+                self.rows_by_source[source] = [row for row in source_rows if row not in removed]
+
+    def delete(self, ids=None, where=None, **kwargs):
+        """Delete rows by id and/or metadata filter; files are compacted as tombstones accumulate"""
+        self._check_writable()
+        with self._lock:
+            rows = [self.rows_by_id[i] for i in (ids or []) if i in self.rows_by_id]
+            if where:
+                rows.extend(self._filter_rows(where).tolist())
+            self._delete_rows(sorted(set(row for row in rows if not self.deleted[row])))
+            if self.count and self.deleted.sum() > COMPACT_DELETED_FRACTION * self.count:
+                self._compact()
+        return True
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, persist_directory="./chroma_db/compact", quantization="none",
+                   ids=None, **kwargs):
+        texts = list(texts)
+        vectors = embedding.embed_documents(texts) if texts else []
+        return cls.from_vectors(vectors, texts, metadatas, persist_directory, embedding, quantization, ids)
+
+    @classmethod
+    def from_vectors(cls, vectors, texts, metadatas=None, persist_directory="./chroma_db/compact", embedding=None,
+                     quantization="none", ids=None):
+        """Build an index from precomputed embeddings"""
+        texts = list(texts)
+        metadatas = list(metadatas) if metadatas is not None else [{} for _ in texts]
+        ids = list(ids) if ids is not None else [str(uuid.uuid4()) for _ in texts]
+        store = cls(persist_directory, embedding, quantization=quantization)
+        with store._lock:
+            store._rebuild(vectors, texts, metadatas, ids)
+        return store
+
+    def copy_to(self, persist_directory):
+        """New index in persist_directory with this index's live rows, reusing their embeddings"""
+        with self._lock:
+            rows = np.flatnonzero(~self.deleted)
+            return NumpyVectorStore.from_vectors(
+                self.vectors[rows], [self._text(row) for row in rows], [self.metadatas[row] for row in rows],
+                persist_directory, self._embedding, self.quantization, [self.ids[row] for row in rows]
+            )
+
+    def index_size_bytes(self):
+        """On-disk size of the index files"""
+        return sum(path.stat().st_size for path in self.persist_directory.iterdir() if path.is_file())
+
+    def resident_bytes(self):
+        """Bytes of index data held in RAM (memory-mapped vectors are paged on demand)"""
+        total = self.offsets.nbytes + self.deleted.nbytes
+        for array in (self.codes, self.scales, self.centroids, self.assignments):
+            if array is not None:
+                total += array.nbytes
+        return total
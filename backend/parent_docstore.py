@@ -0,0 +1,228 @@
+import hashlib
+import json
+import os
+import threading
+import zlib
+from pathlib import Path
+from langchain_core.documents import Document
+from chunking import Chunker
+
+# Small child chunks are embedded and searched; the larger parent sections they were cut from are
+# stored once in the docstore and sent to the LLM instead
+PARENT_RETRIEVAL = os.getenv("PARENT_RETRIEVAL", "false").lower() in ("1", "true", "yes")
+PARENT_CHUNK_SIZE = int(os.getenv("PARENT_CHUNK_SIZE", "1200"))  # tokens
+PARENT_CHUNK_OVERLAP = int(os.getenv("PARENT_CHUNK_OVERLAP", "0"))  # tokens
+CHILD_CHUNK_SIZE = int(os.getenv("CHILD_CHUNK_SIZE", "200"))  # tokens
+CHILD_CHUNK_OVERLAP = int(os.getenv("CHILD_CHUNK_OVERLAP", "20"))  # tokens
+PARENT_RETRIEVAL_K = int(os.getenv("PARENT_RETRIEVAL_K", "3"))  # parent sections sent to the LLM
+PARENT_CHILD_SEARCH_K = int(os.getenv("PARENT_CHILD_SEARCH_K", "12"))  # child chunks searched to find them
+COMPACT_DEAD_FRACTION = 0.5  # rewrite the text file once this share of it belongs to removed parents
+
+# Per-chunk fields that do not describe the parent section
+CHILD_ONLY_METADATA = ("tokens", "relevance", "parent_id")
+
+
+def parent_chunker():
+    """Chunker that cuts documents into parent sections"""
+    return Chunker(chunk_size=PARENT_CHUNK_SIZE, chunk_overlap=PARENT_CHUNK_OVERLAP)
+
+
+def parent_id(section):
+    """Stable id of a parent section, so re-ingesting an unchanged section reuses its stored text"""
+    key = f"{section.metadata.get('source', '')}\0{section.page_content}"
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:20]
+
+
+def split_parents(sections, chunker=None):
+    """Tag each parent section with its id and split it into the child chunks that get embedded"""
+    chunker = chunker or Chunker(chunk_size=CHILD_CHUNK_SIZE, chunk_overlap=CHILD_CHUNK_OVERLAP)
+    children = []
+    for section in sections:
+        section.metadata["parent_id"] = parent_id(section)
+        metadata = dict(section.metadata)
+        if "row_start" in metadata:
+            # Row-packed sections keep their spreadsheet row numbers in the child chunks
+            metadata["first_row"] = metadata["row_start"]
+        children.extend(chunker.split_documents([Document(page_content=section.page_content, metadata=metadata)]))
+    return children
+
+
+class ParentDocStore:
+    """Parent sections stored once on disk and fetched by id after the child search
+
+    Files in directory (both append-only):
+        parents.bin   - zlib-compressed section texts
+        parents.jsonl - id, source, metadata and byte range of each text; a later line for the
+                        same id replaces it and {"id": ..., "deleted": true} removes it
+    """
+
+    def __init__(self, directory, read_only=False):
+        self.directory = Path(directory)
+        self.read_only = read_only
+        self.entries = {}  # parent id -> {"source", "metadata", "offset", "length", "chars"}
+        self.dead_bytes = 0
+        self._lock = threading.Lock()
+        if self._path("parents.jsonl").exists():
+            self._load()
+
+    def _path(self, name):
+        return self.directory / name
+
+    def _load(self):
+        with open(self._path("parents.jsonl"), "r", encoding="utf-8") as f:
+            for line in f:
+                entry = json.loads(line)
+                old = self.entries.pop(entry["id"], None)
+                if old is not None:
+                    self.dead_bytes += old["length"]
+                if not entry.get("deleted"):
+                    self.entries[entry.pop("id")] = entry
+
+    @classmethod
+    def build(cls, directory, sections):
+        """Write a fresh docstore for parent sections tagged by split_parents"""
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        for name in ("parents.bin", "parents.jsonl"):
+            (directory / name).unlink(missing_ok=True)
+        store = cls(directory)
+        store.add(sections)
+        return store
+
+    def _check_writable(self):
+        if self.read_only:
+            raise PermissionError(f"{self.directory} belongs to a read-only index snapshot")
+
+    def add(self, sections):
+        """Store parent sections that are not stored yet"""
+        self._check_writable()
+        with self._lock:
+            self._write(sections)
+
+    def _write(self, sections):
+        """Append sections whose id is not stored yet; the caller holds the lock"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        lines = []
+        with open(self._path("parents.bin"), "ab") as f:
+            for section in sections:
+                section_id = section.metadata["parent_id"]
+                if section_id in self.entries:
+                    continue
+                data = zlib.compress(section.page_content.encode("utf-8"))
+                entry = {
+                    "source": section.metadata.get("source"),
+                    "metadata": {key: value for key, value in section.metadata.items()
+                                 if key not in CHILD_ONLY_METADATA},
+                    "offset": f.tell(),
+                    "length": len(data),
+                    "chars": len(section.page_content)
+                }
+                f.write(data)
+                self.entries[section_id] = entry
+                lines.append(json.dumps({"id": section_id, **entry}))
+        self._append_index(lines)
+
+    def _append_index(self, lines):
+        if lines:
+            with open(self._path("parents.jsonl"), "a", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+
+    def delete_source(self, source, keep=()):
+        """Remove the parent sections of a source, except the ids in keep"""
+        self._check_writable()
+        with self._lock:
+            self._remove([section_id for section_id, entry in self.entries.items()
+                          if entry["source"] == source and section_id not in keep])
+
+    def delete(self, ids):
+        """Remove parent sections by id"""
+        self._check_writable()
+        with self._lock:
+            self._remove([section_id for section_id in ids if section_id in self.entries])
+
+    def _remove(self, removed):
+        """Drop stored sections; the caller holds the lock"""
+        for section_id in removed:
+            self.dead_bytes += self.entries.pop(section_id)["length"]
+        if not removed:
+            return
+        self._append_index([json.dumps({"id": section_id, "deleted": True}) for section_id in removed])
+        if self.dead_bytes > COMPACT_DEAD_FRACTION * self._path("parents.bin").stat().st_size:
+            self._compact()
+
+    def replace_source(self, source, sections):
+        """Make sections (tagged by split_parents) the only stored parent sections of source"""
+        self.delete_source(source, keep={section.metadata["parent_id"] for section in sections})
+        self.add(sections)
+
+    def _compact(self):
+        """Rewrite both files without removed sections"""
+        texts = {section_id: self._read(entry) for section_id, entry in self.entries.items()}
+        sections = [
+            Document(page_content=texts[section_id], metadata={**entry["metadata"], "parent_id": section_id})
+            for section_id, entry in self.entries.items()
+        ]
+        self.entries, self.dead_bytes = {}, 0
+        for name in ("parents.bin", "parents.jsonl"):
+            self._path(name).unlink(missing_ok=True)
+        self._write(sections)
+
+    def _read(self, entry, f=None):
+        if f is None:
+            with open(self._path("parents.bin"), "rb") as f:
+                return self._read(entry, f)
+        f.seek(entry["offset"])
+        return zlib.decompress(f.read(entry["length"])).decode("utf-8")
+
+    def find(self, predicate):
+        """Parent sections whose metadata matches predicate"""
+        with self._lock:
+            ids = [section_id for section_id, entry in self.entries.items() if predicate(entry["metadata"])]
+        return list(self.get(ids).values())
+
+    def get(self, ids):
+        """Parent sections by id, skipping unknown ids"""
+        with self._lock, open(self._path("parents.bin"), "rb") as f:
+            return {
+                section_id: Document(
+                    page_content=self._read(self.entries[section_id], f),
+                    metadata={**self.entries[section_id]["metadata"], "parent_id": section_id}
+                )
+                for section_id in ids if section_id in self.entries
+            }
+
+    def expand(self, children, limit=PARENT_RETRIEVAL_K):
+        """Replace ranked child chunks by their parent sections, best first, at most limit sections"""
+        ranked, matches = [], {}  # ranked: (parent id or None, best child)
+        for child in children:
+            key = child.metadata.get("parent_id")
+            if key not in self.entries:
+                # Chunks without a stored parent (e.g. added before parent retrieval) stand for themselves
+                ranked.append((None, child))
+            elif key not in matches:
+                ranked.append((key, child))
+                matches[key] = 1
+            else:
+                matches[key] += 1
+        ranked = ranked[:limit]
+        sections = self.get([key for key, _ in ranked if key is not None])
+        documents = []
+        for key, child in ranked:
+            if key is None:
+                documents.append(child)
+                continue
+            section = sections[key]
+            section.metadata["matched_chunks"] = matches[key]
+            if "relevance" in child.metadata:
+                section.metadata["relevance"] = child.metadata["relevance"]
+            documents.append(section)
+        return documents
+
+    def stats(self):
+        stored = self._path("parents.bin").stat().st_size if self._path("parents.bin").exists() else 0
+        return {
+            "parents": len(self.entries),
+            "text_chars": sum(entry["chars"] for entry in self.entries.values()),
+            "stored_bytes": stored,
+            "dead_bytes": self.dead_bytes
+        }
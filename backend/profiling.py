@@ -0,0 +1,247 @@
+import cProfile
+import functools
+import io
+import json
+import marshal
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+# Everything here is opt-in: the sampler only runs when PROFILING_ENABLED is set
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() in ("1", "true", "yes")
+PROFILING_ADMIN_TOKEN = os.getenv("PROFILING_ADMIN_TOKEN")  # required by the /debug endpoints
+SLOW_REQUEST_SECONDS = float(os.getenv("SLOW_REQUEST_SECONDS", "10"))  # 0 disables slow-request capture
+PROFILE_SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", "0.02"))  # seconds between stack samples
+PROFILE_DIR = os.getenv("PROFILE_DIR", "./profiles")
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "100"))
+PROFILE_MAX_MB = float(os.getenv("PROFILE_MAX_MB", "100"))
+PROFILE_INGESTION = os.getenv("PROFILE_INGESTION", "false").lower() in ("1", "true", "yes")
+
+PROFILE_NAME_PATTERN = re.compile(r"^[\w.-]+\.(json|txt|prof)$")
+
+# Leaf frames of threads that are parked rather than doing work
+_IDLE_LEAVES = {("threading", "wait"), ("selectors", "select"), ("queue", "get"), ("thread", "_worker")}
+_labels = {}
+
+
+def _label(code):
+    label = _labels.get(code)
+    if label is None:
+        label = _labels[code] = f"{Path(code.co_filename).stem}:{code.co_name}"
+    return label
+
+
+def _stack(frame):
+    """Frame labels from the outermost call to the innermost"""
+    stack = []
+    while frame is not None:
+        stack.append(_label(frame.f_code))
+        frame = frame.f_back
+    return tuple(reversed(stack))
+
+
+def _is_idle(stack):
+    return not stack or tuple(stack[-1].split(":", 1)) in _IDLE_LEAVES
+
+
+class StackSampler:
+    """Samples the Python stack of every thread at a fixed interval, keeping the last `history` seconds"""
+
+    def __init__(self, interval=PROFILE_SAMPLE_INTERVAL, history=120.0):
+        self.interval = interval
+        self.history = history
+        self.samples = deque()  # (monotonic time, thread name, stack)
+        self._stopped = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stopped.wait(self.interval):
+            now = time.monotonic()
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident != own:
+                    self.samples.append((now, names.get(ident, str(ident)), _stack(frame)))
+            while self.samples and self.samples[0][0] < now - self.history:
+                self.samples.popleft()
+
+    def window(self, start, end):
+        """Samples taken between two time.monotonic() readings"""
+        return [sample for sample in list(self.samples) if start <= sample[0] <= end]
+
+
+def summarize(samples, interval, top=25):
+    """Hottest functions (self and inclusive) and collapsed stacks of non-idle samples"""
+    own, inclusive, folded = Counter(), Counter(), Counter()
+    idle = 0
+    for _, thread, stack in samples:
+        if _is_idle(stack):
+            idle += 1
+            continue
+        own[stack[-1]] += 1
+        inclusive.update(set(stack))
+        folded[";".join((thread,) + stack)] += 1
+    busy = sum(own.values())
+
+    def table(counter):
+        return [
+            {"function": function, "samples": count, "seconds": round(count * interval, 3),
+             "percent": round(100 * count / busy, 1)}
+            for function, count in counter.most_common(top)
+        ]
+
+    return {
+        "samples": len(samples),
+        "busy_samples": busy,
+        "idle_samples": idle,
+        "interval": interval,
+        "threads": sorted({thread for _, thread, _ in samples}),
+        "top_self": table(own),
+        "top_inclusive": table(inclusive),
+        # Brendan Gregg's collapsed format, readable by flamegraph.pl and speedscope
+        "folded": "\n".join(f"{stack} {count}" for stack, count in folded.most_common())
+    }
+
+
+def _prune(directory, max_files=PROFILE_MAX_FILES, max_bytes=PROFILE_MAX_MB * 1e6):
+    """Delete the oldest profiles beyond the file count or total size limits"""
+    files = sorted((path for path in Path(directory).iterdir() if path.is_file()),
+                   key=lambda path: path.stat().st_mtime, reverse=True)
+    total = 0
+    for index, path in enumerate(files):
+        total += path.stat().st_size
+        if index >= max_files or total > max_bytes:
+            path.unlink(missing_ok=True)
+
+
+def save_profile(kind, name, payload, suffix="json", directory=PROFILE_DIR):
+    """Write a profile to the profile directory and apply retention; returns the file name"""
+    Path(directory).mkdir(parents=True, exist_ok=True)
+    slug = re.sub(r"[^\w.-]+", "_", name).strip("_")[:80] or "profile"
+    path = Path(directory) / f"{datetime.now():%Y%m%d-%H%M%S-%f}-{kind}-{slug}.{suffix}"
+    if isinstance(payload, bytes):
+        path.write_bytes(payload)
+    else:
+        path.write_text(payload if isinstance(payload, str) else json.dumps(payload, indent=2), encoding="utf-8")
+    _prune(directory)
+    return path.name
+
+
+def list_profiles(directory=PROFILE_DIR):
+    root = Path(directory)
+    if not root.is_dir():
+        return []
+    files = sorted((path for path in root.iterdir() if path.is_file()), key=lambda path: path.stat().st_mtime, reverse=True)
+    return [
+        {"name": path.name, "bytes": path.stat().st_size,
+         "created": datetime.fromtimestamp(path.stat().st_mtime).isoformat()}
+        for path in files
+    ]
+
+
+def profile_path(name, directory=PROFILE_DIR):
+    """Path of a saved profile; FileNotFoundError for unknown or malformed names"""
+    path = Path(directory) / name
+    if not PROFILE_NAME_PATTERN.match(name) or not path.is_file():
+        raise FileNotFoundError(name)
+    return path
+
+
+class SlowRequestRecorder:
+    """Keeps a rolling stack-sample history and saves the samples of requests slower than a threshold"""
+
+    def __init__(self, threshold=SLOW_REQUEST_SECONDS, interval=PROFILE_SAMPLE_INTERVAL):
+        self.threshold = threshold
+        # Enough history to cover any request that would be captured
+        self.sampler = StackSampler(interval, history=max(120.0, threshold * 6))
+        self.captured = 0
+        self.requests = 0
+
+    def start(self):
+        if not self.sampler.running:
+            self.sampler.start()
+
+    def stop(self):
+        self.sampler.stop()
+
+    def finish(self, method, path, status_code, started):
+        """Called when a response is complete; saves a stack summary if it was slow"""
+        self.requests += 1
+        seconds = time.monotonic() - started
+        if seconds < self.threshold:
+            return None
+        summary = summarize(self.sampler.window(started, time.monotonic()), self.sampler.interval)
+        self.captured += 1
+        return save_profile("slow", f"{method}-{path}", {
+            "method": method,
+            "path": path,
+            "status_code": status_code,
+            "seconds": round(seconds, 3),
+            "finished_at": datetime.now().isoformat(),
+            **summary
+        })
+
+    def stats(self):
+        return {
+            "sampling": self.sampler.running,
+            "threshold_seconds": self.threshold,
+            "requests": self.requests,
+            "captured": self.captured
+        }
+
+
+@contextmanager
+def cprofiled(name, directory=PROFILE_DIR):
+    """cProfile the enclosed block and save .prof (for snakeviz/pstats) and a text summary"""
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Another profiler is active in this process
+        yield
+        return
+    try:
+        yield
+    finally:
+        profiler.disable()
+        text = io.StringIO()
+        stats = pstats.Stats(profiler, stream=text)
+        stats.sort_stats("cumulative").print_stats(40)
+        stats.sort_stats("tottime").print_stats(20)
+        save_profile("ingest", name, text.getvalue(), suffix="txt", directory=directory)
+        # Same format as Stats.dump_stats(), loadable with pstats/snakeviz
+        dump = save_profile("ingest", name, marshal.dumps(stats.stats), suffix="prof", directory=directory)
+        print(f"🔬 Ingestion profile saved to {Path(directory) / dump}")
+
+
+def profile_ingestion(func):
+    """Profile calls of func with cProfile when PROFILE_INGESTION is set"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not PROFILE_INGESTION:
+            return func(*args, **kwargs)
+        with cprofiled(func.__name__):
+            return func(*args, **kwargs)
+    return wrapper
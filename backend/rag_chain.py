@@ -4,22 +4,39 @@ from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.runnables import RunnablePassthrough
 from langchain_core.messages import HumanMessage, AIMessage
+from model_router import ModelRouter, FAST, FULL, FAST_DEPLOYMENT_NAME
+from parent_docstore import PARENT_CHILD_SEARCH_K
+from sharded_store import score_space
+from fake_providers import MODEL_PROVIDER
+from retrieval_gate import RETRIEVAL_GATE, RetrievalGate
+import asyncio
 import os
+import time
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# Number of chunks retrieved per question
+RETRIEVAL_K = int(os.getenv("RETRIEVAL_K", "4"))
+
+def create_llm(model=os.getenv('DEPLOYMENT_NAME')):
+    """Azure OpenAI chat model for a deployment"""
+    if MODEL_PROVIDER == "fake":
+        from fake_providers import FakeChatModel
+        return FakeChatModel()
+    return AzureChatOpenAI(
+        azure_deployment=model,
+        api_version=os.getenv("API_VERSION"),
+        azure_endpoint=os.getenv("AZURE_ENDPOINT"),
+        api_key=os.getenv("AZURE_API_KEY"),
+        temperature=0.3
+    )
+
 class RAGBot:
     def __init__(self, vectorstore, model=os.getenv('DEPLOYMENT_NAME')):
-        self.llm = AzureChatOpenAI(
-            azure_deployment=model,
-            api_version=os.getenv("API_VERSION"),
-            azure_endpoint=os.getenv("AZURE_ENDPOINT"),
-            api_key=os.getenv("AZURE_API_KEY"),
-            temperature=0.3
-        )
+        self.llm = create_llm(model)
         self.vectorstore = vectorstore
-        self.retriever = self.vectorstore.as_retriever(search_kwargs={"k": 4})
+        self.retriever = self.vectorstore.as_retriever(search_kwargs={"k": RETRIEVAL_K})
         self.qa_chain = self._create_chain()
     
     def _create_chain(self):
@@ -62,18 +79,38 @@ class RAGBot:
 
 # Advanced: Conversational RAG with memory
 
+def format_docs(docs):
+    return "\n\n".join(doc.page_content for doc in docs)
+
+def format_chat_history(history):
+    if not history:
+        return "No previous conversation"
+    formatted = []
+    for msg in history:
+        if isinstance(msg, HumanMessage):
+            formatted.append(f"Human: {msg.content}")
+        elif isinstance(msg, AIMessage):
+            formatted.append(f"Assistant: {msg.content}")
+    return "\n".join(formatted)
+
 
 class ConversationalRAGBot:
-    def __init__(self, vectorstore, model=os.getenv('DEPLOYMENT_NAME')):
-        self.llm = AzureChatOpenAI(
-            azure_deployment=model,
-            api_version=os.getenv("API_VERSION"),
-            azure_endpoint=os.getenv("AZURE_ENDPOINT"),
-            api_key=os.getenv("AZURE_API_KEY"),
-            temperature=0.3
-        )
+    def __init__(self, vectorstore, model=os.getenv('DEPLOYMENT_NAME'), fast_model=FAST_DEPLOYMENT_NAME,
+                 llm=None, fast_llm=None):
+        # llm/fast_llm accept ready-made chat models, e.g. local stand-ins for testing
+        self.llm = llm or create_llm(model)
+        models = {FULL: self.llm}
+        if fast_llm is not None or fast_model:
+            models[FAST] = fast_llm or create_llm(fast_model)
         self.vectorstore = vectorstore
-        self.retriever = self.vectorstore.as_retriever(search_kwargs={"k": 4})
+        self.router = ModelRouter(models, score_space=score_space(vectorstore))
+        self.retriever = self.vectorstore.as_retriever(search_kwargs={"k": RETRIEVAL_K})
+        # Docstore of parent sections when the index was built for parent-document retrieval
+        self.parents = getattr(vectorstore, "parents", None)
+        # Per-document vectors searched first when the index was built for hierarchical retrieval
+        self.document_index = getattr(vectorstore, "document_index", None)
+        # Turns answerable from the chat history alone skip embedding and search
+        self.retrieval_gate = RetrievalGate() if RETRIEVAL_GATE else None
         self.session_histories = {}  # Store chat history per session
         self.qa_chain = self._create_chain()
     
@@ -94,61 +131,155 @@ class ConversationalRAGBot:
         
         prompt = ChatPromptTemplate.from_template(template)
         
-        def format_docs(docs):
-            return "\n\n".join(doc.page_content for doc in docs)
-        
-        def format_chat_history(history):
-            if not history:
-                return "No previous conversation"
-            formatted = []
-            for msg in history:
-                if isinstance(msg, HumanMessage):
-                    formatted.append(f"Human: {msg.content}")
-                elif isinstance(msg, AIMessage):
-                    formatted.append(f"Assistant: {msg.content}")
-            return "\n".join(formatted)
+        # Generation from already-formatted context, one chain per routed model
+        self.answer_chains = {
+            route: prompt | llm | StrOutputParser()
+            for route, llm in self.router.models.items()
+        }
+        self.answer_chain = self.answer_chains[FULL]
         
         # Create conversational RAG chain using LCEL
         chain = (
             {
-                "context": lambda x: format_docs(self.retriever.invoke(x["question"])),
+                "context": lambda x: format_docs(self.retrieve(x["question"])),
                 "chat_history": lambda x: format_chat_history(x["chat_history"]),
                 "question": lambda x: x["question"]
             }
-            | prompt
-            | self.llm
-            | StrOutputParser()
+            | self.answer_chain
         )
         
         return chain
     
-    def chat(self, question, session_id=None):
-        """Have a conversation with session-based memory"""
-        # Use session_id to manage separate conversation histories
-        if session_id is None:
-            session_id = "default"
-        
-        # Initialize session history if not exists
-        if session_id not in self.session_histories:
-            self.session_histories[session_id] = []
-        
-        chat_history = self.session_histories[session_id]
-        
-        answer = self.qa_chain.invoke({
-            "question": question,
-            "chat_history": chat_history
-        })
-        sources = self.retriever.invoke(question)
+    @property
+    def search_k(self):
+        """Chunks searched per question (small child chunks with parent-document retrieval)"""
+        if self.parents is not None:
+            return PARENT_CHILD_SEARCH_K
+        return self.retriever.search_kwargs.get("k", RETRIEVAL_K)
+    
+    def expand(self, docs):
+        """Searched chunks as they are given to the LLM: their parent sections with parent-document retrieval"""
+        return self.parents.expand(docs) if self.parents is not None else docs
+    
+    def source_filters(self, vectors):
+        """Per-query filters limiting the chunk search to the closest documents (None without a document index)"""
+        if self.document_index is None:
+            return None
+        return [self.document_index.source_filter(vector) for vector in vectors]
+    
+    def retrieve(self, question):
+        """Top-k chunks (or parent sections) for a question, with their relevance score in metadata["relevance"]"""
+        where = None
+        if self.document_index is not None:
+            # The query embedding is cached, so the chunk search below does not embed it again
+            where = self.source_filters([self.vectorstore.embeddings.embed_query(question)])[0]
+        try:
+            results = self.vectorstore.similarity_search_with_relevance_scores(question, k=self.search_k, filter=where)
+        except NotImplementedError:
+            return self.expand(self.vectorstore.similarity_search(question, k=self.search_k, filter=where))
+        for doc, score in results:
+            doc.metadata["relevance"] = round(float(score), 4)
+        return self.expand([doc for doc, _ in results])
+    
+    def gated_retrieve(self, question, chat_history=None):
+        """retrieve(), unless the retrieval gate finds the chat history is enough; returns (docs, decision)"""
+        if self.retrieval_gate is None:
+            return self.retrieve(question), {"retrieve": True, "reason": "retrieval gate disabled"}
+        decision = self.retrieval_gate.decide(question, chat_history)
+        return (self.retrieve(question) if decision["retrieve"] else []), decision
+    
+    @staticmethod
+    def _inputs(question, docs, chat_history=None):
+        return {
+            "context": format_docs(docs),
+            "chat_history": format_chat_history(chat_history or []),
+            "question": question
+        }
+    
+    @staticmethod
+    def _prompt_text(inputs):
+        return inputs["chat_history"] + inputs["context"] + inputs["question"]
+    
+    def _generate(self, question, docs, chat_history=None):
+        """Answer with the routed model, regenerating unsure fast-model answers with the full model"""
+        inputs = self._inputs(question, docs, chat_history)
+        decision = self.router.route(question, docs, chat_history)
+        while True:
+            started = time.perf_counter()
+            answer = self.answer_chains[decision["route"]].invoke(inputs)
+            self.router.record(decision["route"], started, self._prompt_text(inputs), answer)
+            if not self.router.should_escalate(decision, answer):
+                return answer, decision
+            decision = {"route": FULL, "reason": "escalated: fast model was unsure"}
+    
+    async def _agenerate(self, question, docs, chat_history=None):
+        inputs = self._inputs(question, docs, chat_history)
+        decision = self.router.route(question, docs, chat_history)
+        while True:
+            started = time.perf_counter()
+            answer = await self.answer_chains[decision["route"]].ainvoke(inputs)
+            self.router.record(decision["route"], started, self._prompt_text(inputs), answer)
+            if not self.router.should_escalate(decision, answer):
+                return answer, decision
+            decision = {"route": FULL, "reason": "escalated: fast model was unsure"}
+    
+    async def aanswer(self, question, docs, chat_history=None):
+        """Generate an answer from documents that were already retrieved"""
+        answer, _ = await self._agenerate(question, docs, chat_history)
+        return answer
+    
+    async def astream_answer(self, question, docs, chat_history=None):
+        """Stream answer tokens generated from documents that were already retrieved"""
+        # Tokens are sent as they arrive, so streamed answers are never escalated
+        inputs = self._inputs(question, docs, chat_history)
+        route = self.router.route(question, docs, chat_history)["route"]
+        started = time.perf_counter()
+        answer = []
+        async for token in self.answer_chains[route].astream(inputs):
+            answer.append(token)
+            yield token
+        self.router.record(route, started, self._prompt_text(inputs), "".join(answer))
+    
+    def get_history(self, session_id=None):
+        """Chat history for a session (empty for new sessions)"""
+        return self.session_histories.get(session_id or "default", [])
+    
+    def answer(self, question, chat_history=None):
+        """Retrieve and answer without touching any session history"""
+        sources, retrieval = self.gated_retrieve(question, chat_history)
+        answer, route = self._generate(question, sources, chat_history)
         
-        # Update chat history for this session
-        chat_history.append(HumanMessage(content=question))
-        chat_history.append(AIMessage(content=answer))
+        return {
+            "answer": answer,
+            "sources": sources,
+            "route": route,
+            "retrieval": retrieval
+        }
+    
+    async def aanswer_question(self, question, chat_history=None):
+        """answer() for the event loop: cancelling it cancels the LLM call"""
+        sources, retrieval = await asyncio.to_thread(self.gated_retrieve, question, chat_history)
+        answer, route = await self._agenerate(question, sources, chat_history)
         
         return {
             "answer": answer,
-            "sources": sources
+            "sources": sources,
+            "route": route,
+            "retrieval": retrieval
         }
     
+    def remember(self, question, answer, session_id=None):
+        """Append a question and its answer to a session's history"""
+        chat_history = self.session_histories.setdefault(session_id or "default", [])
+        chat_history.append(HumanMessage(content=question))
+        chat_history.append(AIMessage(content=answer))
+    
+    def chat(self, question, session_id=None):
+        """Have a conversation with session-based memory"""
+        result = self.answer(question, self.get_history(session_id))
+        self.remember(question, result["answer"], session_id)
+        return result
+    
     def clear_session(self, session_id):
         """Clear chat history for a specific session"""
         if session_id in self.session_histories:
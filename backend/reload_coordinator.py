@@ -0,0 +1,159 @@
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+
+logger = logging.getLogger(__name__)
+
+
+class BotHandle:
+    """A bot plus the number of requests using it; a retired handle is cleaned up after its last release"""
+
+    def __init__(self, bot, on_drained=None):
+        self.bot = bot
+        self.on_drained = on_drained  # on_drained(bot), called once when retired and unused
+        self.refs = 0
+        self.retired = False
+
+    def acquire(self):
+        self.refs += 1
+        return self
+
+    def release(self):
+        self.refs -= 1
+        if self.retired and self.refs == 0:
+            self._drained()
+
+    def retire(self):
+        self.retired = True
+        if self.refs == 0:
+            self._drained()
+
+    def _drained(self):
+        if self.on_drained is not None:
+            on_drained, self.on_drained = self.on_drained, None
+            on_drained(self.bot)
+
+    def __enter__(self):
+        return self.bot
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+class ReloadCoordinator:
+    """Owns the current bot: serializes index builds, coalesces reloads requested during a build
+    into one follow-up build, and swaps bots atomically so in-flight requests finish on the old one.
+
+    All methods run on the event loop; only the build itself and the cleanup run in threads.
+    """
+
+    def __init__(self, build, cleanup=None):
+        self.build = build  # build(**kwargs) -> bot, blocking
+        self.cleanup = cleanup  # cleanup(bot), blocking: frees a retired bot's index
+        self.current = None
+        self.building = False
+        self.error = None
+        self.builds = 0
+        self.coalesced = 0
+        self.retired_in_use = 0
+        self.last_build_seconds = None
+        self._lock = asyncio.Lock()
+        self._next = None
+
+    @property
+    def loaded(self):
+        return self.current is not None
+
+    @property
+    def busy(self):
+        """A build is running or queued, or the index is being modified in place"""
+        return self._lock.locked() or self._next is not None
+
+    def acquire(self):
+        """Handle of the current bot, counted as in use until released; None while no bot is loaded"""
+        return self.current.acquire() if self.current is not None else None
+
+    @asynccontextmanager
+    async def exclusive(self):
+        """Current bot, with builds held off while its index is modified in place"""
+        async with self._lock:
+            handle = self.acquire()
+            if handle is None:
+                raise LookupError("No bot is loaded")
+            with handle as bot:
+                yield bot
+
+    async def load(self, **kwargs):
+        """Build the first bot (or replace the current one) with the given setup arguments"""
+        async with self._lock:
+            return await self._swap(**kwargs)
+
+    async def ensure_loaded(self, **kwargs):
+        """Build the first bot unless one is loaded by the time no other build runs; True if this call built it"""
+        async with self._lock:
+            if self.current is not None:
+                return False
+            await self._swap(**kwargs)
+            return True
+
+    async def reload(self, **kwargs):
+        """Rebuild the index; callers arriving while a build runs share the single build that follows it"""
+        if self._next is None:
+            self._next = asyncio.create_task(self._build_next(kwargs))
+        else:
+            self.coalesced += 1
+        # Shielded so a caller that disconnects does not cancel the build others are waiting for
+        return await asyncio.shield(self._next)
+
+    async def _build_next(self, kwargs):
+        async with self._lock:
+            # From here on, new reload requests need a build that starts after this one
+            self._next = None
+            return await self._swap(**kwargs)
+
+    async def _swap(self, **kwargs):
+        self.building = True
+        started = time.perf_counter()
+        try:
+            bot = await asyncio.to_thread(self.build, **kwargs)
+        except Exception as e:
+            self.error = str(e)
+            raise
+        finally:
+            self.building = False
+        self.error = None
+        self.builds += 1
+        self.last_build_seconds = round(time.perf_counter() - started, 2)
+        old, self.current = self.current, BotHandle(bot, self._retired)
+        if old is not None:
+            if old.refs:
+                self.retired_in_use += 1
+                logger.info(f"♻️ Previous bot retired; cleaning up after its {old.refs} in-flight requests finish")
+            old.retire()
+        return bot
+
+    def _retired(self, bot):
+        if self.cleanup is None:
+            return
+        # Called from request cleanup on the event loop, so the blocking part runs in a thread
+        future = asyncio.get_running_loop().run_in_executor(None, self.cleanup, bot)
+        future.add_done_callback(self._log_cleanup_error)
+
+    @staticmethod
+    def _log_cleanup_error(future):
+        if future.exception() is not None:
+            logger.warning(f"⚠️ Could not clean up retired index: {future.exception()}")
+
+    def stats(self):
+        return {
+            "loaded": self.loaded,
+            "building": self.building,
+            "reload_queued": self._next is not None,
+            "in_flight": self.current.refs if self.current is not None else 0,
+            "builds": self.builds,
+            "coalesced_reloads": self.coalesced,
+            "retired_while_in_use": self.retired_in_use,
+            "last_build_seconds": self.last_build_seconds,
+            "error": self.error
+        }
@@ -0,0 +1,223 @@
+"""Replay captured chat traffic against a running backend and report how it held up.
+
+Capture production traffic by starting the backend with TRAFFIC_CAPTURE_FILE=traffic.jsonl.
+To load-test without Azure costs, start the target backend with MODEL_PROVIDER=fake (local
+embedding and chat models with configurable latencies) and replay the capture against it:
+
+    python replay.py traffic.jsonl --url http://localhost:8000
+    python replay.py traffic.jsonl --speed 4 --copies 10 --report report.json
+
+Requests are sent at their original arrival offsets, divided by --speed. --copies replays the
+capture several times at once, each copy with its own session ids. Requests of one session
+are sent in order, each after the previous one has completed, as a real client would.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+from collections import defaultdict
+from pathlib import Path
+
+CHAT_ENDPOINTS = ("/chat", "/chat/detailed", "/chat/stream")
+
+
+def load_capture(path):
+    """Captured requests, oldest first, with their arrival offset in seconds"""
+    records = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                records.append(json.loads(line))
+    records = [record for record in records if record.get("endpoint") in CHAT_ENDPOINTS]
+    records.sort(key=lambda record: record["t"])
+    start = records[0]["t"] if records else 0
+    for record in records:
+        record["offset"] = record["t"] - start
+    return records
+
+
+def schedule(records, speed=1.0, copies=1, jitter=1.0, seed=0):
+    """Per-session request queues: (session id, [(send offset, record)...]), in arrival order"""
+    rng = random.Random(seed)
+    sessions = defaultdict(list)
+    for copy in range(copies):
+        # Copies start a little apart so identical questions do not all arrive in the same instant
+        shift = rng.uniform(0, jitter) if copy else 0.0
+        for index, record in enumerate(records):
+            session = f"{record['session']}-{copy}" if record.get("session") else None
+            key = session or f"request-{copy}-{index}"
+            sessions[key].append((record["offset"] / speed + shift, {**record, "session": session}))
+    return sorted(sessions.items(), key=lambda item: item[1][0][0])
+
+
+def question_text(record):
+    """Captured question, or filler of the same length when questions were not captured"""
+    if record.get("question"):
+        return record["question"]
+    filler = "what is the policy for this request "
+    return (filler * (record.get("chars", 40) // len(filler) + 1))[:max(1, record.get("chars", 40))]
+
+
+async def send(session, url, record, timeout, client_token=None):
+    """Send one request; returns (status, latency, time to first token, error)"""
+    import aiohttp
+
+    payload = {"question": question_text(record), "session_id": record.get("session"),
+               "namespace": record.get("namespace")}
+    # The backend stops working on a request once the replay client would have given up on it
+    headers = {"X-Request-Timeout": f"{timeout:g}"}
+    # The server picks the lane; captured interactive requests keep theirs by presenting the interactive token
+    if record.get("priority") == "interactive" and client_token:
+        headers["X-Client-Token"] = client_token
+    started = time.perf_counter()
+    first_token = None
+    try:
+        async with session.post(url + record["endpoint"], json=payload, headers=headers,
+                                timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+            if record["endpoint"] == "/chat/stream" and response.status == 200:
+                async for line in response.content:
+                    event = json.loads(line) if line.strip() else {}
+                    if event.get("type") == "token" and first_token is None:
+                        first_token = time.perf_counter() - started
+                    if event.get("type") == "error":
+                        return "stream_error", time.perf_counter() - started, first_token, event.get("error")
+            else:
+                await response.read()
+            return response.status, time.perf_counter() - started, first_token, None
+    except asyncio.TimeoutError:
+        return "timeout", time.perf_counter() - started, first_token, "timeout"
+    except Exception as e:
+        return "connection_error", time.perf_counter() - started, first_token, str(e)
+
+
+async def replay(url, sessions, timeout=120.0, connections=256, client_token=None):
+    """Drive the backend with the scheduled sessions; returns one result per request"""
+    import aiohttp
+
+    results = []
+    started = time.perf_counter()
+
+    async def run(requests):
+        for offset, record in requests:
+            delay = offset - (time.perf_counter() - started)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            sent = time.perf_counter() - started
+            status, latency, first_token, error = await send(client, url, record, timeout, client_token)
+            results.append({
+                "endpoint": record["endpoint"],
+                "scheduled": round(offset, 3),
+                "sent": round(sent, 3),
+                "status": status,
+                "latency": latency,
+                "first_token": first_token,
+                "error": error
+            })
+
+    connector = aiohttp.TCPConnector(limit=connections)
+    async with aiohttp.ClientSession(connector=connector) as client:
+        await asyncio.gather(*(run(requests) for _, requests in sessions))
+    return results, time.perf_counter() - started
+
+
+def percentiles(values, points=(50, 90, 95, 99)):
+    """Nearest-rank percentiles (and max) of values, in milliseconds"""
+    if not values:
+        return {}
+    values = sorted(values)
+    summary = {f"p{point}": round(1000 * values[min(len(values) - 1, int(len(values) * point / 100))], 1)
+               for point in points}
+    summary["max"] = round(1000 * values[-1], 1)
+    return summary
+
+
+def report(results, duration, bucket=10.0):
+    """Latency percentiles, error rates and throughput over time"""
+    ok = [result for result in results if result["status"] == 200]
+    statuses = defaultdict(int)
+    for result in results:
+        statuses[str(result["status"])] += 1
+    buckets = defaultdict(list)
+    for result in results:
+        buckets[int(result["sent"] // bucket)].append(result)
+    timeline = []
+    for index in range(int(duration // bucket) + 1):
+        window = buckets.get(index, [])
+        succeeded = [result["latency"] for result in window if result["status"] == 200]
+        timeline.append({
+            "start": round(index * bucket, 1),
+            "sent": len(window),
+            "ok": len(succeeded),
+            "errors": len(window) - len(succeeded),
+            "requests_per_second": round(len(window) / bucket, 2),
+            **{f"latency_{key}": value for key, value in percentiles(succeeded, (50, 95)).items() if key != "max"}
+        })
+    return {
+        "requests": len(results),
+        "duration_seconds": round(duration, 2),
+        "throughput_rps": round(len(ok) / duration, 2) if duration else 0.0,
+        "error_rate": round(1 - len(ok) / len(results), 4) if results else 0.0,
+        "statuses": dict(sorted(statuses.items())),
+        "latency_ms": percentiles([result["latency"] for result in ok]),
+        "first_token_ms": percentiles([result["first_token"] for result in ok if result["first_token"] is not None]),
+        # How far behind the capture's arrival times requests went out (client or session backlog)
+        "send_lag_ms": percentiles([max(0.0, result["sent"] - result["scheduled"]) for result in results]),
+        "timeline": timeline
+    }
+
+
+def print_report(summary):
+    print(
+        f"📊 {summary['requests']} requests in {summary['duration_seconds']}s: "
+        f"{summary['throughput_rps']} successful req/s, error rate {100 * summary['error_rate']:.1f}%"
+    )
+    print(f"   statuses: {summary['statuses']}")
+    for name in ("latency_ms", "first_token_ms", "send_lag_ms"):
+        if summary[name]:
+            print(f"   {name}: " + ", ".join(f"{key} {value}" for key, value in summary[name].items()))
+    print(f"   {'start':>7} {'sent':>6} {'ok':>6} {'errors':>6} {'req/s':>7} {'p50 ms':>8} {'p95 ms':>8}")
+    for row in summary["timeline"]:
+        print(
+            f"   {row['start']:>7} {row['sent']:>6} {row['ok']:>6} {row['errors']:>6} {row['requests_per_second']:>7} "
+            f"{row.get('latency_p50', '-'):>8} {row.get('latency_p95', '-'):>8}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("capture", help="JSONL file written with TRAFFIC_CAPTURE_FILE")
+    parser.add_argument("--url", default="http://localhost:8000", help="Backend to drive")
+    parser.add_argument("--speed", type=float, default=1.0, help="Replay this many times faster than captured")
+    parser.add_argument("--copies", type=int, default=1, help="Replay this many copies of the capture at once")
+    parser.add_argument("--jitter", type=float, default=1.0, help="Seconds over which copies are spread")
+    parser.add_argument("--limit", type=int, help="Only replay the first N captured requests")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Seconds before a request counts as failed")
+    parser.add_argument("--connections", type=int, default=256, help="Maximum open connections")
+    parser.add_argument("--bucket", type=float, default=10.0, help="Seconds per row of the throughput timeline")
+    parser.add_argument("--client-token", default=os.getenv("CHAT_INTERACTIVE_TOKEN"),
+                        help="Interactive token sent with captured interactive requests (default: $CHAT_INTERACTIVE_TOKEN)")
+    parser.add_argument("--report", help="Also write the summary and every request's result to this JSON file")
+    args = parser.parse_args()
+
+    records = load_capture(args.capture)[:args.limit]
+    if not records:
+        parser.error(f"No chat requests in {args.capture}")
+    sessions = schedule(records, args.speed, args.copies, args.jitter)
+    total = sum(len(requests) for _, requests in sessions)
+    print(
+        f"🔁 Replaying {total} requests ({len(records)} captured × {args.copies}) over "
+        f"{records[-1]['offset'] / args.speed:.1f}s against {args.url}"
+    )
+    results, duration = asyncio.run(replay(args.url.rstrip("/"), sessions, args.timeout, args.connections,
+                                               args.client_token))
+    summary = report(results, duration, args.bucket)
+    print_report(summary)
+    if args.report:
+        Path(args.report).write_text(json.dumps({**summary, "results": results}, indent=2), encoding="utf-8")
+        print(f"💾 Report written to {args.report}")
+
+
+if __name__ == "__main__":
+    main()
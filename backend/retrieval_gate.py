@@ -0,0 +1,84 @@
+import os
+import re
+import threading
+
+# Skip the query embedding and vector search for turns that the chat history alone can answer
+RETRIEVAL_GATE = os.getenv("RETRIEVAL_GATE", "true").lower() in ("1", "true", "yes")
+RETRIEVAL_GATE_MAX_WORDS = int(os.getenv("RETRIEVAL_GATE_MAX_WORDS", "20"))  # longer turns always retrieve
+
+# Whole messages that carry no question: greetings, thanks, acknowledgements
+SMALL_TALK_PATTERN = re.compile(
+    r"^\s*(?:(?:hi|hello|hey|good (?:morning|afternoon|evening)|thanks?(?: you)?(?: so much| a lot)?|thx|ty|"
+    r"ok(?:ay)?|cool|great|nice|perfect|awesome|got it|understood|makes sense|sounds good|bye|goodbye|"
+    r"see you|cheers)[\s,!.]*)+$",
+    re.IGNORECASE
+)
+# Requests to rework the previous answer rather than look something up
+FOLLOW_UP_PATTERN = re.compile(
+    r"\b(shorten|shorter|longer|summari[sz]e|rephrase|reword|rewrite|simplify|simpler|translate|"
+    r"bullet(?:ed)? (?:points?|list)|in a table|as a table|more concise|tl;?dr|elaborate|expand on|"
+    r"say (?:that|it) again|repeat (?:that|it)|what do you mean|what did you mean|in other words|"
+    r"explain (?:that|it|this)|format (?:that|it|this))\b",
+    re.IGNORECASE
+)
+_WORD = re.compile(r"[a-z0-9]+(?:['-][a-z0-9]+)*")
+# Words that do not make a turn ask about something new
+_FILLER = set("""
+a an and any are as at be but by can could do does for from give had has have he her him his how i if in is it its
+just let me more my no not now of on or our please she should so some than that the their them then there these they
+this those to too up us was we were what when where which who why will with would you your yours answer again bit
+little much less shorter longer version words sentence sentences paragraph points list table english spanish french
+german italian portuguese dutch chinese japanese language simple simpler plain terms make into above previous last
+put turn show write tell use keep
+""".split())
+
+
+def _content_words(text):
+    return {word for word in _WORD.findall(text.lower()) if len(word) > 2 and word not in _FILLER}
+
+
+class RetrievalGate:
+    """Decides per chat turn whether the knowledge base needs to be searched at all"""
+
+    def __init__(self, max_words=RETRIEVAL_GATE_MAX_WORDS):
+        self.max_words = max_words
+        self._lock = threading.Lock()
+        self.checked = 0
+        self.skipped = 0
+        self.reasons = {}
+
+    def decide(self, question, chat_history=None):
+        """{"retrieve": bool, "reason": ...} for a question and the chat history before it"""
+        decision = self._decide(question, chat_history or [])
+        with self._lock:
+            self.checked += 1
+            self.skipped += not decision["retrieve"]
+            self.reasons[decision["reason"]] = self.reasons.get(decision["reason"], 0) + 1
+        return decision
+
+    def _decide(self, question, chat_history):
+        if SMALL_TALK_PATTERN.match(question):
+            return {"retrieve": False, "reason": "small talk"}
+        if not chat_history:
+            return {"retrieve": True, "reason": "new question"}
+        if len(question.split()) > self.max_words:
+            return {"retrieve": True, "reason": "long question"}
+        if not FOLLOW_UP_PATTERN.search(question):
+            return {"retrieve": True, "reason": "question"}
+        # A rework request that names something the conversation has not covered yet needs new context
+        history_words = set()
+        for message in chat_history:
+            history_words |= _content_words(str(message.content))
+        if _content_words(FOLLOW_UP_PATTERN.sub(" ", question)) - history_words:
+            return {"retrieve": True, "reason": "follow-up with new terms"}
+        return {"retrieve": False, "reason": "follow-up on previous answer"}
+
+    def stats(self):
+        with self._lock:
+            return {
+                "checked": self.checked,
+                # Each skipped turn saves one query embedding and one vector search
+                "skipped": self.skipped,
+                "skip_rate": round(self.skipped / self.checked, 4) if self.checked else 0.0,
+                "reasons": dict(self.reasons)
+            }
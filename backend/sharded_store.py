@@ -0,0 +1,311 @@
+import hashlib
+import heapq
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from langchain_chroma import Chroma
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore as LangchainVectorStore
+
+# Chunks are partitioned across this many independent indexes by a hash of their source; 1 = unsharded
+VECTOR_SHARDS = int(os.getenv("VECTOR_SHARDS", "1"))
+VECTOR_SHARD_WORKERS = int(os.getenv("VECTOR_SHARD_WORKERS", "8"))  # threads building and searching shards
+SHARDS_DIRECTORY = "shards"
+SHARDS_MANIFEST = "shards.json"
+
+_search_pool = None
+_search_pool_lock = threading.Lock()
+
+
+def _pool():
+    """Threads shared by every sharded store for fan-out searches"""
+    global _search_pool
+    with _search_pool_lock:
+        if _search_pool is None:
+            _search_pool = ThreadPoolExecutor(max_workers=VECTOR_SHARD_WORKERS, thread_name_prefix="shard-search")
+        return _search_pool
+
+
+def shard_of(source, shards):
+    """Shard holding every chunk of a source; stable across processes and rebuilds"""
+    digest = hashlib.sha1(str(source).encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % shards
+
+
+def shard_directory(directory, index):
+    return os.path.join(directory, SHARDS_DIRECTORY, f"{index:03d}")
+
+
+def shard_directories(directory):
+    """Directories of the shards of a sharded index, in shard order (empty for an unsharded index)"""
+    manifest = read_manifest(directory)
+    return [shard_directory(directory, index) for index in range(manifest["shards"])] if manifest else []
+
+
+def read_manifest(directory):
+    path = os.path.join(directory, SHARDS_MANIFEST)
+    if not os.path.isfile(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def fingerprint(documents):
+    """Hash of a shard's chunks: equal fingerprints mean the shard's embeddings can be reused"""
+    digest = hashlib.sha256()
+    for text, metadata in sorted((doc.page_content, json.dumps(doc.metadata, sort_keys=True, default=str))
+                                 for doc in documents):
+        digest.update(text.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(metadata.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def partition(documents, shards):
+    """Documents grouped by shard"""
+    groups = [[] for _ in range(shards)]
+    for doc in documents:
+        groups[shard_of(doc.metadata.get("source"), shards)].append(doc)
+    return groups
+
+
+def _shard_results(shard, embedding, k, filter=None):
+    """(document, relevance) pairs from one shard, best first"""
+    if isinstance(shard, Chroma):
+        # Chroma returns distances; converted with the collection's own relevance function
+        results = shard.similarity_search_by_vector_with_relevance_scores(embedding, k=k, filter=filter)
+    else:
+        results = shard.similarity_search_by_vector_with_score(embedding, k=k, filter=filter)
+    relevance = shard._select_relevance_score_fn()
+    return [(doc, relevance(score)) for doc, score in results]
+
+
+def _shard_batch_results(shard, embeddings, k):
+    """_shard_results for many query embeddings in one call"""
+    relevance = shard._select_relevance_score_fn()
+    if not isinstance(shard, Chroma):
+        return [
+            [(doc, relevance(score)) for doc, score in results]
+            for results in shard.batch_similarity_search_by_vector(embeddings, k=k)
+        ]
+    result = shard._collection.query(
+        query_embeddings=embeddings,
+        n_results=k,
+        include=["documents", "metadatas", "distances"]
+    )
+    return [
+        [
+            (Document(page_content=text, metadata=metadata or {}, id=doc_id), relevance(distance))
+            for text, metadata, doc_id, distance in zip(texts, metadatas, ids, distances)
+        ]
+        for texts, metadatas, ids, distances in zip(
+            result["documents"], result["metadatas"], result["ids"], result["distances"]
+        )
+    ]
+
+
+def store_documents(store, where):
+    """Chunks matching a metadata filter in a Chroma, NumPy or sharded store, with their ids"""
+    if not isinstance(store, Chroma):
+        return store.get_documents(where)
+    result = store.get(where=where, include=["documents", "metadatas"])
+    return [
+        Document(page_content=text, metadata=metadata or {}, id=doc_id)
+        for text, metadata, doc_id in zip(result["documents"], result["metadatas"], result["ids"])
+    ]
+
+
+def score_space(store):
+    """Scale of a store's relevance scores: "numpy", or the distance space of its Chroma collection"""
+    if isinstance(store, ShardedVectorStore):
+        return score_space(store.shards[0]) if store.shards else "numpy"
+    if isinstance(store, Chroma):
+        hnsw = store._collection.configuration.get("hnsw") or {}
+        return hnsw.get("space") or "l2"
+    return "numpy"
+
+
+def _merge(results, k):
+    return heapq.nlargest(k, (pair for shard_results in results for pair in shard_results), key=lambda pair: pair[1])
+
+
+def _shard_count(shard):
+    if isinstance(shard, Chroma):
+        return shard._collection.count()
+    return int(shard.count - shard.deleted.sum())
+
+
+class ShardedVectorStore(LangchainVectorStore):
+    """Chunks partitioned across independent vector stores by a hash of their source
+
+    Searches fan out to the shards in parallel and merge the per-shard top-k by relevance score;
+    filters on source only query the shards that hold those sources. Every shard uses the same
+    backend, so scores are comparable.
+
+    Files in directory:
+        shards.json      - shard count, backend, embedding model and a fingerprint of each shard's chunks
+        shards/<index>/  - one complete Chroma or NumPy index per shard
+    """
+
+    def __init__(self, directory, shards, embedding_function, manifest):
+        self.directory = directory
+        self.shards = shards
+        self._embedding = embedding_function
+        self.manifest = manifest
+        self.reused = manifest.get("reused", [])
+        self.searches = 0
+        self._lock = threading.Lock()
+
+    @property
+    def embeddings(self):
+        return self._embedding
+
+    @classmethod
+    def build(cls, directory, documents, factory, shards=VECTOR_SHARDS, previous=None):
+        """Build every shard in parallel; shards whose chunks are unchanged since the index in previous are copied
+
+        factory creates the backend stores: build_store(directory, documents), open_store(directory)
+        and copy_store(store, directory), the last one without re-embedding.
+        """
+        from snapshot import embedding_signature
+
+        groups = partition(documents, shards)
+        manifest = {
+            "shards": shards,
+            "backend": factory.backend,
+            "quantization": factory.quantization,
+            "embedding": embedding_signature(),
+            "fingerprints": [fingerprint(group) for group in groups]
+        }
+        old = read_manifest(previous) if previous else None
+        comparable = old is not None and all(old.get(key) == manifest[key]
+                                             for key in ("shards", "backend", "quantization", "embedding"))
+
+        def build_shard(index):
+            target = shard_directory(directory, index)
+            if comparable and old["fingerprints"][index] == manifest["fingerprints"][index]:
+                return factory.copy_store(factory.open_store(shard_directory(previous, index)), target), True
+            return factory.build_store(target, groups[index]), False
+
+        with ThreadPoolExecutor(max_workers=min(shards, VECTOR_SHARD_WORKERS)) as pool:
+            built = list(pool.map(build_shard, range(shards)))
+        manifest["reused"] = [index for index, (_, reused) in enumerate(built) if reused]
+        store = cls(directory, [shard for shard, _ in built], factory.embeddings, manifest)
+        store._save_manifest()
+        return store
+
+    @classmethod
+    def load(cls, directory, factory):
+        manifest = read_manifest(directory)
+        shards = [factory.open_store(path) for path in shard_directories(directory)]
+        return cls(directory, shards, factory.embeddings, manifest)
+
+    def _save_manifest(self):
+        path = os.path.join(self.directory, SHARDS_MANIFEST)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({key: value for key, value in self.manifest.items() if key != "reused"}, f, indent=2)
+        os.replace(path + ".tmp", path)
+
+    def _changed(self, indexes):
+        """Shards written after the build no longer match their fingerprint and are re-embedded on the next rebuild"""
+        with self._lock:
+            for index in indexes:
+                self.manifest["fingerprints"][index] = None
+            self._save_manifest()
+
+    def shard_for(self, source):
+        return shard_of(source, len(self.shards))
+
+    def _targets(self, filter):
+        """Indexes of the shards that can hold matches for a metadata filter"""
+        source = (filter or {}).get("source") if len(filter or {}) == 1 else None
+        if isinstance(source, dict) and set(source) == {"$in"}:
+            return sorted({self.shard_for(value) for value in source["$in"]})
+        if source is not None and not isinstance(source, dict):
+            return [self.shard_for(source)]
+        return list(range(len(self.shards)))
+
+    def _fan_out(self, function, indexes):
+        """function(shard) for each shard index, in parallel when there is more than one"""
+        with self._lock:
+            self.searches += 1
+        if len(indexes) == 1:
+            return [function(self.shards[indexes[0]])]
+        return list(_pool().map(lambda index: function(self.shards[index]), indexes))
+
+    def similarity_search_by_vector_with_score(self, embedding, k=4, filter=None):
+        """Top-k (document, relevance score) pairs across all shards"""
+        results = self._fan_out(lambda shard: _shard_results(shard, embedding, k, filter), self._targets(filter))
+        return _merge(results, k)
+
+    def batch_similarity_search_by_vector(self, embeddings, k=4):
+        """Top-k (document, relevance score) pairs for each of several query embeddings"""
+        if not len(embeddings):
+            return []
+        per_shard = self._fan_out(lambda shard: _shard_batch_results(shard, embeddings, k), list(range(len(self.shards))))
+        return [_merge([results[query] for results in per_shard], k) for query in range(len(embeddings))]
+
+    def similarity_search_with_relevance_scores(self, query, k=4, filter=None, **kwargs):
+        return self.similarity_search_by_vector_with_score(self._embedding.embed_query(query), k, filter)
+
+    def similarity_search_with_score(self, query, k=4, filter=None, **kwargs):
+        return self.similarity_search_with_relevance_scores(query, k, filter)
+
+    def similarity_search_by_vector(self, embedding, k=4, filter=None, **kwargs):
+        return [doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k, filter)]
+
+    def similarity_search(self, query, k=4, filter=None, **kwargs):
+        return [doc for doc, _ in self.similarity_search_with_relevance_scores(query, k, filter)]
+
+    def _select_relevance_score_fn(self):
+        # Scores are already relevance scores, converted per shard
+        return lambda score: score
+
+    def add_texts(self, texts, metadatas=None, ids=None, **kwargs):
+        """Add chunks to the shards of their sources"""
+        texts = list(texts)
+        metadatas = list(metadatas) if metadatas is not None else [{} for _ in texts]
+        ids = list(ids) if ids is not None else [None] * len(texts)
+        groups = {}
+        for text, metadata, doc_id in zip(texts, metadatas, ids):
+            groups.setdefault(self.shard_for(metadata.get("source")), []).append((text, metadata, doc_id))
+        added = {}
+
+        def add(index):
+            rows = groups[index]
+            row_ids = [doc_id for _, _, doc_id in rows]
+            added[index] = self.shards[index].add_texts(
+                [text for text, _, _ in rows], [metadata for _, metadata, _ in rows],
+                ids=row_ids if all(row_ids) else None
+            )
+
+        list(_pool().map(add, groups))
+        self._changed(groups)
+        order = {index: iter(result) for index, result in added.items()}
+        return [next(order[self.shard_for(metadata.get("source"))]) for metadata in metadatas]
+
+    def get_documents(self, where):
+        """Chunks matching a metadata filter, from the shards that can hold them"""
+        return [doc for index in self._targets(where) for doc in store_documents(self.shards[index], where)]
+
+    def delete(self, ids=None, where=None, **kwargs):
+        """Delete chunks by id and/or metadata filter; a filter on source only touches that source's shard"""
+        indexes = self._targets(where) if where and not ids else list(range(len(self.shards)))
+        for index in indexes:
+            self.shards[index].delete(ids=ids, where=where)
+        self._changed(indexes)
+        return True
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, **kwargs):
+        raise NotImplementedError("Sharded indexes are built with ShardedVectorStore.build")
+
+    def stats(self):
+        return {
+            "shards": len(self.shards),
+            "chunks": [_shard_count(shard) for shard in self.shards],
+            "reused_on_build": self.reused,
+            "searches": self.searches
+        }
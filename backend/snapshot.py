@@ -0,0 +1,187 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+# Snapshot (or directory of snapshots) to serve at startup instead of building/loading ./chroma_db
+INDEX_SNAPSHOT = os.getenv("INDEX_SNAPSHOT")
+SNAPSHOTS_DIR = os.getenv("SNAPSHOTS_DIR", "./snapshots")
+# How snapshot files are checked on load: "size" compares sizes and only checksums files whose mtime changed,
+# "sha256" checksums every file (reads the whole index at startup), "off" skips the check
+SNAPSHOT_VERIFY = os.getenv("SNAPSHOT_VERIFY", "size").lower()
+SNAPSHOT_VERIFY = {"true": "size", "1": "size", "yes": "size", "false": "off", "0": "off", "no": "off"}.get(
+    SNAPSHOT_VERIFY, SNAPSHOT_VERIFY
+)
+SNAPSHOT_FORMAT = 1
+
+# Layout of a snapshot directory:
+#   snapshot.json - version, build info, embedding model and the size/mtime/sha256 of every index file
+#   index/        - NumpyVectorStore files (vectors, chunk texts, metadata, manifest)
+#   parents/      - parent sections, for snapshots built with parent-document retrieval
+#   documents/    - per-document vectors, for snapshots built with hierarchical retrieval
+# A directory of snapshots holds one folder per version plus a LATEST file naming the newest.
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def embedding_signature():
+    """Embedding model a snapshot was built with; queries must be embedded with the same one"""
+    from fake_providers import MODEL_PROVIDER
+    from vector_store import EMBEDDING_DIMENSIONS
+    deployment = "fake" if MODEL_PROVIDER == "fake" else os.getenv("EMBEDDING_DEPLOYMENT_NAME")
+    return {"deployment": deployment, "dimensions": EMBEDDING_DIMENSIONS}
+
+
+def _write_atomic(path, text):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def build_snapshot(documents, embeddings, output_dir=SNAPSHOTS_DIR, quantization="none", parents=None,
+                   hierarchical=False):
+    """Embed documents into a new versioned snapshot under output_dir and point LATEST at it"""
+    from document_index import DocumentIndex
+    from numpy_store import NumpyVectorStore
+    from parent_docstore import ParentDocStore
+
+    root = Path(output_dir)
+    root.mkdir(parents=True, exist_ok=True)
+    # Built next to its final location so publishing it is a rename
+    staging = Path(tempfile.mkdtemp(prefix=".building-", dir=root))
+    try:
+        started = time.perf_counter()
+        store = NumpyVectorStore.from_documents(
+            documents, embeddings, persist_directory=staging / "index", quantization=quantization
+        )
+        if parents is not None:
+            ParentDocStore.build(staging / "parents", parents)
+        if hierarchical:
+            DocumentIndex.build(staging / "documents", store)
+        files = {
+            path.relative_to(staging).as_posix(): {
+                "bytes": path.stat().st_size, "mtime": int(path.stat().st_mtime), "sha256": file_sha256(path)
+            }
+            for path in sorted(staging.rglob("*")) if path.is_file()
+        }
+        digest = hashlib.sha256(json.dumps(files, sort_keys=True).encode("utf-8")).hexdigest()
+        version = f"{datetime.now(timezone.utc):%Y%m%d-%H%M%S}-{digest[:8]}"
+        manifest = {
+            "format": SNAPSHOT_FORMAT,
+            "version": version,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "embedding": embedding_signature(),
+            "dim": store.dim,
+            "chunks": store.count,
+            "sources": len({doc.metadata.get("source") for doc in documents}),
+            "parents": len(parents) if parents is not None else None,
+            "quantization": quantization,
+            "build_seconds": round(time.perf_counter() - started, 2),
+            "files": files
+        }
+        _write_atomic(staging / "snapshot.json", json.dumps(manifest, indent=2))
+        os.replace(staging, root / version)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    _write_atomic(root / "LATEST", version + "\n")
+    return root / version, manifest
+
+
+def list_snapshots(output_dir=SNAPSHOTS_DIR):
+    """Snapshot directories under output_dir, oldest first"""
+    root = Path(output_dir)
+    if not root.is_dir():
+        return []
+    return sorted(path for path in root.iterdir() if (path / "snapshot.json").is_file())
+
+
+def prune_snapshots(output_dir=SNAPSHOTS_DIR, keep=3):
+    """Delete all but the newest `keep` snapshots (never the one LATEST points to)"""
+    snapshots = list_snapshots(output_dir)
+    kept = {path.name for path in snapshots[-max(1, keep):]}
+    if (Path(output_dir) / "LATEST").is_file():
+        kept.add(resolve_snapshot(output_dir).name)
+    old = [path for path in snapshots if path.name not in kept]
+    for path in old:
+        shutil.rmtree(path)
+    return [path.name for path in old]
+
+
+def resolve_snapshot(path):
+    """A snapshot directory itself, or the one LATEST points to in a directory of snapshots"""
+    path = Path(path)
+    if (path / "snapshot.json").is_file():
+        return path
+    latest = path / "LATEST"
+    if latest.is_file():
+        return path / latest.read_text(encoding="utf-8").strip()
+    raise FileNotFoundError(f"No index snapshot in {path}; build one with `python ingest.py --output {path}`")
+
+
+def read_manifest(snapshot_dir):
+    with open(Path(snapshot_dir) / "snapshot.json", "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("format") != SNAPSHOT_FORMAT:
+        raise ValueError(f"Unsupported snapshot format {manifest.get('format')} in {snapshot_dir}")
+    return manifest
+
+
+def verify_snapshot(snapshot_dir, manifest=None, mode="sha256"):
+    """Raise ValueError unless every index file matches the manifest
+
+    mode "sha256" checksums every file. "size" only checks sizes, plus the checksum of files whose
+    modification time differs from the manifest's (copy snapshots with timestamps preserved to keep it cheap).
+    """
+    snapshot_dir = Path(snapshot_dir)
+    manifest = manifest or read_manifest(snapshot_dir)
+    for name, expected in manifest["files"].items():
+        path = snapshot_dir / name
+        if not path.is_file():
+            raise ValueError(f"Snapshot {manifest['version']} is incomplete: {name} is missing")
+        stat = path.stat()
+        if stat.st_size != expected["bytes"]:
+            raise ValueError(f"Snapshot {manifest['version']} is corrupt: size mismatch in {name}")
+        unchanged = mode == "size" and expected.get("mtime") in (None, int(stat.st_mtime))
+        if not unchanged and file_sha256(path) != expected["sha256"]:
+            raise ValueError(f"Snapshot {manifest['version']} is corrupt: checksum mismatch in {name}")
+    return manifest
+
+
+def load_snapshot(path, embeddings, verify=SNAPSHOT_VERIFY):
+    """Read-only, memory-mapped vector store for a snapshot; nothing is re-embedded"""
+    from document_index import DocumentIndex
+    from numpy_store import NumpyVectorStore
+    from parent_docstore import ParentDocStore
+
+    snapshot_dir = resolve_snapshot(path)
+    manifest = read_manifest(snapshot_dir)
+    if verify != "off":
+        verify_snapshot(snapshot_dir, manifest, verify)
+    built_with, current = manifest.get("embedding") or {}, embedding_signature()
+    for key in ("deployment", "dimensions"):
+        # Unset dimensions mean the model's native size, so a snapshot of shortened vectors needs the same setting
+        comparable = key in built_with if key == "dimensions" else built_with.get(key) and current[key]
+        if comparable and built_with[key] != current[key]:
+            raise ValueError(
+                f"Snapshot {manifest['version']} was built with embedding {key} {built_with[key] or 'native'!r}, "
+                f"but this server uses {current[key] or 'native'!r}"
+            )
+    store = NumpyVectorStore(snapshot_dir / "index", embeddings, read_only=True)
+    store.snapshot = {key: manifest[key] for key in ("version", "created_at", "chunks", "dim", "quantization")}
+    if (snapshot_dir / "parents").is_dir():
+        store.parents = ParentDocStore(snapshot_dir / "parents", read_only=True)
+    if (snapshot_dir / "documents").is_dir():
+        store.document_index = DocumentIndex(snapshot_dir / "documents", read_only=True)
+    return store
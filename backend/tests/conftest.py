@@ -0,0 +1,10 @@
+import os
+import sys
+from pathlib import Path
+
+# Tests never call a real model provider; set before any backend module reads its configuration
+os.environ.setdefault("MODEL_PROVIDER", "fake")
+os.environ.setdefault("FAKE_EMBEDDING_LATENCY_MS", "0")
+
+# Backend modules import each other as top-level modules, as they do when uvicorn runs from backend/
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
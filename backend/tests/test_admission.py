@@ -0,0 +1,86 @@
+import asyncio
+import pytest
+from admission import AdmissionController, AdmissionRejected, request_lane
+from batch_chat import run_batch
+
+
+def test_lane_is_decided_by_the_server():
+    assert request_lane(None, interactive_token=None) == "interactive"
+    assert request_lane("secret", interactive_token="secret") == "interactive"
+    assert request_lane("interactive", interactive_token="secret") == "batch"
+    assert request_lane(None, interactive_token="secret") == "batch"
+
+
+def test_queue_full_does_not_use_rate_budget():
+    controller = AdmissionController(max_concurrency=1, max_queue=0, session_rate=1, session_burst=1)
+
+    async def run():
+        await controller.acquire(("session", "busy"))
+        with pytest.raises(AdmissionRejected) as rejected:
+            await controller.acquire(("session", "a"))
+        assert rejected.value.status_code == 503
+        controller.release()
+        # The 503 left session "a" its only token
+        await controller.acquire(("session", "a"))
+        controller.release()
+
+    asyncio.run(run())
+
+
+def test_sessions_and_ips_have_separate_rates():
+    controller = AdmissionController(session_rate=1, session_burst=1, ip_rate=1, ip_burst=3)
+
+    async def run():
+        for _ in range(3):
+            await controller.acquire(("ip", "10.0.0.1"))
+            controller.release()
+        with pytest.raises(AdmissionRejected):
+            await controller.acquire(("ip", "10.0.0.1"))
+        await controller.acquire(("session", "s"))
+        controller.release()
+        with pytest.raises(AdmissionRejected):
+            await controller.acquire(("session", "s"))
+        assert controller.stats()["rejected"]["ip_rate"] == 1
+        assert controller.stats()["rejected"]["session_rate"] == 1
+
+    asyncio.run(run())
+
+
+class _Bot:
+    search_k = 1
+
+    def __init__(self, controller):
+        self.controller = controller
+        self.vectorstore = type("Store", (), {"embeddings": None})()
+        self.most_in_flight = 0
+
+    def source_filters(self, vectors):
+        return None
+
+    def expand(self, docs):
+        return docs
+
+    async def aanswer(self, question, documents):
+        self.most_in_flight = max(self.most_in_flight, self.controller.in_flight)
+        await asyncio.sleep(0.01)
+        return question.upper()
+
+
+def test_batch_generations_each_take_a_slot(monkeypatch):
+    import batch_chat
+    monkeypatch.setattr(batch_chat, "embed_queries", lambda embeddings, questions: questions)
+    monkeypatch.setattr(batch_chat, "batch_similarity_search_by_vector",
+                        lambda store, vectors, k, filters: [[] for _ in vectors])
+    controller = AdmissionController(max_concurrency=2, session_rate=0)
+    bot = _Bot(controller)
+
+    async def run():
+        results = [result async for result in run_batch(
+            bot, [f"q{index}" for index in range(6)], concurrency=6, admit=lambda: controller.admit(lane="batch")
+        )]
+        assert sorted(result["answer"] for result in results) == [f"Q{index}" for index in range(6)]
+        assert bot.most_in_flight == 2
+        assert controller.stats()["admitted"]["batch"] == 7  # retrieval plus one per generation
+        assert controller.in_flight == 0
+
+    asyncio.run(run())
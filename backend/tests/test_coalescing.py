@@ -0,0 +1,44 @@
+import asyncio
+import app
+
+
+class _Bot:
+    def __init__(self):
+        self.session_histories = {}
+        self.calls = 0
+
+    def get_history(self, session_id=None):
+        return self.session_histories.get(session_id or "default", [])
+
+    def remember(self, question, answer, session_id=None):
+        self.session_histories.setdefault(session_id or "default", []).extend([question, answer])
+
+    async def aanswer_question(self, question, chat_history=None):
+        self.calls += 1
+        await asyncio.sleep(0.05)
+        return {"answer": "Five days.", "sources": []}
+
+
+def test_session_less_questions_coalesce_after_earlier_traffic():
+    bot = _Bot()
+
+    async def run():
+        await app._answer_question(bot, "How many days carry over?")
+        results = await asyncio.gather(*(app._answer_question(bot, "how many days carry over") for _ in range(5)))
+        assert [result["answer"] for result in results] == ["Five days."] * 5
+
+    asyncio.run(run())
+    assert bot.calls == 2
+    assert bot.session_histories == {}
+
+
+def test_sessions_with_history_are_not_coalesced():
+    bot = _Bot()
+
+    async def run():
+        await app._answer_question(bot, "Hi there, what is the leave policy?", session_id="s")
+        await app._answer_question(bot, "And for part-time staff?", session_id="s")
+
+    asyncio.run(run())
+    assert bot.calls == 2
+    assert len(bot.session_histories["s"]) == 4
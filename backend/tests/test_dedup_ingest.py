@@ -0,0 +1,71 @@
+import pytest
+from langchain_core.documents import Document
+from dedup import deduplicate, document_sources
+from parent_docstore import split_parents
+from vector_store import VectorStore, release_index_clients, replace_source_documents
+
+SHARED = "Employees may carry over up to five days of unused annual leave into the next calendar year."
+ONLY_A = "Expense reports are due on the last working day of each month with receipts attached."
+ONLY_B = "The office is closed on public holidays and during the last week of December."
+
+
+def _corpus():
+    return [
+        Document(page_content=SHARED, metadata={"source": "a.txt"}),
+        Document(page_content=ONLY_A, metadata={"source": "a.txt"}),
+        Document(page_content=SHARED, metadata={"source": "b.txt"}),
+        Document(page_content=ONLY_B, metadata={"source": "b.txt"}),
+    ]
+
+
+@pytest.fixture(params=["chroma", "numpy", "parents"])
+def vectorstore(request, tmp_path):
+    documents, report = deduplicate(_corpus())
+    assert report["exact_duplicates"] == 1
+    store = VectorStore(persist_directory=str(tmp_path), collection_name="dedup-test")
+    store.backend = "numpy" if request.param == "numpy" else "chroma"
+    if request.param == "parents":
+        parents = documents
+        documents = split_parents(parents)
+        store.create_vectorstore(documents, parents)
+    else:
+        store.create_vectorstore(documents)
+    yield store.vectorstore
+    release_index_clients(str(tmp_path))
+
+
+def _search(vectorstore, text):
+    parents = getattr(vectorstore, "parents", None)
+    results = vectorstore.similarity_search(text, k=4)
+    if parents is not None:
+        results = parents.expand(results)
+    return [doc for doc in results if doc.page_content == text]
+
+
+def test_deleting_the_file_a_duplicate_is_stored_under_keeps_it_for_the_other(vectorstore):
+    assert document_sources(_search(vectorstore, SHARED)[0]) == ["a.txt", "b.txt"]
+
+    replace_source_documents(vectorstore, "a.txt", [])
+
+    matches = _search(vectorstore, SHARED)
+    assert len(matches) == 1
+    assert document_sources(matches[0]) == ["b.txt"]
+    assert not _search(vectorstore, ONLY_A)
+    assert _search(vectorstore, ONLY_B)
+
+
+def test_deleting_a_duplicate_source_removes_it_from_the_kept_chunk(vectorstore):
+    replace_source_documents(vectorstore, "b.txt", [])
+
+    matches = _search(vectorstore, SHARED)
+    assert len(matches) == 1
+    assert document_sources(matches[0]) == ["a.txt"]
+    assert not _search(vectorstore, ONLY_B)
+
+
+def test_editing_the_file_a_duplicate_is_stored_under_keeps_it_for_the_other(vectorstore):
+    replace_source_documents(vectorstore, "a.txt", [Document(page_content=ONLY_A, metadata={"source": "a.txt"})])
+
+    matches = _search(vectorstore, SHARED)
+    assert [document_sources(doc) for doc in matches] == [["b.txt"]]
+    assert _search(vectorstore, ONLY_A)
@@ -0,0 +1,51 @@
+import math
+import pytest
+from langchain_chroma import Chroma
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from model_router import FAST, FULL, ModelRouter
+from numpy_store import NumpyVectorStore
+from sharded_store import score_space
+
+
+class _Vectors(Embeddings):
+    """Query "q" and chunks at exact cosine similarities to it"""
+
+    def __init__(self, cosines):
+        self.vectors = {"q": [1.0, 0.0, 0.0]}
+        for cosine in cosines:
+            self.vectors[f"chunk {cosine}"] = [cosine, math.sqrt(1 - cosine * cosine), 0.0]
+
+    def embed_documents(self, texts):
+        return [self.vectors[text] for text in texts]
+
+    def embed_query(self, text):
+        return self.vectors[text]
+
+
+def _store(backend, embeddings, directory):
+    if backend == "chroma":
+        return Chroma(collection_name="router-test", embedding_function=embeddings, persist_directory=str(directory))
+    return NumpyVectorStore(directory, embeddings)
+
+
+@pytest.mark.parametrize("backend", ["chroma", "numpy"])
+@pytest.mark.parametrize("cosine, route", [(0.8, FAST), (0.6, FULL)])
+def test_min_confidence_is_a_cosine_similarity_on_every_backend(tmp_path, backend, cosine, route):
+    embeddings = _Vectors([cosine])
+    store = _store(backend, embeddings, tmp_path)
+    store.add_texts([f"chunk {cosine}"], [{"source": "a.txt"}])
+    [(doc, relevance)] = store.similarity_search_with_relevance_scores("q", k=1)
+    if backend == "chroma":
+        # Chroma's default l2 relevance puts a cosine of 0.8 below 0.75
+        assert score_space(store) == "l2"
+        assert relevance == pytest.approx(1 - (2 - 2 * cosine) / math.sqrt(2), abs=1e-4)
+    doc.metadata["relevance"] = relevance
+
+    router = ModelRouter({FAST: None, FULL: None}, min_confidence=0.75, score_space=score_space(store))
+    assert router.route("What is the leave policy?", [doc])["route"] == route
+
+
+def test_documents_without_scores_are_not_judged_on_confidence():
+    router = ModelRouter({FAST: None, FULL: None}, score_space="l2")
+    assert router.route("What is the leave policy?", [Document(page_content="text")])["route"] == FAST
@@ -0,0 +1,88 @@
+import asyncio
+import time
+import namespaces
+from namespaces import NamespaceRegistry
+
+
+def _registry(monkeypatch, released, max_loaded=1, cleaned=None, build_seconds=0):
+    monkeypatch.setattr(namespaces, "namespace_exists", lambda namespace: True)
+    builds = []
+
+    def build(namespace, rebuild_index):
+        time.sleep(build_seconds)
+        builds.append(namespace)
+        return f"bot-{namespace}-{len(builds)}"
+
+    return NamespaceRegistry(
+        build,
+        release=lambda namespace, bot: released.append(namespace),
+        cleanup=lambda namespace, bot: cleaned.append(bot) if cleaned is not None else None,
+        max_loaded=max_loaded
+    )
+
+
+def test_namespace_in_use_is_not_evicted(monkeypatch):
+    released = []
+    registry = _registry(monkeypatch, released)
+
+    async def run():
+        handle = await registry.get("hr")
+        with handle as bot:
+            assert bot == "bot-hr-1"
+            # Loading a second namespace goes over max_loaded, but "hr" is still answering
+            (await registry.get("legal")).release()
+            assert released == []
+        registry.evict_idle()
+        assert released == ["hr"]
+
+    asyncio.run(run())
+
+
+def test_idle_namespace_is_evicted_after_release(monkeypatch):
+    released = []
+    registry = _registry(monkeypatch, released, max_loaded=8)
+    registry.idle_seconds = 0
+
+    async def run():
+        handle = await registry.get("hr")
+        registry.evict_idle()
+        assert released == []
+        handle.release()
+        registry.evict_idle()
+        assert released == ["hr"]
+        assert registry.stats()["loaded"] == {}
+
+    asyncio.run(run())
+
+
+def test_rebuild_cleans_up_replaced_bot_after_its_last_request(monkeypatch):
+    cleaned = []
+    registry = _registry(monkeypatch, [], max_loaded=8, cleaned=cleaned)
+
+    async def run():
+        handle = await registry.get("hr")
+        await registry.rebuild("hr")
+        # Cleanup runs in a thread; give it the chance to run if it was (wrongly) scheduled
+        await asyncio.sleep(0.05)
+        assert cleaned == []
+        with await registry.get("hr") as bot:
+            assert bot == "bot-hr-2"
+        handle.release()
+        await asyncio.sleep(0.05)
+        assert cleaned == ["bot-hr-1"]
+
+    asyncio.run(run())
+
+
+def test_load_during_rebuild_waits_for_it(monkeypatch):
+    registry = _registry(monkeypatch, [], max_loaded=8, build_seconds=0.2)
+
+    async def run():
+        rebuild = asyncio.create_task(registry.rebuild("hr"))
+        await asyncio.sleep(0.05)
+        with await registry.get("hr") as bot:
+            assert bot == "bot-hr-1"
+        await rebuild
+        assert registry.stats()["loads"] == 1
+
+    asyncio.run(run())
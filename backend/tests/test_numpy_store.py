@@ -0,0 +1,79 @@
+import pytest
+from fake_providers import FakeEmbeddings
+from numpy_store import NumpyVectorStore
+
+TEXTS = ["alpha apples", "bravo bananas", "charlie cherries", "delta dates"]
+
+
+@pytest.fixture
+def embeddings():
+    return FakeEmbeddings(dimensions=32, latency_ms=0)
+
+
+def _add(store, texts, source):
+    return store.add_texts(texts, [{"source": source, "text": text} for text in texts])
+
+
+@pytest.mark.parametrize("quantization", ["none", "int8"])
+def test_append_after_interrupted_append(tmp_path, embeddings, monkeypatch, quantization):
+    store = NumpyVectorStore(tmp_path, embeddings, quantization=quantization)
+    _add(store, TEXTS[:2], "a.txt")
+
+    # Crash after the row files are written but before the manifest publishes the rows
+    def crash():
+        raise OSError("disk full")
+
+    monkeypatch.setattr(store, "_write_manifest", crash)
+    with pytest.raises(OSError):
+        _add(store, ["lost lemons"], "lost.txt")
+    monkeypatch.undo()
+
+    reopened = NumpyVectorStore(tmp_path, embeddings)
+    assert reopened.count == 2
+    _add(reopened, TEXTS[2:], "b.txt")
+
+    reloaded = NumpyVectorStore(tmp_path, embeddings)
+    assert reloaded.count == 4
+    for row, text in enumerate(TEXTS):
+        assert reloaded._text(row) == text
+        assert reloaded.metadatas[row]["text"] == text
+    for text in TEXTS:
+        doc, score = reloaded.similarity_search_with_score(text, k=1)[0]
+        assert doc.page_content == text
+        assert score == pytest.approx(1.0, abs=0.02)
+    assert not reloaded.similarity_search("lemons", k=4, filter={"source": "lost.txt"})
+
+
+def test_delete_updates_source_index(tmp_path, embeddings):
+    store = NumpyVectorStore(tmp_path, embeddings)
+    ids = _add(store, TEXTS, "a.txt")
+    store.delete(ids=ids[:2])
+    remaining = store.similarity_search("anything", k=4, filter={"source": "a.txt"})
+    assert sorted(doc.page_content for doc in remaining) == TEXTS[2:]
+
+
+@pytest.mark.parametrize("quantization", ["none", "int8"])
+def test_interrupted_compaction_keeps_the_index(tmp_path, embeddings, monkeypatch, quantization):
+    store = NumpyVectorStore(tmp_path, embeddings, quantization=quantization)
+    ids = _add(store, TEXTS, "a.txt")
+
+    # Crash after the compacted files are written but before the manifest switches to them
+    def crash():
+        raise OSError("killed")
+
+    monkeypatch.setattr(store, "_write_manifest", crash)
+    with pytest.raises(OSError):
+        store.delete(ids=ids[:2])
+    monkeypatch.undo()
+
+    for current in (store, NumpyVectorStore(tmp_path, embeddings)):
+        assert current.count == 4
+        remaining = current.similarity_search("anything", k=4, filter={"source": "a.txt"})
+        assert sorted(doc.page_content for doc in remaining) == TEXTS[2:]
+
+    # The next compaction goes through and leaves only the live generation's files
+    reopened = NumpyVectorStore(tmp_path, embeddings)
+    reopened.delete(ids=ids[2:3])
+    assert reopened.count == 1
+    assert NumpyVectorStore(tmp_path, embeddings).similarity_search("anything", k=4)[0].page_content == TEXTS[3]
+    assert not any(path.name.startswith("vectors") and path.name != "vectors.1.f32" for path in tmp_path.iterdir())
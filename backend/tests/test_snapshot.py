@@ -0,0 +1,71 @@
+import os
+import pytest
+from langchain_core.documents import Document
+import snapshot
+from fake_providers import FakeEmbeddings
+from snapshot import build_snapshot, verify_snapshot
+
+TEXTS = ["alpha apples", "bravo bananas", "charlie cherries"]
+
+
+@pytest.fixture
+def built(tmp_path):
+    documents = [Document(page_content=text, metadata={"source": f"{index}.txt"}) for index, text in enumerate(TEXTS)]
+    path, manifest = build_snapshot(documents, FakeEmbeddings(dimensions=16, latency_ms=0), tmp_path)
+    return path, manifest
+
+
+def _overwrite(path, keep_mtime):
+    """Flip the first byte in place, leaving the size (and optionally the mtime) unchanged"""
+    stat = path.stat()
+    data = bytearray(path.read_bytes())
+    data[0] ^= 0xFF
+    path.write_bytes(bytes(data))
+    if keep_mtime:
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+
+def test_size_check_does_not_hash_unchanged_files(built, monkeypatch):
+    path, manifest = built
+    hashed = []
+    monkeypatch.setattr(snapshot, "file_sha256", lambda file: hashed.append(file) or "")
+    verify_snapshot(path, mode="size")
+    assert hashed == []
+
+
+def test_size_check_hashes_files_with_a_new_mtime(built):
+    path, manifest = built
+    _overwrite(path / "index" / "vectors.f32", keep_mtime=False)
+    os.utime(path / "index" / "vectors.f32", (0, 0))
+    with pytest.raises(ValueError, match="checksum mismatch"):
+        verify_snapshot(path, mode="size")
+
+
+def test_size_check_catches_truncated_files(built):
+    path, manifest = built
+    with open(path / "index" / "vectors.f32", "r+b") as f:
+        f.truncate(8)
+    with pytest.raises(ValueError, match="size mismatch"):
+        verify_snapshot(path, mode="size")
+
+
+def test_full_check_catches_in_place_corruption(built):
+    path, manifest = built
+    _overwrite(path / "index" / "vectors.f32", keep_mtime=True)
+    verify_snapshot(path, mode="size")
+    with pytest.raises(ValueError, match="checksum mismatch"):
+        verify_snapshot(path, mode="sha256")
+
+
+def test_snapshot_of_shortened_embeddings_needs_the_same_dimensions(tmp_path, monkeypatch):
+    import vector_store
+    from snapshot import load_snapshot
+    monkeypatch.setattr(vector_store, "EMBEDDING_DIMENSIONS", 16)
+    embeddings = FakeEmbeddings(dimensions=16, latency_ms=0)
+    build_snapshot([Document(page_content=text) for text in TEXTS], embeddings, tmp_path)
+    assert load_snapshot(tmp_path, embeddings).dim == 16
+
+    # The server uses the model's native dimensions: rejected at load, not on the first query
+    monkeypatch.setattr(vector_store, "EMBEDDING_DIMENSIONS", None)
+    with pytest.raises(ValueError, match="dimensions 16"):
+        load_snapshot(tmp_path, FakeEmbeddings(latency_ms=0))
@@ -0,0 +1,49 @@
+import asyncio
+from aiohttp import web
+from url_ingest import ResponseCache, UrlFetcher
+
+
+async def _serve(routes):
+    app = web.Application()
+    app.add_routes(routes)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = runner.addresses[0][1]
+    return runner, f"http://127.0.0.1:{port}"
+
+
+def _respond(**kwargs):
+    async def handler(request):
+        return web.Response(**kwargs)
+    return handler
+
+
+async def _endless(request):
+    response = web.StreamResponse()
+    await response.prepare(request)
+    for _ in range(100):
+        await response.write(b"x" * 1024)
+    return response
+
+
+def test_oversized_and_uncached_not_modified_pages_are_errors(tmp_path):
+    async def run():
+        runner, base = await _serve([
+            web.get("/small", _respond(text="hello")),
+            web.get("/streamed", _endless),
+            web.get("/sized", _respond(body=b"x" * 4096)),
+            web.get("/not-modified", _respond(status=304)),
+        ])
+        try:
+            fetcher = UrlFetcher(cache=ResponseCache(tmp_path), host_delay=0, allow_private=True, max_bytes=2048)
+            return await fetcher.fetch_all([f"{base}/{path}" for path in ("small", "streamed", "sized", "not-modified")])
+        finally:
+            await runner.cleanup()
+
+    small, streamed, sized, not_modified = asyncio.run(run())
+    assert (small.status, small.body) == ("new", b"hello")
+    for result in (streamed, sized):
+        assert result.status == "error" and "larger than" in result.error
+    assert not_modified.status == "error" and "304" in not_modified.error
@@ -0,0 +1,23 @@
+from warmup import warmup_bot
+
+
+class _Embeddings:
+    def prefill(self, questions):
+        return len(questions)
+
+
+class _Bot:
+    def __init__(self):
+        self.vectorstore = type("Store", (), {"embeddings": _Embeddings()})()
+        self.retrieved = []
+
+    def retrieve(self, question):
+        self.retrieved.append(question)
+        return []
+
+
+def test_warmup_runs_the_bots_retrieval_path():
+    bot = _Bot()
+    report = warmup_bot(bot, ["What is the leave policy?", "Who approves expenses?"])
+    assert bot.retrieved == ["What is the leave policy?", "Who approves expenses?"]
+    assert report["prefilled"] == 2
@@ -0,0 +1,85 @@
+import hashlib
+import hmac
+import json
+import os
+import queue
+import re
+import secrets
+import threading
+import time
+
+# Opt-in: chat requests are only recorded when a capture file is configured
+TRAFFIC_CAPTURE_FILE = os.getenv("TRAFFIC_CAPTURE_FILE")
+# Session ids are replaced by a keyed hash; set a fixed salt to keep them stable across restarts
+TRAFFIC_CAPTURE_SALT = os.getenv("TRAFFIC_CAPTURE_SALT") or secrets.token_hex(16)
+TRAFFIC_CAPTURE_QUESTIONS = os.getenv("TRAFFIC_CAPTURE_QUESTIONS", "scrub").lower()  # scrub or drop
+
+# Personal data that should not end up in a capture file, most specific first
+_SCRUB_PATTERNS = [
+    (re.compile(r"[\w.+-]+@[\w-]+(\.[\w-]+)+"), "<email>"),
+    (re.compile(r"https?://\S+"), "<url>"),
+    (re.compile(r"\+?\d[\d\s().-]{5,}\d"), "<number>"),
+]
+
+
+def scrub(text):
+    """Question text with e-mail addresses, URLs and long numbers replaced by placeholders"""
+    for pattern, placeholder in _SCRUB_PATTERNS:
+        text = pattern.sub(placeholder, text)
+    return text
+
+
+def anonymize(value, salt=TRAFFIC_CAPTURE_SALT):
+    """Keyed hash of an identifier: equal ids stay equal, but cannot be recovered"""
+    if not value:
+        return None
+    return hmac.new(salt.encode("utf-8"), value.encode("utf-8"), hashlib.sha256).hexdigest()[:16]
+
+
+class TrafficRecorder:
+    """Appends anonymized chat requests, with their arrival time, to a JSONL file
+
+    Records are written by a background thread, so capturing never blocks request handling.
+    """
+
+    def __init__(self, path=TRAFFIC_CAPTURE_FILE, salt=TRAFFIC_CAPTURE_SALT, questions=TRAFFIC_CAPTURE_QUESTIONS):
+        if questions not in ("scrub", "drop"):
+            raise ValueError(f"Unknown TRAFFIC_CAPTURE_QUESTIONS mode: {questions}")
+        self.path = path
+        self.salt = salt
+        self.questions = questions
+        self.captured = 0
+        self._queue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name="traffic-capture", daemon=True)
+        self._thread.start()
+
+    def record(self, endpoint, question, session_id=None, namespace=None, priority=None):
+        """Queue one request for the capture file"""
+        self._queue.put({
+            "t": round(time.time(), 3),
+            "endpoint": endpoint,
+            "session": anonymize(session_id, self.salt),
+            "namespace": namespace,
+            "priority": priority,
+            "question": scrub(question) if self.questions == "scrub" else None,
+            "chars": len(question)
+        })
+        self.captured += 1
+
+    def _run(self):
+        with open(self.path, "a", encoding="utf-8") as f:
+            while True:
+                record = self._queue.get()
+                if record is None:
+                    return
+                f.write(json.dumps(record) + "\n")
+                if self._queue.empty():
+                    f.flush()
+
+    def close(self):
+        """Write the queued records and stop the writer thread"""
+        self._queue.put(None)
+        self._thread.join()
+
+    def stats(self):
+        return {"file": self.path, "captured": self.captured, "questions": self.questions}
@@ -0,0 +1,250 @@
+"""Sweep retrieval settings against a labelled question set.
+
+Builds one index per chunking/index configuration and reports recall@k, MRR,
+index size, ingestion time and query latency for each k, so CHUNK_SIZE,
+CHUNK_OVERLAP, RETRIEVAL_K and the CHROMA_HNSW_* settings can be picked from data.
+Embeddings are cached on disk by text, so chunks that are unchanged between
+configurations (and between runs) are only embedded once.
+
+    python tune_retrieval.py --questions questions.jsonl --chunk-sizes 200,400,800 --overlaps 0,50 -k 2,4,8
+    python tune_retrieval.py --questions questions.jsonl --backends chroma,numpy:int8 --search-ef 10,50,100
+
+The question file has one JSON object per line (or a JSON list of them):
+
+    {"question": "How many vacation days do I get?", "sources": ["handbook.pdf"]}
+
+A retrieved chunk is relevant when its source path equals or ends with one of the labelled sources.
+"""
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+import numpy as np
+from dotenv import load_dotenv
+from langchain_core.embeddings import Embeddings
+
+load_dotenv()
+
+
+class DiskCachedEmbeddings(Embeddings):
+    """Embeddings persisted in SQLite, keyed by model and text hash"""
+
+    def __init__(self, embeddings, path, model_key, batch_size=256):
+        self.embeddings = embeddings
+        self.model_key = model_key
+        self.batch_size = batch_size
+        self.db = sqlite3.connect(path)
+        self.db.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB)")
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, text):
+        return hashlib.sha256(f"{self.model_key}\0{text}".encode("utf-8")).hexdigest()
+
+    def embed_documents(self, texts):
+        keys = [self._key(text) for text in texts]
+        found = {}
+        for start in range(0, len(keys), 500):
+            batch = keys[start:start + 500]
+            rows = self.db.execute(
+                f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))})", batch
+            )
+            found.update((key, np.frombuffer(vector, dtype=np.float32).tolist()) for key, vector in rows)
+
+        missing = list({key: text for key, text in zip(keys, texts) if key not in found}.items())
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+        for start in range(0, len(missing), self.batch_size):
+            batch = missing[start:start + self.batch_size]
+            vectors = self.embeddings.embed_documents([text for _, text in batch])
+            self.db.executemany(
+                "INSERT OR REPLACE INTO embeddings VALUES (?, ?)",
+                [(key, np.asarray(vector, dtype=np.float32).tobytes()) for (key, _), vector in zip(batch, vectors)]
+            )
+            self.db.commit()
+            found.update((key, vector) for (key, _), vector in zip(batch, vectors))
+        return [found[key] for key in keys]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def load_questions(path):
+    """Labelled questions as (question, [sources]) pairs"""
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read().strip()
+    records = json.loads(text) if text.startswith("[") else [json.loads(line) for line in text.splitlines() if line.strip()]
+    questions = []
+    for record in records:
+        sources = record.get("sources") or record.get("source") or []
+        questions.append((record["question"], [sources] if isinstance(sources, str) else list(sources)))
+    return questions
+
+
+def load_raw_documents(data_path):
+    """Unchunked documents for every supported file, so each chunking config re-splits the same input"""
+    from document_loader import LOADERS, find_documents
+
+    documents = []
+    for path in find_documents(data_path):
+        try:
+            documents.extend(LOADERS[path.suffix.lower()](path))
+        except Exception as e:
+            print(f"⚠️ Skipping {path}: {e}")
+    return documents
+
+
+def is_relevant(source, labels):
+    source = source.replace("\\", "/")
+    return any(source == label or source.endswith("/" + label.lstrip("/")) for label in labels)
+
+
+def directory_size(directory):
+    return sum(path.stat().st_size for path in Path(directory).rglob("*") if path.is_file())
+
+
+def build_index(chunks, embeddings, backend, directory, hnsw):
+    """Index chunks with one backend ('chroma', 'numpy' or 'numpy:<quantization>')"""
+    name, _, quantization = backend.partition(":")
+    if name == "numpy":
+        from numpy_store import NumpyVectorStore
+        return NumpyVectorStore.from_documents(
+            chunks, embeddings, persist_directory=directory, quantization=quantization or "none"
+        )
+    from langchain_chroma import Chroma
+    from vector_store import hnsw_metadata
+    return Chroma.from_documents(
+        documents=chunks,
+        embedding=embeddings,
+        persist_directory=directory,
+        collection_name="tuning",
+        collection_metadata=hnsw_metadata(*hnsw)
+    )
+
+
+def evaluate(store, query_vectors, questions, ks):
+    """recall@k, MRR@k and search latency for each k"""
+    results = []
+    for k in ks:
+        recalls, reciprocal_ranks, latencies = [], [], []
+        for vector, (_, labels) in zip(query_vectors, questions):
+            started = time.perf_counter()
+            docs = store.similarity_search_by_vector(vector, k=k)
+            latencies.append((time.perf_counter() - started) * 1000)
+            sources = [doc.metadata.get("source", "") for doc in docs]
+            found = {label for label in labels for source in sources if is_relevant(source, [label])}
+            recalls.append(len(found) / len(labels) if labels else 0.0)
+            rank = next((i for i, source in enumerate(sources, 1) if is_relevant(source, labels)), None)
+            reciprocal_ranks.append(1 / rank if rank else 0.0)
+        results.append({
+            "k": k,
+            "recall": float(np.mean(recalls)),
+            "mrr": float(np.mean(reciprocal_ranks)),
+            "p50_ms": float(np.percentile(latencies, 50)),
+            "p95_ms": float(np.percentile(latencies, 95)),
+        })
+    return results
+
+
+def sweep(documents, questions, embeddings, chunk_sizes, overlaps, ks, backends, hnsw_grid):
+    from chunking import Chunker
+    from vector_store import release_chroma_client
+
+    query_vectors = embeddings.embed_documents([question for question, _ in questions])
+    rows = []
+    for chunk_size, overlap in itertools.product(chunk_sizes, overlaps):
+        if overlap >= chunk_size:
+            continue
+        started = time.perf_counter()
+        chunks = Chunker(chunk_size=chunk_size, chunk_overlap=overlap).split_documents(documents)
+        chunk_seconds = time.perf_counter() - started
+
+        for backend in backends:
+            for hnsw in (hnsw_grid if backend == "chroma" else [(None, None, None)]):
+                directory = tempfile.mkdtemp(prefix="tune_")
+                try:
+                    misses_before = embeddings.misses
+                    started = time.perf_counter()
+                    store = build_index(chunks, embeddings, backend, directory, hnsw)
+                    ingest_seconds = chunk_seconds + time.perf_counter() - started
+                    config = {
+                        "chunk_size": chunk_size,
+                        "overlap": overlap,
+                        "backend": backend,
+                        "hnsw": "/".join("-" if value is None else str(value) for value in hnsw) if backend == "chroma" else "",
+                        "chunks": len(chunks),
+                        "embedded": embeddings.misses - misses_before,
+                        "ingest_s": ingest_seconds,
+                        "index_mb": directory_size(directory) / 1e6,
+                    }
+                    rows.extend({**config, **result} for result in evaluate(store, query_vectors, questions, ks))
+                    del store
+                finally:
+                    if backend == "chroma":
+                        release_chroma_client(directory)
+                    shutil.rmtree(directory, ignore_errors=True)
+    return rows
+
+
+def int_list(value):
+    return [int(item) for item in value.split(",") if item]
+
+
+def optional_int_list(value):
+    """Comma-separated ints; empty means Chroma's default"""
+    return int_list(value) or [None]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", required=True, help="JSONL/JSON file of labelled questions")
+    parser.add_argument("--data", default="./data", help="Document folder to index")
+    parser.add_argument("--chunk-sizes", type=int_list, default=[400], help="Comma-separated chunk sizes in tokens")
+    parser.add_argument("--overlaps", type=int_list, default=[50], help="Comma-separated chunk overlaps in tokens")
+    parser.add_argument("-k", type=int_list, default=[2, 4, 8], help="Comma-separated numbers of retrieved chunks")
+    parser.add_argument("--backends", default="chroma", help="Comma-separated: chroma, numpy, numpy:float16, numpy:int8")
+    parser.add_argument("--hnsw-m", type=optional_int_list, default=[None], help="Comma-separated Chroma HNSW M values")
+    parser.add_argument("--construction-ef", type=optional_int_list, default=[None], help="Comma-separated Chroma HNSW construction_ef values")
+    parser.add_argument("--search-ef", type=optional_int_list, default=[None], help="Comma-separated Chroma HNSW search_ef values")
+    parser.add_argument("--cache", default="./.embedding_cache.sqlite", help="SQLite file caching embeddings across runs")
+    parser.add_argument("--output", help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    from vector_store import EMBEDDING_DIMENSIONS, create_embeddings
+
+    questions = load_questions(args.questions)
+    documents = load_raw_documents(args.data)
+    if not questions or not documents:
+        parser.error(f"Need labelled questions and documents, found {len(questions)} questions and {len(documents)} documents")
+
+    model_key = f"{os.getenv('EMBEDDING_DEPLOYMENT_NAME')}:{EMBEDDING_DIMENSIONS}"
+    embeddings = DiskCachedEmbeddings(create_embeddings(), args.cache, model_key)
+    backends = [backend for backend in args.backends.split(",") if backend]
+    hnsw_grid = list(itertools.product(args.hnsw_m, args.construction_ef, args.search_ef))
+
+    print(f"{len(documents)} documents, {len(questions)} questions\n")
+    rows = sweep(documents, questions, embeddings, args.chunk_sizes, args.overlaps, args.k, backends, hnsw_grid)
+
+    print(f"{'size':>5} {'overlap':>7} {'backend':>13} {'hnsw M/cef/sef':>15} {'chunks':>7} {'embedded':>8} "
+          f"{'ingest s':>8} {'index MB':>8} {'k':>3} {'recall@k':>8} {'MRR':>6} {'p50 ms':>7} {'p95 ms':>7}")
+    for row in rows:
+        print(
+            f"{row['chunk_size']:>5} {row['overlap']:>7} {row['backend']:>13} {row['hnsw']:>15} {row['chunks']:>7} "
+            f"{row['embedded']:>8} {row['ingest_s']:>8.2f} {row['index_mb']:>8.2f} {row['k']:>3} "
+            f"{row['recall']:>8.3f} {row['mrr']:>6.3f} {row['p50_ms']:>7.2f} {row['p95_ms']:>7.2f}"
+        )
+    print(f"\nEmbedding cache: {embeddings.hits} hits, {embeddings.misses} texts embedded")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+import asyncio
+import errno
+import hashlib
+import ipaddress
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from urllib.parse import urlsplit
+import aiohttp
+from bs4 import BeautifulSoup
+from langchain_core.documents import Document
+
+logger = logging.getLogger(__name__)
+
+URL_CACHE_DIR = os.getenv("URL_CACHE_DIR", "./url_cache")
+URL_FETCH_CONCURRENCY = int(os.getenv("URL_FETCH_CONCURRENCY", "8"))
+URL_FETCH_PER_HOST = int(os.getenv("URL_FETCH_PER_HOST", "2"))
+URL_FETCH_HOST_DELAY = float(os.getenv("URL_FETCH_HOST_DELAY", "0.5"))  # seconds between requests to one host
+URL_FETCH_TIMEOUT = float(os.getenv("URL_FETCH_TIMEOUT", "20"))
+# Larger pages are rejected while downloading; the same 50 MB limit as /upload
+URL_FETCH_MAX_BYTES = int(os.getenv("URL_FETCH_MAX_BYTES", str(50 * 1024 * 1024)))
+USER_AGENT = os.getenv("USER_AGENT", "BrainBox/1.0")
+# Pages are only fetched from public addresses unless this is set, e.g. for an intranet wiki
+URL_FETCH_ALLOW_PRIVATE = os.getenv("URL_FETCH_ALLOW_PRIVATE", "false").lower() in ("1", "true", "yes")
+
+
+def is_public_address(address):
+    """False for loopback, private, link-local (cloud metadata), reserved and other non-global addresses"""
+    ip = ipaddress.ip_address(address.split("%", 1)[0])
+    if ip.version == 6 and ip.ipv4_mapped is not None:
+        ip = ip.ipv4_mapped
+    return ip.is_global
+
+
+class PublicAddressConnector(aiohttp.TCPConnector):
+    """Connector that refuses to connect to non-public addresses
+
+    Checked after DNS resolution for every connection, redirects included, so neither an IP
+    literal nor a public hostname resolving to an internal address gets through.
+    """
+
+    async def _resolve_host(self, host, port, traces=None):
+        addresses = await super()._resolve_host(host, port, traces=traces)
+        public = [address for address in addresses if is_public_address(address["host"])]
+        if not public:
+            raise OSError(errno.EACCES, f"{host} does not resolve to a public address")
+        return public
+
+
+@dataclass
+class FetchResult:
+    url: str
+    status: str  # new, modified, unchanged or error
+    body: bytes = b""
+    content_type: str = ""
+    validators: dict = field(default_factory=dict)
+    error: str = None
+
+    @property
+    def changed(self):
+        return self.status in ("new", "modified")
+
+
+class ResponseCache:
+    """On-disk cache of fetched pages and their ETag/Last-Modified validators"""
+
+    def __init__(self, directory=URL_CACHE_DIR):
+        self.directory = Path(directory)
+
+    def _paths(self, url):
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return self.directory / f"{key}.json", self.directory / f"{key}.body"
+
+    def get(self, url):
+        """Cached metadata for url, or None"""
+        meta_path, _ = self._paths(url)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def body(self, url):
+        _, body_path = self._paths(url)
+        return body_path.read_bytes()
+
+    def store(self, result):
+        """Persist a fetched page so later fetches can revalidate instead of downloading"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        meta_path, body_path = self._paths(result.url)
+        body_path.write_bytes(result.body)
+        meta = {
+            "url": result.url,
+            "content_type": result.content_type,
+            "content_hash": hashlib.sha256(result.body).hexdigest(),
+            "fetched_at": time.time(),
+            **result.validators
+        }
+        with open(meta_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+
+    def urls(self):
+        """All cached URLs"""
+        for meta_path in self.directory.glob("*.json"):
+            try:
+                with open(meta_path, "r", encoding="utf-8") as f:
+                    yield json.load(f)["url"]
+            except (OSError, ValueError, KeyError):
+                continue
+
+
+class ResponseTooLarge(Exception):
+    pass
+
+
+async def read_limited(response, max_bytes):
+    """Response body, read in chunks; raises ResponseTooLarge as soon as it exceeds max_bytes"""
+    limit = f"{max_bytes / 1024 / 1024:.0f} MB"
+    if response.content_length is not None and response.content_length > max_bytes:
+        raise ResponseTooLarge(f"Page is larger than the {limit} limit")
+    chunks, size = [], 0
+    async for chunk in response.content.iter_chunked(1 << 16):
+        size += len(chunk)
+        if size > max_bytes:
+            raise ResponseTooLarge(f"Page is larger than the {limit} limit")
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+class UrlFetcher:
+    """Async fetcher with bounded concurrency, per-host politeness and conditional requests"""
+
+    def __init__(self, cache=None, concurrency=URL_FETCH_CONCURRENCY, per_host=URL_FETCH_PER_HOST,
+                 host_delay=URL_FETCH_HOST_DELAY, timeout=URL_FETCH_TIMEOUT, allow_private=URL_FETCH_ALLOW_PRIVATE,
+                 max_bytes=URL_FETCH_MAX_BYTES):
+        self.cache = cache or ResponseCache()
+        self.max_bytes = max_bytes
+        self.allow_private = allow_private
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.host_delay = host_delay
+        self.timeout = timeout
+        self._host_slots = {}
+        self._host_locks = {}
+        self._host_last_request = {}
+
+    async def _wait_for_host(self, host):
+        """Space out request starts to the same host by host_delay seconds"""
+        lock = self._host_locks.setdefault(host, asyncio.Lock())
+        async with lock:
+            wait = self._host_last_request.get(host, 0) + self.host_delay - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self._host_last_request[host] = time.monotonic()
+
+    async def _fetch(self, session, slots, url, force):
+        host = urlsplit(url).netloc
+        host_slots = self._host_slots.setdefault(host, asyncio.Semaphore(self.per_host))
+        cached = None if force else self.cache.get(url)
+        headers = {}
+        if cached:
+            if cached.get("etag"):
+                headers["If-None-Match"] = cached["etag"]
+            if cached.get("last_modified"):
+                headers["If-Modified-Since"] = cached["last_modified"]
+
+        # Take the per-host slot first so a busy host does not hold global slots
+        async with host_slots, slots:
+            await self._wait_for_host(host)
+            try:
+                async with session.get(url, headers=headers) as response:
+                    if response.status == 304:
+                        if not cached:
+                            # Nothing was sent to revalidate, so there is no cached page to fall back on
+                            return FetchResult(url, "error", error="304 Not Modified without a cached copy")
+                        return FetchResult(url, "unchanged", self.cache.body(url), cached.get("content_type", ""),
+                                           {k: cached[k] for k in ("etag", "last_modified") if cached.get(k)})
+                    response.raise_for_status()
+                    body = await read_limited(response, self.max_bytes)
+                    validators = {}
+                    if response.headers.get("ETag"):
+                        validators["etag"] = response.headers["ETag"]
+                    if response.headers.get("Last-Modified"):
+                        validators["last_modified"] = response.headers["Last-Modified"]
+                    content_type = response.headers.get("Content-Type", "")
+            except (aiohttp.ClientError, asyncio.TimeoutError, OSError, ResponseTooLarge) as e:
+                return FetchResult(url, "error", error=str(e) or type(e).__name__)
+
+        if cached is None:
+            status = "new"
+        elif cached.get("content_hash") == hashlib.sha256(body).hexdigest():
+            status = "unchanged"
+        else:
+            status = "modified"
+        return FetchResult(url, status, body, content_type, validators)
+
+    async def fetch_all(self, urls, force=False):
+        """Fetch (or revalidate) all urls concurrently, preserving input order"""
+        slots = asyncio.Semaphore(self.concurrency)
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        connector = aiohttp.TCPConnector() if self.allow_private else PublicAddressConnector()
+        async with aiohttp.ClientSession(timeout=timeout, headers={"User-Agent": USER_AGENT},
+                                         connector=connector) as session:
+            return await asyncio.gather(*(
+                self._fetch(session, slots, url, force) for url in dict.fromkeys(urls)
+            ))
+
+
+def page_to_document(url, body, content_type=""):
+    """Extract readable text from an HTML (or plain text) page"""
+    text = body.decode("utf-8", errors="replace")
+    metadata = {"source": url}
+    if "html" in content_type or text.lstrip()[:1] == "<":
+        soup = BeautifulSoup(text, "html.parser")
+        for tag in soup(["script", "style", "noscript"]):
+            tag.decompose()
+        if soup.title and soup.title.string:
+            metadata["title"] = soup.title.string.strip()
+        text = soup.get_text("\n")
+    lines = (line.strip() for line in text.splitlines())
+    return Document(page_content="\n".join(line for line in lines if line), metadata=metadata)
+
+
+def _page_chunks(chunker, result):
+    return chunker.split_documents([page_to_document(result.url, result.body, result.content_type)])
+
+
+def load_cached_url_documents(cache=None):
+    """Documents for every cached page, so full rebuilds keep URL content without refetching"""
+    cache = cache or ResponseCache()
+    documents = []
+    for url in cache.urls():
+        meta = cache.get(url)
+        try:
+            documents.append(page_to_document(url, cache.body(url), meta.get("content_type", "")))
+        except OSError:
+            continue
+    return documents
+
+
+async def ingest_urls(vectorstore, urls, fetcher=None, force=False):
+    """Fetch urls and re-ingest only the pages that are new or changed"""
+    from vector_store import ingest_chunker, replace_source_documents
+
+    fetcher = fetcher or UrlFetcher()
+    chunker = ingest_chunker(vectorstore)
+    started = time.perf_counter()
+    results = await fetcher.fetch_all(urls, force=force)
+
+    report = {"new": [], "modified": [], "unchanged": [], "error": {}, "chunks": 0}
+    for result in results:
+        if result.status == "error":
+            report["error"][result.url] = result.error
+            continue
+        if result.changed:
+            # HTML parsing, tokenizing and embedding all block, so they run off the event loop
+            chunks = await asyncio.to_thread(_page_chunks, chunker, result)
+            await asyncio.to_thread(replace_source_documents, vectorstore, result.url, chunks)
+            report["chunks"] += len(chunks)
+        # Only commit the cache once the page is in the index
+        await asyncio.to_thread(fetcher.cache.store, result)
+        report[result.status].append(result.url)
+
+    report["seconds"] = round(time.perf_counter() - started, 3)
+    logger.info(
+        f"🌐 URL ingestion: {len(report['new'])} new, {len(report['modified'])} modified, "
+        f"{len(report['unchanged'])} unchanged, {len(report['error'])} failed in {report['seconds']}s"
+    )
+    return report
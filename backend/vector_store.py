@@ -1,38 +1,178 @@
 from langchain_openai import AzureOpenAIEmbeddings
 from langchain_chroma import Chroma
+from langchain_core.documents import Document
+from embedding_cache import CachedQueryEmbeddings
+from fake_providers import MODEL_PROVIDER
+from document_index import HIERARCHICAL_RETRIEVAL
+from sharded_store import VECTOR_SHARDS, ShardedVectorStore, read_manifest, shard_directories, store_documents
+from datetime import datetime
+import json
 import os
+import shutil
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# Shortened embeddings (text-embedding-3 models support e.g. 256/512/1024 dimensions)
+EMBEDDING_DIMENSIONS = int(os.getenv("EMBEDDING_DIMENSIONS", "0")) or None
+# chroma or numpy (in-process, memory-mapped index)
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma").lower()
+# float16/int8 quantization is only available in the numpy backend and implies it
+VECTOR_QUANTIZATION = os.getenv("VECTOR_QUANTIZATION", "none").lower()
+# Chroma HNSW index parameters; unset keeps Chroma's defaults
+CHROMA_HNSW_M = int(os.getenv("CHROMA_HNSW_M", "0")) or None
+CHROMA_HNSW_CONSTRUCTION_EF = int(os.getenv("CHROMA_HNSW_CONSTRUCTION_EF", "0")) or None
+CHROMA_HNSW_SEARCH_EF = int(os.getenv("CHROMA_HNSW_SEARCH_EF", "0")) or None
+CHROMA_COPY_PAGE_SIZE = 5000  # chunks per request when copying a collection
+
+def create_embeddings():
+    """Azure OpenAI embeddings client for the configured deployment"""
+    if MODEL_PROVIDER == "fake":
+        from fake_providers import FakeEmbeddings
+        return FakeEmbeddings(dimensions=EMBEDDING_DIMENSIONS)
+    return AzureOpenAIEmbeddings(
+        azure_deployment=os.getenv('EMBEDDING_DEPLOYMENT_NAME'),
+        api_version=os.getenv("API_VERSION"),
+        azure_endpoint=os.getenv("AZURE_ENDPOINT"),
+        api_key=os.getenv('AZURE_API_KEY'),
+        dimensions=EMBEDDING_DIMENSIONS
+    )
+
+def hnsw_metadata(m=CHROMA_HNSW_M, construction_ef=CHROMA_HNSW_CONSTRUCTION_EF, search_ef=CHROMA_HNSW_SEARCH_EF):
+    """Chroma collection metadata setting the HNSW parameters that are given"""
+    metadata = {"hnsw:M": m, "hnsw:construction_ef": construction_ef, "hnsw:search_ef": search_ef}
+    return {key: value for key, value in metadata.items() if value} or None
+
 class VectorStore:
-    def __init__(self, persist_directory="./chroma_db"):
-        self.embeddings = AzureOpenAIEmbeddings(
-            azure_deployment=os.getenv('EMBEDDING_DEPLOYMENT_NAME'),
-            api_version=os.getenv("API_VERSION"),
-            azure_endpoint=os.getenv("AZURE_ENDPOINT"),
-            api_key=os.getenv('AZURE_API_KEY')
+    def __init__(self, persist_directory="./chroma_db", collection_name="langchain"):
+        self.embeddings = CachedQueryEmbeddings(
+            create_embeddings(),
+            max_size=int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "1024"))
         )
         self.persist_directory = persist_directory
+        self.collection_name = collection_name
+        self.quantization = VECTOR_QUANTIZATION
+        self.backend = "numpy" if self.quantization != "none" else VECTOR_BACKEND
         self.vectorstore = None
     
-    def create_vectorstore(self, documents):
-        """Create and persist vector store"""
-        self.vectorstore = Chroma.from_documents(
+    def _parents_directory(self):
+        return os.path.join(self.persist_directory, "parents")
+    
+    def _document_index_directory(self):
+        return os.path.join(self.persist_directory, "documents")
+    
+    def create_vectorstore(self, documents, parents=None, previous=None):
+        """Create and persist vector store; parents are the sections of parent-document retrieval
+
+        previous is the directory of the index being replaced: unchanged shards of a sharded
+        index are copied from it instead of being embedded again.
+        """
+        self._create_vectorstore(documents, previous)
+        if parents is not None:
+            from parent_docstore import ParentDocStore
+            self.vectorstore.parents = ParentDocStore.build(self._parents_directory(), parents)
+        if HIERARCHICAL_RETRIEVAL:
+            from document_index import DocumentIndex
+            self.vectorstore.document_index = DocumentIndex.build(self._document_index_directory(), self.vectorstore)
+            print(f"🗂️ Document index built for {len(self.vectorstore.document_index.sources)} documents")
+        return self.vectorstore
+    
+    def _create_vectorstore(self, documents, previous=None):
+        if VECTOR_SHARDS > 1:
+            self.vectorstore = ShardedVectorStore.build(self.persist_directory, documents, self, VECTOR_SHARDS, previous)
+            print(
+                f"Sharded vector store created with {len(documents)} documents in {VECTOR_SHARDS} shards "
+                f"({len(self.vectorstore.reused)} unchanged shards reused)"
+            )
+            return self.vectorstore
+        
+        self.vectorstore = self.build_store(self.persist_directory, documents)
+        if self.backend == "numpy":
+            print(f"NumPy vector store ({self.quantization}) created with {len(documents)} documents")
+        else:
+            # Note: ChromaDB automatically persists data in newer versions
+            print(f"Vector store created with {len(documents)} documents")
+        return self.vectorstore
+    
+    def build_store(self, directory, documents):
+        """Backend index of documents in directory (one shard, or the whole unsharded index)"""
+        if self.backend == "numpy":
+            from numpy_store import NumpyVectorStore
+            return NumpyVectorStore.from_documents(
+                documents=documents,
+                embedding=self.embeddings,
+                persist_directory=os.path.join(directory, "compact"),
+                quantization=self.quantization
+            )
+        if not documents:
+            # Chroma.from_documents needs at least one document; an empty shard is just an empty collection
+            return self._chroma(directory)
+        return Chroma.from_documents(
             documents=documents,
             embedding=self.embeddings,
-            persist_directory=self.persist_directory
+            persist_directory=directory,
+            collection_name=self.collection_name,
+            collection_metadata=hnsw_metadata()
         )
-        # Note: ChromaDB automatically persists data in newer versions
-        print(f"Vector store created with {len(documents)} documents")
-        return self.vectorstore
+    
+    def _chroma(self, directory):
+        return Chroma(
+            persist_directory=directory,
+            embedding_function=self.embeddings,
+            collection_name=self.collection_name,
+            collection_metadata=hnsw_metadata()
+        )
+    
+    def open_store(self, directory):
+        """Backend index previously built in directory"""
+        if self.backend == "numpy":
+            from numpy_store import NumpyVectorStore
+            compact = os.path.join(directory, "compact")
+            if not os.path.exists(os.path.join(compact, "manifest.json")):
+                raise FileNotFoundError(f"No NumPy index in {compact}; rebuild the index")
+            return NumpyVectorStore(compact, self.embeddings)
+        return Chroma(
+            persist_directory=directory,
+            embedding_function=self.embeddings,
+            collection_name=self.collection_name
+        )
+    
+    def copy_store(self, store, directory):
+        """Copy of a backend index in directory, reusing its embeddings"""
+        if self.backend == "numpy":
+            return store.copy_to(os.path.join(directory, "compact"))
+        copy = self._chroma(directory)
+        offset = 0
+        while True:
+            page = store._collection.get(include=["embeddings", "documents", "metadatas"],
+                                         limit=CHROMA_COPY_PAGE_SIZE, offset=offset)
+            if not len(page["ids"]):
+                break
+            copy._collection.add(ids=page["ids"], embeddings=page["embeddings"],
+                                 documents=page["documents"], metadatas=page["metadatas"])
+            offset += len(page["ids"])
+        return copy
     
     def load_vectorstore(self):
         """Load existing vector store"""
-        self.vectorstore = Chroma(
-            persist_directory=self.persist_directory,
-            embedding_function=self.embeddings
-        )
+        if read_manifest(self.persist_directory) is not None:
+            # Sharded indexes stay sharded, whatever VECTOR_SHARDS says now
+            self.vectorstore = ShardedVectorStore.load(self.persist_directory, self)
+        else:
+            self.vectorstore = self.open_store(self.persist_directory)
+        # Indexes built with parent-document or hierarchical retrieval keep using it, whatever the settings say now
+        if os.path.isdir(self._parents_directory()):
+            from parent_docstore import ParentDocStore
+            self.vectorstore.parents = ParentDocStore(self._parents_directory())
+        if os.path.isdir(self._document_index_directory()):
+            from document_index import DocumentIndex
+            self.vectorstore.document_index = DocumentIndex(self._document_index_directory())
+        return self.vectorstore
+    
+    def load_snapshot(self, path):
+        """Load a prebuilt index snapshot (see ingest.py): memory-mapped, read-only, no re-embedding"""
+        from snapshot import load_snapshot
+        self.vectorstore = load_snapshot(path, self.embeddings)
         return self.vectorstore
     
     def similarity_search(self, query, k=4):
@@ -40,4 +180,172 @@ class VectorStore:
         if not self.vectorstore:
             self.load_vectorstore()
         
-        return self.vectorstore.similarity_search(query, k=k)
\ No newline at end of file
+        return self.vectorstore.similarity_search(query, k=k)
+
+def release_chroma_client(persist_directory):
+    """Stop Chroma's cached in-process client for a directory so the directory can be deleted and rebuilt"""
+    from chromadb.api.shared_system_client import SharedSystemClient
+    system = SharedSystemClient._identifier_to_system.pop(str(persist_directory), None)
+    if system is not None:
+        system.stop()
+
+# Indexes are built into a new generation directory inside persist_directory and activated by
+# rewriting ACTIVE, so a rebuild never touches the index that running requests are reading.
+ACTIVE_INDEX_FILE = "ACTIVE"
+INDEX_GENERATION_PREFIX = "gen-"
+
+def active_index_directory(persist_directory):
+    """Directory of the index in use: the generation named in ACTIVE, or persist_directory itself for older indexes"""
+    pointer = os.path.join(persist_directory, ACTIVE_INDEX_FILE)
+    if os.path.isfile(pointer):
+        with open(pointer, "r", encoding="utf-8") as f:
+            return os.path.join(persist_directory, f.read().strip())
+    return persist_directory
+
+def new_index_directory(persist_directory):
+    """Fresh directory to build the next index generation in"""
+    return os.path.join(persist_directory, f"{INDEX_GENERATION_PREFIX}{datetime.now():%Y%m%d-%H%M%S-%f}")
+
+def activate_index_directory(persist_directory, directory):
+    """Make a built generation the index loaded from persist_directory from now on"""
+    pointer = os.path.join(persist_directory, ACTIVE_INDEX_FILE)
+    with open(pointer + ".tmp", "w", encoding="utf-8") as f:
+        f.write(os.path.basename(directory))
+    os.replace(pointer + ".tmp", pointer)
+
+def release_index_clients(directory):
+    """Stop the cached Chroma clients of an index generation and its shards"""
+    for shard in shard_directories(directory):
+        release_chroma_client(shard)
+    release_chroma_client(directory)
+
+def remove_index_directory(persist_directory, directory):
+    """Close and delete a retired index generation"""
+    release_index_clients(directory)
+    if os.path.normpath(directory) != os.path.normpath(persist_directory):
+        shutil.rmtree(directory, ignore_errors=True)
+        return
+    # An index from before generations: its files sit directly in persist_directory
+    for entry in os.listdir(persist_directory):
+        if entry.startswith((ACTIVE_INDEX_FILE, INDEX_GENERATION_PREFIX)):
+            continue
+        path = os.path.join(persist_directory, entry)
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            os.remove(path)
+
+def prune_index_directories(persist_directory, keep=()):
+    """Delete every generation except the active one and those in keep"""
+    if not os.path.isfile(os.path.join(persist_directory, ACTIVE_INDEX_FILE)):
+        return
+    keep = {os.path.normpath(path) for path in keep} | {os.path.normpath(active_index_directory(persist_directory))}
+    stale = [
+        os.path.join(persist_directory, entry) for entry in os.listdir(persist_directory)
+        if entry.startswith(INDEX_GENERATION_PREFIX)
+    ]
+    if any(os.path.exists(os.path.join(persist_directory, name)) for name in ("chroma.sqlite3", "compact")):
+        stale.append(persist_directory)
+    for directory in stale:
+        if os.path.normpath(directory) not in keep:
+            remove_index_directory(persist_directory, directory)
+
+def _lists_source(metadata, source):
+    """Whether a deduplicated chunk's metadata names source as its own or a duplicate source"""
+    if not metadata.get("duplicates"):
+        return False
+    return metadata.get("source") == source or source in json.loads(metadata.get("duplicate_sources") or "[]")
+
+def _shared_documents(vectorstore, source):
+    """Deduplicated documents (parent sections with parent retrieval) that source shares with other files"""
+    parents = getattr(vectorstore, "parents", None)
+    if parents is not None:
+        return parents.find(lambda metadata: _lists_source(metadata, source))
+    return [doc for doc in store_documents(vectorstore, {"duplicates": {"$gt": 0}}) if _lists_source(doc.metadata, source)]
+
+def _store_documents(vectorstore, source, documents, replace=True):
+    """Add documents of one source, first removing its stored ones when replacing"""
+    if replace:
+        vectorstore.delete(where={"source": source})
+    parents = getattr(vectorstore, "parents", None)
+    if parents is not None:
+        from parent_docstore import split_parents
+        children = split_parents(documents)
+        if replace:
+            parents.replace_source(source, documents)
+        else:
+            parents.add(documents)
+        documents = children
+    if documents:
+        vectorstore.add_documents(documents)
+
+def replace_source_documents(vectorstore, source, documents):
+    """Replace all chunks of one source in a loaded vector store (incremental ingestion)
+
+    For parent-document indexes, documents are parent sections (see ingest_chunker): they are
+    stored in the docstore and their child chunks are embedded.
+
+    Content that deduplication stored once for several files stays with the others: a shared
+    document stored under source moves to the next file that contains it, and documents of other
+    files that list source as a duplicate are stored again without it.
+    """
+    from dedup import without_source
+    shared = _shared_documents(vectorstore, source)
+    _store_documents(vectorstore, source, documents)
+
+    parents = getattr(vectorstore, "parents", None)
+    moved, stale = {}, []
+    for doc in shared:
+        if doc.metadata.get("source") != source:
+            # Stored under another file, so not deleted with source's documents above
+            stale.append(doc.metadata["parent_id"] if parents is not None else doc.id)
+        remaining = without_source(doc, source)
+        if remaining is not None:
+            moved.setdefault(remaining.metadata["source"], []).append(remaining)
+    if stale and parents is not None:
+        vectorstore.delete(where={"parent_id": {"$in": stale}})
+        parents.delete(stale)
+    elif stale:
+        vectorstore.delete(ids=stale)
+    for owner, owner_documents in moved.items():
+        _store_documents(vectorstore, owner, owner_documents, replace=False)
+
+    document_index = getattr(vectorstore, "document_index", None)
+    if document_index is not None:
+        document_index.update_sources(vectorstore, [source, *moved])
+
+def ingest_chunker(vectorstore):
+    """Chunker for documents added to a loaded vector store"""
+    from chunking import Chunker
+    from parent_docstore import parent_chunker
+    return parent_chunker() if getattr(vectorstore, "parents", None) is not None else Chunker()
+
+def batch_similarity_search_by_vector(vectorstore, embeddings, k=4, filters=None):
+    """Top-k documents for many query embeddings, in one vectorized call where the backend supports it
+
+    filters gives each query its own metadata filter (hierarchical retrieval), searched one by one.
+    """
+    if filters is not None and any(filters):
+        return [
+            vectorstore.similarity_search_by_vector(embedding, k=k, filter=where)
+            for embedding, where in zip(embeddings, filters)
+        ]
+    if hasattr(vectorstore, "batch_similarity_search_by_vector"):
+        return [
+            [doc for doc, _ in results]
+            for results in vectorstore.batch_similarity_search_by_vector(embeddings, k=k)
+        ]
+    if isinstance(vectorstore, Chroma):
+        result = vectorstore._collection.query(
+            query_embeddings=embeddings,
+            n_results=k,
+            include=["documents", "metadatas"]
+        )
+        return [
+            [
+                Document(page_content=text, metadata=metadata or {}, id=doc_id)
+                for text, metadata, doc_id in zip(texts, metadatas, ids)
+            ]
+            for texts, metadatas, ids in zip(result["documents"], result["metadatas"], result["ids"])
+        ]
+    return [vectorstore.similarity_search_by_vector(embedding, k=k) for embedding in embeddings]
\ No newline at end of file
@@ -0,0 +1,129 @@
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from traffic_capture import scrub
+
+logger = logging.getLogger(__name__)
+
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "true").lower() in ("1", "true", "yes")
+WARMUP_TOP_N = int(os.getenv("WARMUP_TOP_N", "50"))
+WARMUP_QUESTIONS_FILE = os.getenv("WARMUP_QUESTIONS_FILE")
+# Opt-in: without a file the counts are kept in memory only and start empty after a restart
+QUESTION_STATS_FILE = os.getenv("QUESTION_STATS_FILE")
+QUESTION_STATS_MAX_ENTRIES = int(os.getenv("QUESTION_STATS_MAX_ENTRIES", "1000"))
+QUESTION_STATS_MAX_CHARS = int(os.getenv("QUESTION_STATS_MAX_CHARS", "200"))  # longer questions are not counted
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_question(question, max_chars=QUESTION_STATS_MAX_CHARS):
+    """Question with whitespace collapsed, or None if it is too long or contains personal data"""
+    question = _WHITESPACE.sub(" ", question).strip()
+    if not question or len(question) > max_chars or scrub(question) != question:
+        return None
+    return question
+
+
+class FrequentQuestions:
+    """Counts questions seen by /chat and optionally persists the most frequent ones for warmup
+
+    Only short questions without e-mail addresses, URLs or long numbers are counted, so the
+    table never holds the personal data that traffic capture scrubs.
+    """
+
+    def __init__(self, path=QUESTION_STATS_FILE, max_entries=QUESTION_STATS_MAX_ENTRIES, save_every=50):
+        self.path = Path(path) if path else None
+        self.max_entries = max_entries
+        self.save_every = save_every
+        self.counts = Counter()
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if self.path is None or not self.path.exists():
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for question, count in json.load(f).items():
+                    question = normalize_question(question)
+                    if question is not None:
+                        self.counts[question] += count
+            self.counts = Counter(dict(self.counts.most_common(self.max_entries)))
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️ Could not read question stats from {self.path}: {e}")
+
+    def record(self, question):
+        """Count a question and periodically flush the counts to disk"""
+        question = normalize_question(question)
+        if question is None:
+            return
+        with self._lock:
+            self.counts[question] += 1
+            if len(self.counts) > self.max_entries:
+                # Drop the least frequent half so the table stays bounded
+                self.counts = Counter(dict(self.counts.most_common(self.max_entries // 2)))
+            self._pending += 1
+            should_save = self.path is not None and self._pending >= self.save_every
+        if should_save:
+            self.save()
+
+    def top(self, n):
+        """Most frequent questions, most frequent first"""
+        with self._lock:
+            return [question for question, _ in self.counts.most_common(n)]
+
+    def save(self):
+        """Write the counts to disk, if a file is configured"""
+        if self.path is None:
+            return
+        with self._lock:
+            data = dict(self.counts.most_common(self.max_entries))
+            self._pending = 0
+        try:
+            tmp_path = self.path.with_suffix(".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"⚠️ Could not save question stats to {self.path}: {e}")
+
+
+def load_warmup_questions(frequent_questions=None, top_n=WARMUP_TOP_N, questions_file=WARMUP_QUESTIONS_FILE):
+    """Configured warmup questions (one per line) followed by the top-N recorded questions"""
+    questions = []
+    if questions_file and os.path.exists(questions_file):
+        with open(questions_file, "r", encoding="utf-8") as f:
+            questions.extend(line.strip() for line in f if line.strip())
+    if frequent_questions is not None and top_n > 0:
+        questions.extend(frequent_questions.top(top_n))
+    return list(dict.fromkeys(questions))
+
+
+def warmup_bot(bot, questions):
+    """Prefill the query-embedding cache and run the bot's own retrieval for each question"""
+    started = time.perf_counter()
+    embeddings = bot.vectorstore.embeddings
+    prefilled = 0
+    if questions and hasattr(embeddings, "prefill"):
+        prefilled = embeddings.prefill(questions)
+
+    # The real retrieval path (search_k, document-index filters, parent sections) pages in
+    # everything a chat request touches before real traffic arrives
+    for question in questions or ["warmup"]:
+        bot.retrieve(question)
+
+    logger.info(
+        f"🔥 Warmup finished in {time.perf_counter() - started:.2f}s "
+        f"({len(questions)} questions, {prefilled} embeddings prefilled)"
+    )
+    return {
+        "questions": len(questions),
+        "prefilled": prefilled,
+        "seconds": round(time.perf_counter() - started, 3)
+    }
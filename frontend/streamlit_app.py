@@ -1,13 +1,19 @@
 import streamlit as st
 import requests
+from requests.adapters import HTTPAdapter
 from datetime import datetime
 from typing import Optional, Dict, List
 import time
 import json
+import os
 
 #configurations
 API_URL = "http://backend:8000"
 REQUEST_TIMEOUT = 30
+# Shared with the backend (same .env); it serves requests carrying this token in the interactive lane
+CHAT_INTERACTIVE_TOKEN = os.getenv("CHAT_INTERACTIVE_TOKEN", "")
+STATUS_CACHE_TTL = 10  # seconds health/stats responses are reused across reruns
+MESSAGES_PER_PAGE = 20  # messages rendered per page of chat history
 
 st.set_page_config(
     page_title="Brain Box",
@@ -220,10 +226,23 @@ if 'session_id' not in st.session_state:
 if 'last_uploaded_file' not in st.session_state:
     st.session_state.last_uploaded_file = None
 
+if 'visible_messages' not in st.session_state:
+    st.session_state.visible_messages = MESSAGES_PER_PAGE
+
+@st.cache_resource
+def get_http_session() -> requests.Session:
+    """Keep-alive HTTP session shared by all reruns and users"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+@st.cache_data(ttl=STATUS_CACHE_TTL, show_spinner=False)
 def check_api_health() -> bool:
     """Check if API is running and healthy"""
     try:
-        response = requests.get(f"{API_URL}/health", timeout=5)
+        response = get_http_session().get(f"{API_URL}/health", timeout=5)
         if response.status_code == 200:
             data = response.json()
             return data.get('bot_loaded', False)
@@ -239,9 +258,13 @@ def send_question(question: str) -> Optional[Dict]:
             "session_id": st.session_state.session_id
         }
         
-        response = requests.post(
+        response = get_http_session().post(
             f"{API_URL}/chat",
             json=payload,
+            headers={
+                "X-Client-Token": CHAT_INTERACTIVE_TOKEN,  # served ahead of batch/API callers
+                "X-Request-Timeout": str(REQUEST_TIMEOUT)  # backend stops generating once we give up
+            },
             timeout=REQUEST_TIMEOUT
         )
         
@@ -250,9 +273,15 @@ def send_question(question: str) -> Optional[Dict]:
         elif response.status_code == 503:
             st.error("🔧 Bot is initializing. Please wait a moment and try again.")
             return None
+        elif response.status_code == 429:
+            st.warning("🐢 You're sending questions too quickly. Please wait a moment and try again.")
+            return None
         elif response.status_code == 400:
             st.error("❌ Invalid question. Please try again.")
             return None
+        elif response.status_code == 504:
+            st.error("⏱️ Request timed out. Please try again.")
+            return None
         else:
             st.error(f"❌ API Error: {response.status_code}")
             return None
@@ -302,22 +331,46 @@ def clear_chat():
     """Clear chat history"""
     st.session_state.chat_history = []
     st.session_state.message_count = 0
+    st.session_state.visible_messages = MESSAGES_PER_PAGE
+
+def refresh_api_status():
+    """Drop cached health/stats so the next rerun asks the backend again"""
+    check_api_health.clear()
+    get_api_stats.clear()
 
+@st.cache_data(ttl=STATUS_CACHE_TTL, show_spinner=False)
 def get_api_stats() -> Optional[Dict]:
     """Get API statistics"""
     try:
-        response = requests.get(f"{API_URL}/stats", timeout=5)
+        response = get_http_session().get(f"{API_URL}/stats", timeout=5)
         if response.status_code == 200:
             return response.json()
         return None
     except:
         return None
 
+def render_message(message: Dict):
+    """Render one chat message with its timestamp and sources"""
+    with st.chat_message(message['role']):
+        st.write(message['content'])
+        
+        # Show timestamp if enabled
+        if st.session_state.show_timestamps and 'timestamp' in message:
+            st.caption(f"⏰ {message['timestamp']}")
+        
+        # Display sources for assistant messages
+        if message['role'] == 'assistant' and st.session_state.show_sources and 'sources' in message and message['sources']:
+            with st.expander(f"📚 View {len(message['sources'])} Source(s)", expanded=False):
+                for source_idx, source in enumerate(message['sources'], 1):
+                    st.text(f"Source {source_idx}:")
+                    st.text(source)
+                    st.divider()
+
 def upload_document(file) -> Dict:
     """Upload a document to the backend"""
     try:
         files = {'file': (file.name, file.getvalue(), file.type)}
-        response = requests.post(
+        response = get_http_session().post(
             f"{API_URL}/upload",
             files=files,
             timeout=REQUEST_TIMEOUT
@@ -335,7 +388,7 @@ def upload_document(file) -> Dict:
 def reload_documents() -> Dict:
     """Reload all documents from data folder"""
     try:
-        response = requests.post(
+        response = get_http_session().post(
             f"{API_URL}/reload",
             timeout=60  # Longer timeout for processing
         )
@@ -382,6 +435,7 @@ with st.sidebar:
                 if result['success']:
                     st.success(f"✅ {result['message']}")
                     st.session_state.last_uploaded_file = file_id
+                    refresh_api_status()
                     time.sleep(1)
                     st.rerun()
                 else:
@@ -483,23 +537,16 @@ st.markdown("""
     </div>
 """, unsafe_allow_html=True)
 
-# Chat History Container
+# Chat History Container - only the most recent page(s) are rendered, so reruns stay fast
 if st.session_state.chat_history:
-    for idx, message in enumerate(st.session_state.chat_history):
-        with st.chat_message(message['role']):
-            st.write(message['content'])
-            
-            # Show timestamp if enabled
-            if st.session_state.show_timestamps and 'timestamp' in message:
-                st.caption(f"⏰ {message['timestamp']}")
-            
-            # Display sources for assistant messages
-            if message['role'] == 'assistant' and st.session_state.show_sources and 'sources' in message and message['sources']:
-                with st.expander(f"📚 View {len(message['sources'])} Source(s)", expanded=False):
-                    for source_idx, source in enumerate(message['sources'], 1):
-                        st.text(f"Source {source_idx}:")
-                        st.text(source)
-                        st.divider()
+    hidden = max(0, len(st.session_state.chat_history) - st.session_state.visible_messages)
+    if hidden:
+        if st.button(f"⬆️ Show {min(hidden, MESSAGES_PER_PAGE)} earlier message(s) ({hidden} hidden)", use_container_width=True):
+            st.session_state.visible_messages += MESSAGES_PER_PAGE
+            st.rerun()
+    
+    for message in st.session_state.chat_history[hidden:]:
+        render_message(message)
 
 user_input = st.chat_input("💭 Type your question here...", key="chat_input_box")
 